@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+from app.deadline import DeadlineExceeded, current_deadline
+
+logger = logging.getLogger(__name__)
+
+# Per-stage concurrency limits for the LLM-bound calls. Required stages queue
+# (bounded, with a deadline); optional stages are skipped as soon as they're saturated.
+STAGE_CONCURRENCY = {
+    "expand": int(os.getenv("ADMISSION_EXPAND_CONCURRENCY", "8")),
+    "embed": int(os.getenv("ADMISSION_EMBED_CONCURRENCY", "16")),
+    "rerank": int(os.getenv("ADMISSION_RERANK_CONCURRENCY", "8")),
+    "generate": int(os.getenv("ADMISSION_GENERATE_CONCURRENCY", "8")),
+}
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "16"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "5"))
+
+
+class Overloaded(Exception):
+    """A required stage could not be admitted; map to 503 + Retry-After."""
+
+    def __init__(self, stage: str, reason: str, retry_after: int = ADMISSION_RETRY_AFTER):
+        super().__init__(f"Stage '{stage}' overloaded ({reason})")
+        self.stage = stage
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionStage:
+    """Concurrency limit with a bounded FIFO-ish wait queue and a wait deadline."""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0          # optional calls skipped because the stage was saturated
+        self.rejected = 0      # required calls turned away because the queue was full
+        self.timed_out = 0     # required calls that waited past the deadline
+
+    def acquire(self, optional: bool = False) -> bool:
+        """Take a slot. Returns False if an optional call should be skipped;
+        raises Overloaded if a required call can't be admitted."""
+        with self._cond:
+            if self.active < self.max_concurrency:
+                self.active += 1
+                self.admitted += 1
+                return True
+
+            if optional:
+                self.shed += 1
+                return False
+
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise Overloaded(self.name, "queue full")
+
+            # never queue past the request's own budget
+            budget = current_deadline()
+            wait = self.queue_timeout
+            if budget is not None and budget.remaining() < wait:
+                wait = budget.remaining()
+            self.waiting += 1
+            deadline = time.monotonic() + wait
+            try:
+                while self.active >= self.max_concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timed_out += 1
+                        if wait < self.queue_timeout:
+                            raise DeadlineExceeded(budget.name, self.name)
+                        raise Overloaded(self.name, "queue timeout")
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+
+            self.active += 1
+            self.admitted += 1
+            return True
+
+    def release(self) -> None:
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self, optional: bool = False):
+        """`with stage.slot(optional=True) as admitted:` — skip the work if not admitted."""
+        admitted = self.acquire(optional)
+        try:
+            yield admitted
+        finally:
+            if admitted:
+                self.release()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "active": self.active,
+                "queue_depth": self.waiting,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "shed": self.shed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+            }
+
+
+STAGES = {
+    name: AdmissionStage(name, limit, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT)
+    for name, limit in STAGE_CONCURRENCY.items()
+}
+
+
+def admission_snapshot() -> dict:
+    return {name: stage.snapshot() for name, stage in STAGES.items()}
@@ -0,0 +1,237 @@
+"""Answer generation, routed by question complexity and retrieval confidence.
+
+Three tiers, cheapest first:
+
+extractive  the best-matching sentence of the top chunk, no LLM call: for
+            short lookups ("When do staff meetings take place?") when that
+            sentence covers the question's content words and holds a
+            concrete answer the question doesn't already contain (a clock
+            time or weekday for "when", a number for "how many", a role
+            for "who")
+fast        FAST_ANSWER_MODEL over the top FAST_ANSWER_CHUNKS chunks: for
+            other non-reasoning questions the top chunk mostly covers
+full        FULL_ANSWER_MODEL over every reranked chunk (the original
+            behaviour): reasoning questions and weak retrievals
+
+The cheaper tiers also need the top chunk's hybrid search score to reach
+ROUTING_MIN_SCORE. Every check is lexical or reuses the search score (no
+model call). Routing is off by default (ANSWER_ROUTING=true turns it on)
+until evals/run_eval.py --answers, which reports accuracy, latency and
+cost per tier, shows it holds accuracy on your handbook.
+"""
+
+import os
+import re
+import logging
+from dataclasses import dataclass
+
+from app.admission import STAGES
+from app.llm_utils import openai_call
+from app.pdf_utils import page_label
+from app.query_expansion import content_words, tokenize
+from app.shared_state import state
+from app.tracing import record_usage
+
+logger = logging.getLogger(__name__)
+
+ANSWER_ROUTING = os.getenv("ANSWER_ROUTING", "false").lower() in ("1", "true", "yes")
+FULL_ANSWER_MODEL = os.getenv("FULL_ANSWER_MODEL", "gpt-4o-mini")
+FAST_ANSWER_MODEL = os.getenv("FAST_ANSWER_MODEL", "gpt-4.1-nano")
+FAST_ANSWER_CHUNKS = int(os.getenv("FAST_ANSWER_CHUNKS", "2"))
+# share of the question's content words found in the top chunk's best sentence
+EXTRACTIVE_MIN_CONFIDENCE = float(os.getenv("EXTRACTIVE_MIN_CONFIDENCE", "1.0"))
+FAST_MIN_CONFIDENCE = float(os.getenv("FAST_MIN_CONFIDENCE", "0.5"))
+SIMPLE_QUESTION_MAX_WORDS = int(os.getenv("SIMPLE_QUESTION_MAX_WORDS", "10"))
+# hybrid (relative score fusion, 0-1) score of the top reranked chunk
+ROUTING_MIN_SCORE = float(os.getenv("ROUTING_MIN_SCORE", "0.5"))
+
+TIERS = ("extractive", "fast", "full")
+
+# extracted answers longer than this read as a pasted paragraph, not an answer
+_MAX_EXTRACT_CHARS = 300
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+# a clock time or a weekday; "every", "during" and the like are not answers
+_TIME_RE = re.compile(
+    r"\b\d{1,2}[:.]\d{2}\b|\b\d{1,2}\s*(?:am|pm)\b|\b(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday)s?\b",
+    re.IGNORECASE,
+)
+_NUMBER_RE = re.compile(r"\b\d+\b|\b(?:one|two|three|four|five|six|seven|eight|nine|ten|twelve|twenty)\b",
+                        re.IGNORECASE)
+_ROLE_RE = re.compile(
+    r"\b(?:(?:deputy |assistant )?head(?:teacher)?|head of \w+|principal|line manager|(?:office|business|site) manager"
+    r"|bursar|hr|human resources|payroll|receptionist|senco|designated safeguarding lead|dsl"
+    r"|(?:form|class) tutor|head of year)\b",
+    re.IGNORECASE,
+)
+# question openers of short factual lookups, and the answer token each needs
+_LOOKUPS = {
+    ("when",): _TIME_RE,
+    ("what", "time"): _TIME_RE,
+    ("what", "day"): _TIME_RE,
+    ("how", "many"): _NUMBER_RE,
+    ("how", "much"): _NUMBER_RE,
+    ("how", "long"): _NUMBER_RE,
+    ("who",): _ROLE_RE,
+}
+# cues that the answer has to be reasoned or assembled, not looked up
+_REASONING_WORDS = {"why", "explain", "compare", "difference", "versus", "vs", "happens", "if", "unless",
+                    "otherwise", "whether"}
+
+
+@dataclass(frozen=True)
+class Route:
+    tier: str
+    complexity: str           # lookup | simple | reasoning
+    confidence: float
+    score: float | None = None  # hybrid search score of the top chunk
+    model: str | None = None
+    chunks: int | None = None  # top chunks given to the model (None = all)
+    answer: str | None = None  # extractive tier only
+
+
+def router_settings() -> dict:
+    """Everything that changes which tier answers (part of answer cache keys)."""
+    return {
+        "routing": ANSWER_ROUTING, "full": FULL_ANSWER_MODEL, "fast": FAST_ANSWER_MODEL,
+        "fast_chunks": FAST_ANSWER_CHUNKS, "extractive_min": EXTRACTIVE_MIN_CONFIDENCE,
+        "fast_min": FAST_MIN_CONFIDENCE, "simple_max_words": SIMPLE_QUESTION_MAX_WORDS,
+        "min_score": ROUTING_MIN_SCORE,
+    }
+
+
+def _lookup_shape(tokens: list[str]):
+    """(is_lookup, answer token regex or None)."""
+    for opener, shape in _LOOKUPS.items():
+        if tuple(tokens[:len(opener)]) == opener:
+            return True, shape
+    return False, None
+
+
+def classify_question(question: str) -> str:
+    tokens = tokenize(question)
+    if (
+        question.count("?") > 1
+        or any(t in _REASONING_WORDS for t in tokens)
+        # "What time is morning duty and what does it involve?"
+        or re.search(r"\band (?:what|how|who|when|where|why)\b", question.lower())
+    ):
+        return "reasoning"
+    if len(tokens) <= SIMPLE_QUESTION_MAX_WORDS and _lookup_shape(tokens)[0]:
+        return "lookup"
+    return "simple"
+
+
+def _covered(word: str, vocabulary: set[str]) -> bool:
+    # cheap plural folding: "meetings" matches "meeting" and vice versa
+    return word in vocabulary or word.rstrip("s") in vocabulary or word + "s" in vocabulary
+
+
+def has_answer_token(question: str, sentence: str) -> bool:
+    """Whether `sentence` holds the kind of answer a lookup `question` asks
+    for, other than words the question already contains ("Who is my line
+    manager?" is not answered by a sentence about "your line manager")."""
+    shape = _lookup_shape(tokenize(question))[1]
+    if shape is None:
+        return False
+    asked = question.lower()
+    return any(m.group(0).lower() not in asked for m in shape.finditer(sentence))
+
+
+def best_sentence(question: str, text: str) -> tuple[str, float]:
+    """The sentence of `text` covering most of the question's content words,
+    and the share it covers."""
+    wanted = set(content_words(question))
+    best, best_score = "", 0.0
+    for sentence in _SENTENCE_RE.split(text):
+        sentence = sentence.strip()
+        if not sentence or not wanted:
+            continue
+        vocabulary = set(tokenize(sentence))
+        score = sum(_covered(w, vocabulary) for w in wanted) / len(wanted)
+        if score > best_score:
+            best, best_score = sentence, score
+    return best, best_score
+
+
+def route_answer(question: str, top_docs: list[dict], routing: bool | None = None) -> Route:
+    """Pick the tier for `question` given its reranked (hydrated) chunks.
+
+    `routing` overrides ANSWER_ROUTING (the eval compares tiers either way).
+    """
+    complexity = classify_question(question)
+    if not (ANSWER_ROUTING if routing is None else routing) or not top_docs:
+        return Route("full", complexity, 0.0, model=FULL_ANSWER_MODEL)
+
+    score = top_docs[0].get("score")
+    sentence, confidence = best_sentence(question, top_docs[0].get("text") or "")
+    if score is None or score < ROUTING_MIN_SCORE:
+        # the reranker promoted a weak search hit (or there is no score)
+        return Route("full", complexity, confidence, score=score, model=FULL_ANSWER_MODEL)
+    if (
+        complexity == "lookup"
+        and confidence >= EXTRACTIVE_MIN_CONFIDENCE
+        and len(sentence) <= _MAX_EXTRACT_CHARS
+        and has_answer_token(question, sentence)
+    ):
+        return Route("extractive", complexity, confidence, score=score, answer=sentence)
+    if complexity != "reasoning" and confidence >= FAST_MIN_CONFIDENCE:
+        return Route("fast", complexity, confidence, score=score, model=FAST_ANSWER_MODEL,
+                     chunks=FAST_ANSWER_CHUNKS)
+    return Route("full", complexity, confidence, score=score, model=FULL_ANSWER_MODEL)
+
+
+def build_answer_prompt(query: str, top_docs: list[dict]) -> str:
+    context = "\n\n---\n\n".join(
+        f"({page_label(doc)})\n{doc['text']}" if page_label(doc) else doc["text"]
+        for doc in top_docs
+    )
+
+    return f"""
+You are an HR assistant answering questions from the staff handbook.
+Use only the following content to answer accurately and concisely:
+
+{context}
+
+Question: {query}
+Answer:
+"""
+
+
+ANSWER_SYSTEM_PROMPT = (
+    "You are a helpful HR assistant. "
+    "Answer only from the provided excerpts. "
+    "If the excerpts do not contain the answer, say that you cannot find it in the provided handbook content. "
+    "Do NOT invent or infer policy details that are not present. "
+    "Do NOT wrap the full answer in quotation marks. "
+    "Quote only short phrases when necessary."
+)
+
+
+def generate_answer(query: str, top_docs: list[dict], model: str | None = None) -> str:
+    """Answer `query` from the reranked excerpts with `model` (default: the full tier's)."""
+    prompt = build_answer_prompt(query, top_docs)
+    with STAGES["generate"].slot(), openai_call("generate") as llm:
+        response = llm.chat.completions.create(
+            model=model or FULL_ANSWER_MODEL,
+            messages=[
+                {"role": "system", "content": ANSWER_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0,
+        )
+        record_usage(response, model=model or FULL_ANSWER_MODEL, chunks=len(top_docs), prompt_chars=len(prompt))
+
+    raw = response.choices[0].message.content.strip()
+    logger.debug("Raw LLM output: %r", raw)
+
+    # --- Strip straight + curly quotes from the start/end ---
+    return re.sub(r'^[\"“”‘’]+|[\"“”‘’]+$', '', raw).strip()
+
+
+def record_tier(tier: str) -> None:
+    state.incr(f"answer_tier_{tier}")
+
+
+def router_snapshot() -> dict:
+    return {tier: state.counter(f"answer_tier_{tier}") for tier in TIERS}
@@ -0,0 +1,155 @@
+"""Circuit breakers for the OpenAI and Weaviate calls, one per operation.
+
+closed     calls go through; CIRCUIT_FAILURE_THRESHOLD consecutive failures
+           open the circuit
+open       calls fail immediately with CircuitOpen (a 503 with Retry-After,
+           like admission control) for CIRCUIT_RESET_SECONDS
+half_open  one probe call is let through (without SDK retries); success
+           closes the circuit, failure opens it again
+
+Optional stages (expansion, rerank) already fall back when their call
+fails, so an open circuit just skips them; required stages fail fast
+instead of every request sitting through full timeouts and retries.
+"""
+
+import math
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Callable
+
+from app.admission import Overloaded
+from app.deadline import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpen(Overloaded):
+    """The dependency's circuit is open; the call was not attempted."""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(name, "circuit open", retry_after=retry_after)
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self.failures = 0          # consecutive
+        self.opened = 0            # times the circuit has opened
+        self.rejected = 0          # calls failed fast while open
+        self.last_error: str | None = None
+
+    def _current_state(self) -> str:
+        # caller holds the lock
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def acquire(self) -> bool:
+        """Admit one call; returns True if it is the half-open probe.
+        Raises CircuitOpen if the call must not be attempted."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return False
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            wait = self.reset_timeout - (self._clock() - self._opened_at)
+            raise CircuitOpen(self.name, retry_after=max(1, math.ceil(wait)))
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info("Circuit %s closed", self.name)
+            self._state = CLOSED
+            self._probing = False
+            self.failures = 0
+
+    def record_failure(self, err: BaseException) -> None:
+        with self._lock:
+            self.failures += 1
+            self.last_error = f"{type(err).__name__}: {err}"[:200]
+            if self._probing or (self._state == CLOSED and self.failures >= self.failure_threshold):
+                logger.warning("Circuit %s opened after %d failures: %s", self.name, self.failures, self.last_error)
+                self._state = OPEN
+                self._opened_at = self._clock()
+                self.opened += 1
+            self._probing = False
+
+    @contextmanager
+    def guard(self, healthy_errors: tuple[type[Exception], ...] = ()):
+        """`with breaker.guard() as probing:` around one upstream call.
+
+        Admission rejections (Overloaded) and a spent request deadline
+        (DeadlineExceeded: the call wasn't made, or the budget ended it
+        before the dependency's own timeout) aren't the dependency's fault
+        and are not counted against it; `healthy_errors` (e.g. a 400 for one
+        bad input) prove the dependency is answering and count as successes.
+        """
+        probing = self.acquire()
+        try:
+            yield probing
+        except Exception as err:
+            if isinstance(err, (Overloaded, DeadlineExceeded)):
+                if probing:
+                    with self._lock:
+                        self._probing = False
+            elif isinstance(err, healthy_errors):
+                self.record_success()
+            else:
+                self.record_failure(err)
+            raise
+        self.record_success()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self._probing = False
+            self.failures = self.opened = self.rejected = 0
+            self.last_error = None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self.failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+                "last_error": self.last_error,
+            }
+
+
+BREAKERS = {
+    name: CircuitBreaker(name)
+    for name in (
+        "openai.embed", "openai.expand", "openai.rerank", "openai.generate",
+        "weaviate.search", "weaviate.insert",
+    )
+}
+
+
+def breaker_snapshot() -> dict:
+    return {name: breaker.snapshot() for name, breaker in BREAKERS.items()}
@@ -0,0 +1,206 @@
+"""Request-level time budgets, propagated to every upstream call.
+
+An entry point (ask_question, index_pdf) opens a budget with
+`request_deadline()`. It lives in a contextvar, so it follows the request
+into threadpool calls without being threaded through every signature:
+
+- OpenAI calls take their timeout from `call_timeout()` instead of the
+  client's generous default;
+- Weaviate reads (whose v4 client only has connection-wide timeouts) run
+  through `within_deadline()`, which stops waiting when the budget is spent.
+  Writes don't: one abandoned there could still commit, so inserts only
+  check the budget before starting and rely on the client's insert timeout;
+- optional stages (expansion, rerank) ask `allow_optional()` first and are
+  skipped when too little of the budget is left for the required ones.
+
+A stage that is skipped, shed or fails open calls `mark_degraded()`, so
+the caller (inside `track_degraded()`) knows not to cache the result for
+long.
+
+A spent budget raises DeadlineExceeded (504). Outside a request budget
+(CLIs, batch jobs) every helper falls back to the caller's default.
+"""
+
+import os
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+ASK_DEADLINE_SECONDS = float(os.getenv("ASK_DEADLINE_SECONDS", "30"))
+UPLOAD_DEADLINE_SECONDS = float(os.getenv("UPLOAD_DEADLINE_SECONDS", "240"))
+# optional stages only run while at least this much of the budget is left
+DEADLINE_OPTIONAL_RESERVE = float(os.getenv("DEADLINE_OPTIONAL_RESERVE_SECONDS", "10"))
+
+# Weaviate calls abandoned at the deadline finish here in the background
+# (bounded by the client's own timeouts) instead of pinning a request thread
+_UPSTREAM_THREADS = 32
+
+
+class DeadlineExceeded(Exception):
+    """The request's budget ran out; map to 504.
+
+    Raised before an upstream call, or in place of one whose timeout the
+    budget cut short, so it never proves the dependency unhealthy.
+    """
+
+    def __init__(self, name: str, stage: str | None = None):
+        super().__init__(f"Deadline for '{name}' exceeded" + (f" in {stage}" if stage else ""))
+        self.name = name
+        self.stage = stage
+
+
+class Deadline:
+    def __init__(self, seconds: float, name: str, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.seconds = seconds
+        self._clock = clock
+        self.expires_at = clock() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self._clock())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+_current: ContextVar[Deadline | None] = ContextVar("request_deadline", default=None)
+_degraded: ContextVar[set[str] | None] = ContextVar("degraded_stages", default=None)
+
+_lock = threading.Lock()
+_started: dict[str, int] = {}
+_exhausted: dict[str, int] = {}
+_optional_skipped: dict[str, int] = {}
+
+
+def _count(counter: dict[str, int], key: str) -> None:
+    with _lock:
+        counter[key] = counter.get(key, 0) + 1
+
+
+def current_deadline() -> Deadline | None:
+    return _current.get()
+
+
+def remaining() -> float | None:
+    """Seconds left in the current request's budget (None outside one)."""
+    deadline = _current.get()
+    return None if deadline is None else deadline.remaining()
+
+
+@contextmanager
+def request_deadline(seconds: float, name: str, clock: Callable[[], float] = time.monotonic):
+    """Run the block under a `seconds` budget.
+
+    Any failure once the budget is spent (an upstream timeout, a cut-short
+    wait) leaves the block as DeadlineExceeded, and is counted.
+    """
+    deadline = Deadline(seconds, name, clock)
+    token = _current.set(deadline)
+    _count(_started, name)
+    try:
+        yield deadline
+    except DeadlineExceeded:
+        _count(_exhausted, name)
+        raise
+    except Exception as err:
+        if not deadline.expired():
+            raise
+        _count(_exhausted, name)
+        raise DeadlineExceeded(name) from err
+    finally:
+        _current.reset(token)
+
+
+def call_timeout(default: float, stage: str | None = None) -> float:
+    """Timeout for one upstream call: `default`, capped at the time left.
+
+    Raises DeadlineExceeded instead of starting a call with no time left.
+    """
+    deadline = _current.get()
+    if deadline is None:
+        return default
+    left = deadline.remaining()
+    if left <= 0:
+        raise DeadlineExceeded(deadline.name, stage)
+    return min(default, left)
+
+
+def allow_optional(stage: str) -> bool:
+    """False (and counted) when an optional stage should be skipped to
+    leave the rest of the budget for the required ones."""
+    deadline = _current.get()
+    if deadline is None or deadline.remaining() >= DEADLINE_OPTIONAL_RESERVE:
+        return True
+    logger.info("Skipping %s: %.1fs left of the '%s' budget", stage, deadline.remaining(), deadline.name)
+    _count(_optional_skipped, stage)
+    mark_degraded(stage)
+    return False
+
+
+@contextmanager
+def track_degraded():
+    """Collect (into the yielded set) the optional stages skipped, shed or
+    failed inside the block, including threadpool and within_deadline hops."""
+    stages: set[str] = set()
+    token = _degraded.set(stages)
+    try:
+        yield stages
+    finally:
+        _degraded.reset(token)
+
+
+def mark_degraded(stage: str) -> None:
+    """Record that `stage` was skipped and the result is worse than usual."""
+    stages = _degraded.get()
+    if stages is not None:
+        stages.add(stage)
+
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _upstream_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_UPSTREAM_THREADS, thread_name_prefix="upstream")
+        return _executor
+
+
+def within_deadline(fn: Callable[..., Any], *args, stage: str | None = None, **kwargs) -> Any:
+    """`fn(*args, **kwargs)`, waiting no longer than the time left.
+
+    For clients without per-call timeouts. Outside a request budget the
+    call runs directly on the caller's thread.
+    """
+    if _current.get() is None:
+        return fn(*args, **kwargs)
+    timeout = call_timeout(float("inf"), stage)
+    future = _upstream_executor().submit(copy_context().run, fn, *args, **kwargs)
+    try:
+        return future.result(timeout)
+    except FutureTimeout:
+        if future.done():
+            # fn's own TimeoutError (the same class since 3.11), or it just finished
+            return future.result()
+        future.cancel()
+        raise DeadlineExceeded(_current.get().name, stage) from None
+
+
+def deadline_snapshot() -> dict:
+    with _lock:
+        return {
+            "budgets": {"ask": ASK_DEADLINE_SECONDS, "precompute": ASK_DEADLINE_SECONDS,
+                        "upload": UPLOAD_DEADLINE_SECONDS},
+            "optional_reserve": DEADLINE_OPTIONAL_RESERVE,
+            "started": dict(_started),
+            "exhausted": dict(_exhausted),
+            "optional_skipped": dict(_optional_skipped),
+        }
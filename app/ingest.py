@@ -0,0 +1,285 @@
+"""Bulk-ingest a directory of PDFs, bypassing the upload endpoint's limits.
+
+PDFs are extracted and chunked in parallel worker processes. As each file
+finishes, its chunks are deduped (exactly as /upload_pdf does) and queued
+into batches shared across files; batches are embedded and inserted by a
+thread pool, so embedding never waits on a slow PDF and small files don't
+produce small batches.
+
+Every file whose chunks have all been written is appended to a JSONL
+manifest keyed by the sha256 of its bytes. A rerun skips those files, so
+an interrupted ingest resumes where it stopped (chunks of a half-written
+file are skipped by their content hash).
+
+Usage:
+    python -m app.ingest policies/
+    python -m app.ingest policies/ --tenant acme --workers 8 --embed-concurrency 4
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+load_dotenv(BASE_DIR / "api_keys.env")
+
+from app.pdf_utils import iter_chunks, iter_numbered_pdf_pages  # noqa: E402
+from app.weaviate_utils import (  # noqa: E402
+    COLLECTION,
+    connect,
+    ensure_schema,
+    prepare_chunks,
+    tenant_collection,
+    write_objects,
+)
+
+logger = logging.getLogger("hr_chatbot.ingest")
+
+DEFAULT_MANIFEST = "ingest_manifest.jsonl"
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extract_file(path: str, max_pages: int | None = None) -> list[dict]:
+    """Chunks of one PDF (runs in a worker process)."""
+    return list(iter_chunks(iter_numbered_pdf_pages(path, max_pages=max_pages)))
+
+
+class Manifest:
+    """Append-only JSONL record of files fully ingested into a collection."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._done: set[tuple[str, str]] = set()
+        if self.path.exists():
+            for line in self.path.read_text().splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # a line cut short by an interrupted write
+                    continue
+                self._done.add((entry["collection"], entry["sha256"]))
+
+    def done(self, collection: str, sha256: str) -> bool:
+        return (collection, sha256) in self._done
+
+    def record(self, collection: str, sha256: str, **entry) -> None:
+        with self._lock:
+            self._done.add((collection, sha256))
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"collection": collection, "sha256": sha256, **entry}) + "\n")
+
+
+def ingest_directory(
+    client,
+    directory: str | Path,
+    collection: str | None = None,
+    manifest: Manifest | None = None,
+    workers: int = 4,
+    embed_concurrency: int = 4,
+    batch_size: int = 64,
+    max_pages: int | None = None,
+) -> dict:
+    """Ingest every PDF under `directory` into `collection`.
+
+    `workers` is the number of extraction processes (0 extracts in this
+    process). Returns counts plus docs/min and chunks/s.
+    """
+    collection = collection or COLLECTION
+    col = client.collections.get(collection)
+    paths = sorted(p for p in Path(directory).rglob("*") if p.is_file() and p.suffix.lower() == ".pdf")
+
+    stats = Counter()
+    failed: list[str] = []
+    started = time.perf_counter()
+
+    todo = []
+    for path in paths:
+        sha = file_sha256(path)
+        if manifest is not None and manifest.done(collection, sha):
+            stats["skipped_files"] += 1
+        else:
+            todo.append((path, sha))
+    logger.info("%d PDFs found, %d already ingested", len(paths), stats["skipped_files"])
+
+    # per-file bookkeeping: chunks still waiting to be written
+    outstanding: dict[Path, int] = {}
+    file_info: dict[Path, dict] = {}
+    # content hashes queued this run, so files still in flight don't
+    # insert each other's chunks (their near-duplicates can still slip by)
+    queued_hashes: set[str] = set()
+    batch: list[tuple[Path, dict]] = []
+    in_flight: dict[Future, list[tuple[Path, dict]]] = {}
+
+    def finish_file(path: Path) -> None:
+        info = file_info.pop(path)
+        stats["files"] += 1
+        if manifest is not None:
+            manifest.record(collection, info["sha256"], name=path.name,
+                            chunks=info["chunks"], inserted=info["inserted"])
+
+    def collect(futures) -> None:
+        for future in futures:
+            written = in_flight.pop(future)
+            try:
+                future.result()
+            except Exception:
+                # leave the files out of the manifest so a rerun retries them
+                logger.exception("Insert batch failed")
+                for path in {path for path, _ in written}:
+                    if path in file_info:
+                        file_info.pop(path)
+                        outstanding.pop(path, None)
+                        failed.append(str(path))
+                continue
+            stats["inserted"] += len(written)
+            for path, _ in written:
+                if path not in file_info:
+                    continue
+                file_info[path]["inserted"] += 1
+                outstanding[path] -= 1
+                if outstanding[path] == 0:
+                    del outstanding[path]
+                    finish_file(path)
+
+    def submit(pool: ThreadPoolExecutor) -> None:
+        nonlocal batch
+        # bound memory: at most two batches queued per embedding thread
+        while len(in_flight) >= 2 * embed_concurrency:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            collect(done)
+        in_flight[pool.submit(write_objects, col, [props for _, props in batch])] = batch
+        batch = []
+
+    def enqueue(path: Path, sha: str, chunks: list[dict], pool: ThreadPoolExecutor) -> None:
+        stats["chunks"] += len(chunks)
+        to_insert, file_stats = prepare_chunks(col, chunks, path.name)
+        stats["skipped_existing"] += file_stats["skipped_existing"]
+        stats["near_duplicates"] += file_stats["near_duplicates"]
+        fresh = [p for p in to_insert if p["content_hash"] not in queued_hashes]
+        stats["skipped_existing"] += len(to_insert) - len(fresh)
+        queued_hashes.update(p["content_hash"] for p in fresh)
+
+        file_info[path] = {"sha256": sha, "chunks": len(chunks), "inserted": 0}
+        if not fresh:
+            finish_file(path)
+            return
+        outstanding[path] = len(fresh)
+        for props in fresh:
+            batch.append((path, props))
+            if len(batch) >= batch_size:
+                submit(pool)
+
+    def extracted(path: Path, sha: str, result, pool: ThreadPoolExecutor) -> None:
+        try:
+            chunks = result()
+        except Exception as err:
+            logger.warning("Skipping %s: %s", path, err)
+            failed.append(str(path))
+            return
+        if not chunks:
+            logger.warning("Skipping %s: no extractable text", path)
+            failed.append(str(path))
+            return
+        enqueue(path, sha, chunks, pool)
+        logger.info("Extracted %s (%d chunks); %d/%d files done", path.name, len(chunks),
+                    stats["files"], len(todo))
+
+    with ThreadPoolExecutor(max_workers=embed_concurrency) as embed_pool:
+        if workers > 0:
+            with ProcessPoolExecutor(max_workers=workers) as extract_pool:
+                futures = {
+                    extract_pool.submit(extract_file, str(path), max_pages): (path, sha)
+                    for path, sha in todo
+                }
+                for future in as_completed(futures):
+                    path, sha = futures[future]
+                    extracted(path, sha, future.result, embed_pool)
+        else:
+            for path, sha in todo:
+                extracted(path, sha, lambda: extract_file(str(path), max_pages), embed_pool)
+
+        if batch:
+            submit(embed_pool)
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            collect(done)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "files": stats["files"],
+        "skipped_files": stats["skipped_files"],
+        "failed": failed,
+        "chunks": stats["chunks"],
+        "inserted": stats["inserted"],
+        "skipped_existing": stats["skipped_existing"],
+        "near_duplicates": stats["near_duplicates"],
+        "seconds": elapsed,
+        "docs_per_min": stats["files"] / elapsed * 60 if elapsed else 0.0,
+        "chunks_per_s": stats["inserted"] / elapsed if elapsed else 0.0,
+    }
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="directory searched recursively for *.pdf")
+    parser.add_argument("--tenant", default=None, help="ingest into this tenant's collection")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="extraction processes (0 = extract in this process)")
+    parser.add_argument("--embed-concurrency", type=int, default=4, help="concurrent embed + insert batches")
+    parser.add_argument("--batch-size", type=int, default=64, help="chunks per embedding request")
+    parser.add_argument("--max-pages", type=int, default=None, help="pages read per PDF (default: all)")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST,
+                        help=f"resume manifest (default {DEFAULT_MANIFEST})")
+    args = parser.parse_args()
+
+    client = connect(os.environ["WEAVIATE_URL"], os.environ["WEAVIATE_API_KEY"])
+    try:
+        if args.tenant:
+            collection = tenant_collection(client, args.tenant, create=True)
+        else:
+            ensure_schema(client)
+            collection = COLLECTION
+        stats = ingest_directory(
+            client, args.directory, collection,
+            manifest=Manifest(args.manifest),
+            workers=args.workers,
+            embed_concurrency=args.embed_concurrency,
+            batch_size=args.batch_size,
+            max_pages=args.max_pages,
+        )
+    finally:
+        client.close()
+
+    print(f"Ingested {stats['files']} PDFs into '{collection}' in {stats['seconds']:.1f}s: "
+          f"{stats['inserted']} chunks inserted, {stats['skipped_existing']} already present, "
+          f"{stats['near_duplicates']} near-duplicates; {stats['skipped_files']} files skipped "
+          f"(in manifest), {len(stats['failed'])} failed.")
+    print(f"{stats['docs_per_min']:.1f} docs/min, {stats['chunks_per_s']:.1f} chunks/s")
+    for path in stats["failed"]:
+        print(f"  failed: {path}")
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
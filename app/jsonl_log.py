@@ -0,0 +1,131 @@
+"""Append-only JSONL files, rotated by size and written off the caller's thread.
+
+Used by the query log and the trace exporter: `write()` only puts the
+entry on a queue. A logging QueueListener thread serializes it and
+appends it through a RotatingFileHandler (path, path.1 … path.N), so
+even the JSON encoding stays off the caller's thread.
+
+Every uvicorn worker appends to the same file. Each line is one append
+(O_APPEND), and rotation happens under an exclusive lock on path.lock;
+a worker whose file was rotated away by another reopens the new one
+before writing, so no worker writes into, or rotates over, a backup.
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import logging
+from logging.handlers import QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class _SharedRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler for a file that several processes append to."""
+
+    def __init__(self, path: Path, **kwargs):
+        super().__init__(path, **kwargs)
+        self._lock_path = path.with_name(f"{path.name}.lock")
+        self._lock_file = None
+
+    def _reopen_if_rotated(self) -> None:
+        if self.stream is None:
+            return
+        try:
+            current = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            current = None
+        opened = os.fstat(self.stream.fileno())
+        if current is None or (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino):
+            self.stream.close()
+            self.stream = None  # reopened (as the current file) by the next write
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if fcntl is None:
+            super().emit(record)
+            return
+        if self._lock_file is None:
+            self._lock_file = open(self._lock_path, "a")
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            self._reopen_if_rotated()
+            super().emit(record)
+            self.flush()
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def close(self) -> None:
+        super().close()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+class _JsonlListener(QueueListener):
+    def prepare(self, entry: dict) -> logging.LogRecord:
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str)
+        return logging.makeLogRecord({"msg": line})
+
+
+class JsonlLog:
+    """Append-only JSONL file, rotated by size and written off the caller's thread."""
+
+    def __init__(self, path: str | Path, max_bytes: int, backups: int):
+        self.path = Path(path)
+        self.backups = backups
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._handler = _SharedRotatingFileHandler(self.path, maxBytes=max_bytes, backupCount=backups,
+                                                   encoding="utf-8", delay=True)
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+        self._listener: QueueListener | None = None
+        self._lock = threading.Lock()
+        self.disabled = False
+        atexit.register(self.flush)
+
+    def write(self, entry: dict) -> None:
+        if self.disabled:
+            return
+        if self._listener is None:
+            with self._lock:
+                if self._listener is None:
+                    try:
+                        self.path.parent.mkdir(parents=True, exist_ok=True)
+                    except OSError as err:
+                        # logging must never fail a request
+                        logger.warning("Not writing %s: %s", self.path, err)
+                        self.disabled = True
+                        return
+                    self._listener = _JsonlListener(self._queue, self._handler)
+                    self._listener.start()
+        self._queue.put(entry)
+
+    def flush(self) -> None:
+        """Write out everything queued (the next write restarts the thread)."""
+        with self._lock:
+            if self._listener is not None:
+                self._listener.stop()
+                self._listener = None
+            self._handler.close()
+
+    def files(self) -> list[Path]:
+        """Oldest first: path.N … path.1, path."""
+        rotated = [self.path.with_name(f"{self.path.name}.{i}") for i in range(self.backups, 0, -1)]
+        return [p for p in (*rotated, self.path) if p.exists()]
+
+    def entries(self) -> Iterator[dict]:
+        for path in self.files():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # a line still being written
@@ -1,48 +1,133 @@
 # Import relevant libraries and modules
-from openai import OpenAI
+from openai import APITimeoutError, BadRequestError, OpenAI, NOT_GIVEN
+import os
 import logging
 import re
+import threading
+from contextlib import contextmanager
 from typing import List, Dict, Any
 
+from app.admission import STAGES
+from app.circuit_breaker import BREAKERS
+from app.deadline import DeadlineExceeded, allow_optional, call_timeout, current_deadline, mark_degraded
+from app.retrieval_settings import current_settings
+from app.shared_state import cache_key, cached, state
+from app.tracing import record_usage, span
+
 logger = logging.getLogger(__name__)
 
 # SDK default timeout is 600s — a hung call would pin a worker for 10 minutes
-client = OpenAI(timeout=60, max_retries=2)
+OPENAI_TIMEOUT_SECONDS = 60
+# Built on first use, so importing (e.g. for an offline eval replay) needs
+# no API key
+client: OpenAI | None = None
+_client_lock = threading.Lock()
+
+
+def base_client() -> OpenAI:
+    global client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                client = OpenAI(timeout=OPENAI_TIMEOUT_SECONDS, max_retries=2)
+    return client
+
+
+def llm_client(stage: str | None = None) -> OpenAI:
+    """`client`, or under a request deadline a copy whose timeout is the
+    time left (and no retries, which could only overrun the budget)."""
+    base = base_client()
+    if current_deadline() is None:
+        return base
+    return base.with_options(timeout=call_timeout(OPENAI_TIMEOUT_SECONDS, stage), max_retries=0)
+
+
+@contextmanager
+def openai_call(stage: str):
+    """`with openai_call("embed") as llm:` — llm_client(stage) under the
+    stage's circuit breaker, traced as an `openai.<stage>` span. Fails fast
+    (CircuitOpen) while the circuit is open; the half-open probe is sent
+    without retries. A timeout the request budget set (shorter than
+    OPENAI_TIMEOUT_SECONDS) is raised as DeadlineExceeded, which the
+    breaker doesn't count against OpenAI."""
+    deadline = current_deadline()
+    budget_capped = deadline is not None and deadline.remaining() < OPENAI_TIMEOUT_SECONDS
+    llm = llm_client(stage)
+    breaker = BREAKERS[f"openai.{stage}"]
+    with span(f"openai.{stage}"), breaker.guard(healthy_errors=(BadRequestError,)) as probing:
+        try:
+            yield llm.with_options(max_retries=0) if probing else llm
+        except APITimeoutError as err:
+            if not budget_capped:
+                raise
+            raise DeadlineExceeded(deadline.name, stage) from err
 
 EMBED_MODEL = "text-embedding-3-small"
+# Shortened embeddings (e.g. 512) for a smaller, faster index. Must match the
+# collection's vectors, so ingestion and queries always read the same setting.
+EMBED_DIMENSIONS = int(os.getenv("EMBED_DIMENSIONS", "0")) or None
 QUERY_EXPAND_MODEL = "gpt-4.1-mini"
 RERANK_MODEL = "gpt-4o-mini"
 
 
 # --- Embeddings ---
 
-def embed_text(text: str) -> list[float]:
-    """Create OpenAI embedding for ONE chunk."""
-    response = client.embeddings.create(
-        model=EMBED_MODEL,
-        input=text
-    )
-    return response.data[0].embedding
+def embed_text(text: str, dimensions: int | None = None) -> list[float]:
+    """Create OpenAI embedding for ONE chunk (cached, shared across workers)."""
+    dimensions = dimensions or EMBED_DIMENSIONS
+
+    def embed() -> list[float]:
+        with STAGES["embed"].slot(), openai_call("embed") as llm:
+            response = llm.embeddings.create(
+                model=EMBED_MODEL,
+                input=text,
+                dimensions=dimensions or NOT_GIVEN,
+            )
+            record_usage(response, inputs=1, input_chars=len(text))
+        return response.data[0].embedding
 
+    return cached("embedding", cache_key(EMBED_MODEL, dimensions, text), embed)
 
-def embed_texts(texts: list[str]) -> list[list[float]]:
+
+def embed_texts(texts: list[str], dimensions: int | None = None) -> list[list[float]]:
     """
     Create OpenAI embeddings for MANY chunks in a single request (faster + more reliable).
     Returns a list of vectors aligned with `texts`.
+    `dimensions` overrides EMBED_DIMENSIONS (used when migrating collections).
     """
     if not texts:
         return []
-    response = client.embeddings.create(
-        model=EMBED_MODEL,
-        input=texts
-    )
+    with STAGES["embed"].slot(), openai_call("embed") as llm:
+        response = llm.embeddings.create(
+            model=EMBED_MODEL,
+            input=texts,
+            dimensions=dimensions or EMBED_DIMENSIONS or NOT_GIVEN,
+        )
+        record_usage(response, inputs=len(texts), input_chars=sum(len(t) for t in texts))
     return [d.embedding for d in response.data]
 
 
+def embed_queries(texts: list[str]) -> list[list[float]]:
+    """embed_texts for questions: cached vectors are reused and only the
+    misses are sent, in one request."""
+    keys = [cache_key(EMBED_MODEL, EMBED_DIMENSIONS, text) for text in texts]
+    vectors = [state.get("embedding", key) for key in keys]
+    misses = [i for i, vec in enumerate(vectors) if vec is None]
+    if misses:
+        for i, vec in zip(misses, embed_texts([texts[i] for i in misses])):
+            state.set("embedding", keys[i], vec)
+            vectors[i] = vec
+    return vectors
+
+
 # --- Query expansion ---
 
 def expand_query(query: str) -> str:
-    """Use GPT to expand a short query into a more detailed search query."""
+    """Use GPT to expand a short query into a more detailed search query.
+
+    Optional stage: under overload, or with little of the request's
+    deadline left, the original query is used unexpanded.
+    """
     try:
         prompt = f"""Expand the following short questions into a more detailed search query
 that includes synonyms and related HR terms, but also restate the keywords clearly.
@@ -59,33 +144,37 @@ Now expand this query in the same way:
 Q: {query}
 Expanded:
 """
-        response = client.chat.completions.create(
-            model=QUERY_EXPAND_MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0
-        )
+        if not allow_optional("expand"):
+            return query
+        with STAGES["expand"].slot(optional=True) as admitted:
+            if not admitted:
+                logger.info("Expansion shed under load")
+                mark_degraded("expand")
+                return query
+            with openai_call("expand") as llm:
+                response = llm.chat.completions.create(
+                    model=QUERY_EXPAND_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0
+                )
+                record_usage(response, prompt_chars=len(prompt))
         return response.choices[0].message.content.strip()
     except Exception as e:
         logger.warning("Query expansion failed: %s", e)
+        mark_degraded("expand")
         return query
 
 
 # --- Reranking ---
 
-def rerank_chunks_with_llm(query: str, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """
-    Rerank retrieved chunks using GPT reasoning.
-    `chunks` is a list of dicts:
-    [{"text": "...", "chunk_index": 1, "score": 0.12}, ...]
-    Returns the same dicts ordered by relevance.
-    """
-    if not chunks:
-        return []
-
+def build_rerank_prompt(query: str, chunks: List[Dict[str, Any]], max_chars: int | None = None) -> str:
+    """The reranker's user prompt: the first `max_chars` (default: the
+    rerank_chars setting) of each chunk's snippet or text, numbered from 1."""
+    max_chars = max_chars or current_settings().rerank_chars
     # Keep prompt small & consistent
     chunk_list_parts = []
     for i, chunk in enumerate(chunks):
-        clean_text = chunk.get("text", "")[:400].strip().replace("\n", " ")
+        clean_text = (chunk.get("snippet") or chunk.get("text", ""))[:max_chars].strip().replace("\n", " ")
         chunk_index = chunk.get("chunk_index")
         score = chunk.get("score")
         chunk_list_parts.append(
@@ -93,7 +182,7 @@ def rerank_chunks_with_llm(query: str, chunks: List[Dict[str, Any]]) -> List[Dic
         )
     chunk_list = "\n\n".join(chunk_list_parts)
 
-    rerank_prompt = f"""
+    return f"""
 You are a precise HR assistant that ranks excerpts from a staff handbook
 by how relevant they are to the user's question.
 
@@ -106,15 +195,40 @@ Return ONLY the list of excerpt numbers, separated by commas, in descending orde
 Example: 3, 1, 2
 """.strip()
 
+
+def rerank_chunks_with_llm(query: str, chunks: List[Dict[str, Any]],
+                           max_chars: int | None = None) -> List[Dict[str, Any]]:
+    """
+    Rerank retrieved chunks using GPT reasoning.
+    `chunks` is a list of dicts:
+    [{"text": "...", "chunk_index": 1, "score": 0.12}, ...]
+    carrying either the full `text` or just its stored `snippet`.
+    Returns the same dicts ordered by relevance (original order if the
+    rerank stage is shed under load or skipped to save the deadline).
+    """
+    if not chunks:
+        return []
+
+    rerank_prompt = build_rerank_prompt(query, chunks, max_chars=max_chars)
+
     try:
-        response = client.chat.completions.create(
-            model=RERANK_MODEL,
-            messages=[
-                {"role": "system", "content": "You are a factual and consistent reranker."},
-                {"role": "user", "content": rerank_prompt}
-            ],
-            temperature=0
-        )
+        if not allow_optional("rerank"):
+            return chunks
+        with STAGES["rerank"].slot(optional=True) as admitted:
+            if not admitted:
+                logger.info("Rerank shed under load")
+                mark_degraded("rerank")
+                return chunks
+            with openai_call("rerank") as llm:
+                response = llm.chat.completions.create(
+                    model=RERANK_MODEL,
+                    messages=[
+                        {"role": "system", "content": "You are a factual and consistent reranker."},
+                        {"role": "user", "content": rerank_prompt}
+                    ],
+                    temperature=0
+                )
+                record_usage(response, candidates=len(chunks), prompt_chars=len(rerank_prompt))
         text_output = response.choices[0].message.content.strip()
         logger.debug("Reranker raw output: %s", text_output)
 
@@ -133,5 +247,6 @@ Example: 3, 1, 2
 
     except Exception as e:
         logger.warning("Rerank failed: %s", e)
+        mark_degraded("rerank")
         # Fallback: return original order
         return chunks
@@ -1,25 +1,71 @@
-
 from fastapi import FastAPI, Request, UploadFile, Form, HTTPException
-from fastapi.responses import RedirectResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse, StreamingResponse
 import os
+import hmac
+import json
+import asyncio
 import logging
-import requests
-import gradio as gr
-import re
+import itertools
+import time
 from contextlib import asynccontextmanager
+from dataclasses import asdict
 from fastapi.concurrency import run_in_threadpool
-from uuid import uuid4
 from dotenv import load_dotenv
 from pathlib import Path
+from typing import Callable
 from slowapi import Limiter, _rate_limit_exceeded_handler
+from starlette.formparsers import MultiPartParser
 from slowapi.errors import RateLimitExceeded
+from limits import parse as parse_rate_limit
+from pydantic import BaseModel
 
 BASE_DIR = Path(__file__).resolve().parent.parent  # goes from app/ -> project root
 load_dotenv(BASE_DIR / "api_keys.env")
 
-from app.pdf_utils import extract_text_from_pdf, chunk_text
-from app.llm_utils import rerank_chunks_with_llm, client as openai_client
-from app.weaviate_utils import connect, insert_chunks, ensure_schema, search_weaviate
+from app.admission import Overloaded, admission_snapshot
+from app.answer_router import generate_answer, record_tier, route_answer, router_settings, router_snapshot
+from app.circuit_breaker import breaker_snapshot
+from app.deadline import (
+    ASK_DEADLINE_SECONDS,
+    UPLOAD_DEADLINE_SECONDS,
+    DeadlineExceeded,
+    deadline_snapshot,
+    request_deadline,
+    track_degraded,
+)
+from app.pdf_utils import PdfSource, iter_numbered_pdf_pages, iter_chunks
+from app.llm_utils import rerank_chunks_with_llm, embed_queries
+from app.mmr import MMR_ENABLED, MMR_K
+from app.query_expansion import build_search_queries, corpus_vocabulary
+from app.query_log import (
+    FAQ_PRECOMPUTE_TOP_N, claim, hot_questions, log_query, normalize_query, query_log_snapshot,
+    run_in_background, warm_hot_set,
+)
+from app.retrieval_settings import current_settings, update_settings
+from app.tracing import TraceMiddleware, current_span, span
+from app.sessions import (
+    contextual_question,
+    follow_up_docs,
+    load_session,
+    record_turn,
+    session_snapshot,
+    valid_session_id,
+)
+from app.profiler import profiler
+from app.shared_state import cache_key, index_generation, limiter_storage_uri, state as shared_state
+from app.weaviate_utils import (
+    BackgroundConnection,
+    connect,
+    insert_chunks,
+    ensure_schema,
+    learn_corpus_vocabulary,
+    search_weaviate,
+    hybrid_search,
+    hydrate_docs,
+    collection_name,
+    tenant_collection,
+    valid_tenant,
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("hr_chatbot")
@@ -36,7 +82,25 @@ def client_ip(request: Request) -> str:
 UPLOAD_RATE_LIMIT = os.getenv("UPLOAD_RATE_LIMIT", "3/day")
 ASK_RATE_LIMIT = os.getenv("ASK_RATE_LIMIT", "20/hour")
 
-limiter = Limiter(key_func=client_ip)
+# buckets live in SHARED_STATE_PATH when set, so N workers enforce one limit
+limiter = Limiter(key_func=client_ip, storage_uri=limiter_storage_uri())
+# /ask_question and /ask_batch draw on one per-client question bucket
+ASK_QUOTA_SCOPE = "questions"
+
+
+def charge_ask_quota(request: Request, questions: int) -> None:
+    """Count `questions` hits against the caller's /ask_question bucket, so a
+    batch can't be used to get around the per-question limit."""
+    if not limiter.limiter.hit(
+        parse_rate_limit(ASK_RATE_LIMIT),
+        client_ip(request),
+        ASK_QUOTA_SCOPE,
+        cost=questions,
+    ):
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded: {ASK_RATE_LIMIT} questions per client.",
+        )
 
 # ENV + CONNECTION
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -51,91 +115,165 @@ if not WEAVIATE_API_KEY:
     raise ValueError("❌ Missing WEAVIATE_API_KEY in environment variables.")
 
 
+# Seconds between reconnect attempts grow up to this while Weaviate is down
+WEAVIATE_RECONNECT_MAX_BACKOFF = float(os.getenv("WEAVIATE_RECONNECT_MAX_BACKOFF", "60"))
+
+
+# A worker re-reads the expansion vocabulary at most this often after
+# another worker (or the ingest CLI) indexed chunks; until then its local
+# expansions go unfiltered, like every other stale worker's
+VOCABULARY_REFRESH_SECONDS = 60
+
+
+def refresh_vocabulary(client) -> None:
+    vocab = corpus_vocabulary
+    if vocab.complete and not vocab.current() and time.monotonic() - vocab.seeded_at >= VOCABULARY_REFRESH_SECONDS:
+        run_in_background("vocabulary", lambda: learn_corpus_vocabulary(client))
+
+
+def on_weaviate_connect(client) -> None:
+    ensure_schema(client)  # create collection once
+    # local expansions are limited to the handbook's terms once they're all read
+    run_in_background("vocabulary", lambda: learn_corpus_vocabulary(client))
+    schedule_faq_precompute(client)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    app.state.weaviate = None
-    try:
-        app.state.weaviate = connect(WEAVIATE_URL, WEAVIATE_API_KEY)
-        ensure_schema(app.state.weaviate)   # create collection once
-        logger.info("Connected to Weaviate")
-    except Exception:
-        logger.exception("Failed to connect to Weaviate")
+    # connect in the background: the worker serves (503 from Weaviate-backed
+    # endpoints) straight away and keeps retrying instead of staying dead
+    app.state.weaviate_connection = BackgroundConnection(
+        lambda: connect(WEAVIATE_URL, WEAVIATE_API_KEY),
+        on_connect=on_weaviate_connect,
+        max_backoff=WEAVIATE_RECONNECT_MAX_BACKOFF,
+    ).start()
+    # restarts don't start cold: warm the caches for the most asked questions
+    run_in_background("hot_set", warm_hot_set)
     yield
-    if app.state.weaviate:
-        app.state.weaviate.close()
-        logger.info("Weaviate connection closed")
+    app.state.weaviate_connection.close()
+    logger.info("Weaviate connection closed")
 
 
 app = FastAPI(title="HR Q&A Bot", lifespan=lifespan)
+# a trace id and span tree per API request (and the profiler's request hook)
+app.add_middleware(TraceMiddleware, on_request=profiler.request_started)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
 
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    """Shed load fast instead of queueing behind saturated LLM calls."""
+    logger.warning("Shedding request: %s", exc)
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "The service is busy. Please retry shortly."},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_handler(request: Request, exc: DeadlineExceeded):
+    """The request's time budget ran out somewhere upstream."""
+    logger.warning("Request timed out: %s", exc)
+    return JSONResponse(
+        status_code=504,
+        content={"detail": "The request took too long. Please retry."},
+    )
+
+
 def get_weaviate(request: Request):
-    wv = getattr(request.app.state, "weaviate", None)
+    connection = getattr(request.app.state, "weaviate_connection", None)
+    wv = connection.client if connection else None
     if not wv:
-        raise HTTPException(status_code=503, detail="Weaviate is not connected")
+        raise HTTPException(status_code=503, detail="Weaviate is not connected",
+                            headers={"Retry-After": "5"})
+    refresh_vocabulary(wv)
     return wv
 
-# UPLOAD DIRECTORY
-UPLOAD_DIR = Path("/home/uploads") if os.getenv("WEBSITE_SITE_NAME") else Path("uploads")
-try:
-    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-except OSError:
-    # e.g. /home not writable for the container user — fall back to a local dir
-    UPLOAD_DIR = Path("uploads")
-    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+# UPLOAD BUFFERING: Starlette spools each uploaded file in memory up to this
+# size and in local temp storage beyond it; extraction reads that buffer in
+# place, so uploads never round-trip through (network-backed) /home
+UPLOAD_SPOOL_MB = int(os.getenv("UPLOAD_SPOOL_MB", "32"))
+MultiPartParser.spool_max_size = UPLOAD_SPOOL_MB * 1024 * 1024
 
 # UPLOAD LIMITS (bound the worst-case cost of a single upload)
 MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "25"))
 MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", "100"))
 MAX_CHUNKS_PER_UPLOAD = int(os.getenv("MAX_CHUNKS_PER_UPLOAD", "500"))
 
+# TENANTS: each listed tenant gets its own collection; empty = shared collection only
+ALLOWED_TENANTS = {t.strip().lower() for t in os.getenv("ALLOWED_TENANTS", "").split(",") if t.strip()}
+if any(not valid_tenant(t) for t in ALLOWED_TENANTS):
+    # fail at startup rather than with a 500 on the tenant's first request
+    raise ValueError(
+        "ALLOWED_TENANTS names may only contain letters, digits and underscores (max 48 characters): "
+        + ", ".join(sorted(t for t in ALLOWED_TENANTS if not valid_tenant(t)))
+    )
+
+
+def normalize_tenant(tenant: str | None) -> str | None:
+    """A request's `tenant`, lowercased, or None; 400 if not allowed."""
+    tenant = (tenant or "").strip().lower() or None
+    if tenant is not None and tenant not in ALLOWED_TENANTS:
+        raise HTTPException(status_code=400, detail="Unknown tenant.")
+    return tenant
+
 
-async def save_upload(file: UploadFile, save_path: Path) -> None:
-    """Stream the upload to disk, enforcing the PDF magic bytes and size cap."""
-    max_bytes = MAX_UPLOAD_MB * 1024 * 1024
-    header = await file.read(5)
+def resolve_tenant(wv, tenant: str | None, create: bool = False) -> str | None:
+    """Collection for a request's `tenant` (the shared one when omitted).
+
+    Returns None when searching a tenant that has no uploads yet.
+    """
+    return tenant_collection(wv, normalize_tenant(tenant), create=create)
+
+
+def check_upload(file: UploadFile) -> None:
+    """Enforce the PDF magic bytes and size cap on the spooled upload."""
+    buffer = file.file
+    header = buffer.read(5)
     if header != b"%PDF-":
         raise HTTPException(status_code=400, detail="File is not a valid PDF.")
 
-    size = len(header)
-    try:
-        with open(save_path, "wb") as f:
-            f.write(header)
-            while chunk := await file.read(1 << 20):
-                size += len(chunk)
-                if size > max_bytes:
-                    raise HTTPException(
-                        status_code=413,
-                        detail=f"File exceeds the {MAX_UPLOAD_MB} MB upload limit.",
-                    )
-                f.write(chunk)
-    except HTTPException:
-        save_path.unlink(missing_ok=True)
-        raise
+    size = file.size if file.size is not None else buffer.seek(0, os.SEEK_END)
+    if size > MAX_UPLOAD_MB * 1024 * 1024:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File exceeds the {MAX_UPLOAD_MB} MB upload limit.",
+        )
+    buffer.seek(0)
 
 
-def index_pdf(save_path: Path, safe_name: str, wv) -> dict:
-    """Extract, chunk, and insert a saved PDF (blocking; run in a threadpool)."""
-    try:
-        text = extract_text_from_pdf(save_path, max_pages=MAX_PDF_PAGES)
-    except ValueError as err:
-        # pdf_utils uses ValueError for "no extractable text" / too many pages
-        raise HTTPException(status_code=400, detail=str(err))
+def index_pdf(source: PdfSource, safe_name: str, wv, collection: str | None = None) -> dict:
+    """Extract, chunk, and insert a PDF (blocking; run in a threadpool).
 
-    if not text or not text.strip():
-        raise HTTPException(status_code=400, detail="No extractable text found in this PDF.")
+    `source` is a path or the upload's buffer. Pages are streamed into the
+    chunker, and extraction stops once one chunk more than
+    MAX_CHUNKS_PER_UPLOAD has been produced. Every embedding and Weaviate
+    call shares one UPLOAD_DEADLINE_SECONDS budget.
+    """
+    with request_deadline(UPLOAD_DEADLINE_SECONDS, "upload"), span("index_pdf", document=safe_name):
+        return _index_pdf(source, safe_name, wv, collection)
+
+
+def _index_pdf(source: PdfSource, safe_name: str, wv, collection: str | None) -> dict:
+    pages = iter_numbered_pdf_pages(source, max_pages=MAX_PDF_PAGES)
+    with span("extract_chunks") as s:
+        try:
+            chunks = list(itertools.islice(iter_chunks(pages), MAX_CHUNKS_PER_UPLOAD + 1))
+        except ValueError as err:
+            # pdf_utils uses ValueError for unreadable PDFs / too many pages
+            raise HTTPException(status_code=400, detail=str(err))
+        s.set(chunks=len(chunks), text_chars=sum(len(c["text"]) for c in chunks))
 
-    chunks = chunk_text(text)
     if not chunks:
-        raise HTTPException(status_code=400, detail="PDF produced 0 chunks after processing.")
+        raise HTTPException(status_code=400, detail="No extractable text found in this PDF.")
 
     truncated = len(chunks) > MAX_CHUNKS_PER_UPLOAD
     chunks = chunks[:MAX_CHUNKS_PER_UPLOAD]
 
     # NO MORE SCHEMA WIPE PER UPLOAD
-    result = insert_chunks(wv, chunks, safe_name)
+    result = insert_chunks(wv, chunks, safe_name, collection=collection)
 
     message = f"✅ PDF '{safe_name}' processed successfully."
     if truncated:
@@ -148,14 +286,15 @@ def index_pdf(save_path: Path, safe_name: str, wv) -> dict:
         "inserted": result["inserted"],
         "skipped_existing": result["skipped_existing"],
         "unique_in_upload": result["unique_in_upload"],
+        "near_duplicates": result["near_duplicates"],
     }
 
 
 # API ENDPOINTS
 @app.post("/upload_pdf")
 @limiter.limit(UPLOAD_RATE_LIMIT)
-async def upload_pdf(request: Request, file: UploadFile):
-    """Upload and index a PDF file in Weaviate"""
+async def upload_pdf(request: Request, file: UploadFile, tenant: str | None = Form(None)):
+    """Upload and index a PDF file in Weaviate (in `tenant`'s collection if given)"""
     wv = get_weaviate(request)
 
     if file is None:
@@ -169,209 +308,450 @@ async def upload_pdf(request: Request, file: UploadFile):
     ):
         raise HTTPException(status_code=400, detail="Only PDF files are accepted.")
 
-    save_path = UPLOAD_DIR / f"{uuid4().hex[:8]}-{safe_name}"
-    await save_upload(file, save_path)
-
     try:
-        return await run_in_threadpool(index_pdf, save_path, safe_name, wv)
-    except HTTPException:
+        check_upload(file)
+        collection = await run_in_threadpool(resolve_tenant, wv, tenant, True)
+        # extraction reads the spooled upload buffer directly (no copy to disk)
+        result = await run_in_threadpool(index_pdf, file.file, safe_name, wv, collection)
+        # the upload retired every cached answer; recompute the most asked ones
+        schedule_faq_precompute(wv)
+        return result
+    except (HTTPException, Overloaded, DeadlineExceeded):
         raise
     except Exception:
         logger.exception("Upload failed")
         raise HTTPException(status_code=500, detail="Internal error while processing the PDF.")
     finally:
-        # the PDF is only needed during ingestion; don't accumulate uploads
-        save_path.unlink(missing_ok=True)
+        # the PDF is only needed during ingestion; release the buffer now
+        await file.close()
 
 
-@app.post("/ask_question")
-@limiter.limit(ASK_RATE_LIMIT)
-def ask_question(request: Request, query: str = Form(...)):
-    """Answer a user question using retrieved PDF context.
+NO_RESULTS_ANSWER = (
+    "I couldn't find anything relevant in the uploaded handbook. "
+    "Try uploading the PDF again or rephrasing your question."
+)
 
-    Plain `def` on purpose: FastAPI runs it in the threadpool, so the
-    blocking OpenAI/Weaviate calls don't stall the event loop.
+# BATCH LIMITS
+MAX_BATCH_QUESTIONS = int(os.getenv("MAX_BATCH_QUESTIONS", "50"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+
+# an answer computed with a stage skipped or shed is reused only briefly (0 = not cached)
+DEGRADED_ANSWER_TTL_SECONDS = int(os.getenv("DEGRADED_ANSWER_TTL_SECONDS", "30"))
+
+# RETRIEVAL: search returns ids + snippets; full text is fetched for the top docs only
+TWO_PHASE_RETRIEVAL = os.getenv("TWO_PHASE_RETRIEVAL", "true").lower() in ("1", "true", "yes")
+# candidates handed to the reranker after MMR (None = all k hits)
+RERANK_CANDIDATES = MMR_K if MMR_ENABLED else None
+
+
+def answer_from_retrieved(
+    query: str,
+    retrieved: list[dict],
+    hydrate: Callable[[list[dict]], list[dict]] | None = None,
+    include_retrieved: bool = True,
+) -> dict:
+    """Rerank retrieved chunks and generate the answer (blocking).
+
+    `hydrate` fetches full text for the top docs when `retrieved` came from
+    a two-phase (snippet-only) search. `include_retrieved=False` leaves the
+    candidate list out of the response.
     """
-    try:
-        wv = get_weaviate(request)
-
-        retrieved = search_weaviate(wv, query, k=20)
-        if not retrieved:
-            return {
-                "answer": "I couldn't find anything relevant in the uploaded handbook. Try uploading the PDF again or rephrasing your question.",
-                "retrieved_docs": [],
-                "reranked_docs": [],
-            }
+    result = {"answer": NO_RESULTS_ANSWER, "reranked_docs": []}
+    if include_retrieved:
+        result["retrieved_docs"] = retrieved
+    if not retrieved:
+        return result
+
+    with span("rerank", candidates=len(retrieved)):
         reranked = rerank_chunks_with_llm(query, retrieved)
-        top_docs = reranked[:4]
-
-        context = "\n\n---\n\n".join(doc["text"] for doc in top_docs)
-
-        prompt = f"""
-You are an HR assistant answering questions from the staff handbook.
-Use only the following content to answer accurately and concisely:
-
-{context}
-
-Question: {query}
-Answer:
-"""
-
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a helpful HR assistant. "
-                        "Answer only from the provided excerpts. "
-                        "If the excerpts do not contain the answer, say that you cannot find it in the provided handbook content. "
-                        "Do NOT invent or infer policy details that are not present. "
-                        "Do NOT wrap the full answer in quotation marks. "
-                        "Quote only short phrases when necessary."
-                    ),
-                },
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0,
-        )
+    top_docs = reranked[:current_settings().top_n]
+    if hydrate is not None:
+        top_docs = hydrate(top_docs)
+
+    route = route_answer(query, top_docs)
+    with span("answer", tier=route.tier, complexity=route.complexity, confidence=round(route.confidence, 3)) as s:
+        if route.tier == "extractive":
+            result["answer"] = route.answer
+        else:
+            docs = top_docs if route.chunks is None else top_docs[:route.chunks]
+            result["answer"] = generate_answer(query, docs, model=route.model)
+        s.set(answer_chars=len(result["answer"]))
+    record_tier(route.tier)
+    result["reranked_docs"] = top_docs
+    result["answer_tier"] = route.tier
+    return result
+
+
+def hydrator(wv, collection: str | None):
+    """`hydrate` callback for answer_from_retrieved, or None if search
+    already returns full text."""
+    if not TWO_PHASE_RETRIEVAL:
+        return None
+    return lambda docs: hydrate_docs(wv, docs, collection=collection)
+
+
+def answer_cache_key(query: str, collection: str | None, document_name: str | None,
+                     include_retrieved: bool) -> str:
+    """Answers are reused for the same question and scope until the index
+    changes (the generation is part of the key) or the settings do."""
+    return cache_key(
+        normalize_query(query), collection, document_name or None, include_retrieved,
+        asdict(current_settings()), TWO_PHASE_RETRIEVAL, RERANK_CANDIDATES, router_settings(), index_generation(),
+    )
 
-        raw = response.choices[0].message.content.strip()
-        logger.debug("Raw LLM output: %r", raw)
 
-        # --- Strip straight + curly quotes from the start/end ---
-        answer = re.sub(r'^[\"“”‘’]+|[\"“”‘’]+$', '', raw).strip()
+def store_answer(key: str, result: dict, degraded: set[str]) -> None:
+    """Cache an answer; one from a degraded pipeline (expansion or rerank
+    skipped, shed or failed) only for DEGRADED_ANSWER_TTL_SECONDS, so a
+    transient overload doesn't pin the worse answer for CACHE_TTL_SECONDS."""
+    if not degraded:
+        shared_state.set("answer", key, result)
+    elif DEGRADED_ANSWER_TTL_SECONDS > 0:
+        shared_state.set("answer", key, result, ttl=DEGRADED_ANSWER_TTL_SECONDS)
 
-        return {
-            "answer": answer,
-            "retrieved_docs": retrieved,
-            "reranked_docs": top_docs,
-        }
 
-    except HTTPException:
+@app.post("/ask_question")
+@limiter.shared_limit(ASK_RATE_LIMIT, scope=ASK_QUOTA_SCOPE)
+def ask_question(
+    request: Request,
+    query: str = Form(...),
+    tenant: str | None = Form(None),
+    document_name: str | None = Form(None),
+    include_retrieved_docs: bool = Form(True),
+    session_id: str | None = Form(None),
+):
+    """Answer a user question using retrieved PDF context.
+
+    `tenant` searches that tenant's collection only; `document_name`
+    restricts retrieval to one uploaded PDF. `include_retrieved_docs=false`
+    drops the search candidates from the response. The whole answer,
+    upstream calls included, gets ASK_DEADLINE_SECONDS (504 past it).
+
+    With a client-chosen `session_id`, turns are remembered and a
+    follow-up the previous turn's chunks cover is answered from them
+    without retrieval (`reused_context` in the response).
+
+    Plain `def` on purpose: FastAPI runs it in the threadpool, so the
+    blocking OpenAI/Weaviate calls don't stall the event loop.
+    """
+    try:
+        current_span().set(query_chars=len(query), session=bool(session_id))
+        tenant = normalize_tenant(tenant)
+        scope = [collection_name(tenant), document_name or None]
+        session = None
+        if session_id:
+            if not valid_session_id(session_id):
+                raise HTTPException(status_code=400, detail="Invalid session_id.")
+            session = load_session(session_id)
+            reused = follow_up_docs(session, query, scope)
+            if reused is not None:
+                with request_deadline(ASK_DEADLINE_SECONDS, "ask"), span("follow_up", docs=len(reused)):
+                    answer = generate_answer(contextual_question(session, query), reused)
+                result = {"answer": answer, "reranked_docs": reused}
+                if include_retrieved_docs:
+                    result["retrieved_docs"] = []
+                record_turn(session_id, session, scope, query, answer, reused, reused=True)
+                return {**result, "session_id": session_id, "reused_context": True}
+
+        result = answer_question(request, query, tenant, document_name, include_retrieved_docs)
+        if session is None:
+            return result
+        record_turn(session_id, session, scope, query, result["answer"], result["reranked_docs"])
+        return {**result, "session_id": session_id, "reused_context": False}
+
+    except (HTTPException, Overloaded, DeadlineExceeded):
         raise
     except Exception:
         logger.exception("Question answering failed")
         raise HTTPException(status_code=500, detail="Internal error while answering the question.")
 
-# ✅ GRADIO UI (LOCAL API)
-API_URL = os.getenv("API_URL", "http://127.0.0.1:8000")
 
+def answer_question(request: Request, query: str, tenant: str | None, document_name: str | None,
+                    include_retrieved_docs: bool) -> dict:
+    """The full pipeline for one question, through the shared answer cache
+    (and into the query log)."""
+    started = time.perf_counter()
+    # cached answers don't need Weaviate (served even while it reconnects)
+    key = answer_cache_key(query, collection_name(tenant), document_name, include_retrieved_docs)
+    with span("answer_cache") as s:
+        result = shared_state.get("answer", key)
+        cached = result is not None
+        s.set(hit=cached)
+    if not cached:
+        with track_degraded() as degraded:
+            result = compute_answer(get_weaviate(request), query, tenant, document_name, include_retrieved_docs)
+        store_answer(key, result, degraded)
+    log_query(query, tenant, document_name, include_retrieved_docs,
+              (time.perf_counter() - started) * 1000, result["answer"], cached)
+    return result
+
+
+def compute_answer(wv, query: str, tenant: str | None, document_name: str | None,
+                   include_retrieved_docs: bool, budget: str = "ask") -> dict:
+    """Retrieve and answer under an ASK_DEADLINE_SECONDS budget, counted in
+    /metrics under `budget`."""
+    with request_deadline(ASK_DEADLINE_SECONDS, budget):
+        collection = tenant_collection(wv, tenant)
+        retrieved = (
+            search_weaviate(
+                wv, query, collection=collection, document_name=document_name or None,
+                full_text=not TWO_PHASE_RETRIEVAL, mmr_k=RERANK_CANDIDATES,
+            )
+            if collection
+            else []
+        )
+        result = answer_from_retrieved(
+            query, retrieved,
+            hydrate=hydrator(wv, collection),
+            include_retrieved=include_retrieved_docs,
+        )
+    return result
+
+
+def precompute_faq_answers(wv) -> int:
+    """Answer the FAQ_PRECOMPUTE_TOP_N most asked questions into the answer
+    cache for the current index generation (runs on the warming thread)."""
+    if not claim(f"faq:{index_generation()}"):
+        return 0
+    done = 0
+    for faq in hot_questions(FAQ_PRECOMPUTE_TOP_N):
+        scope = (faq["tenant"], faq["document_name"], faq["include_retrieved"])
+        key = answer_cache_key(faq["query"], collection_name(faq["tenant"]), *scope[1:])
+        if shared_state.get("answer", key) is not None:
+            continue
+        try:
+            with track_degraded() as degraded:
+                # its own budget name, so the `ask` deadline metrics stay live traffic only
+                result = compute_answer(wv, faq["query"], *scope, budget="precompute")
+        except (Overloaded, DeadlineExceeded) as err:
+            # real traffic comes first
+            logger.warning("Stopped precomputing FAQ answers: %s", err)
+            break
+        if degraded:
+            # real traffic is squeezing the optional stages; try again next time
+            logger.warning("Stopped precomputing FAQ answers: %s skipped", ", ".join(sorted(degraded)))
+            break
+        shared_state.set("answer", key, result)
+        done += 1
+    shared_state.incr("faq_precomputed", done)
+    logger.info("Precomputed %d FAQ answers", done)
+    return done
+
+
+def schedule_faq_precompute(wv) -> None:
+    if FAQ_PRECOMPUTE_TOP_N > 0:
+        run_in_background("faq", lambda: precompute_faq_answers(wv))
+
+
+class AskBatchRequest(BaseModel):
+    questions: list[str]
+    tenant: str | None = None
+    document_name: str | None = None
+    include_retrieved_docs: bool = True
+
+
+@app.post("/ask_batch")
+async def ask_batch(request: Request, payload: AskBatchRequest):
+    """Answer many questions in one call, streamed back as JSON Lines.
+
+    All questions share one embeddings request and their hybrid searches run
+    concurrently; rerank + generation run under BATCH_LLM_CONCURRENCY.
+    Lines are written in completion order and carry the question's `index`.
+    A failing question yields an `error` line instead of failing the batch.
+    """
+    wv = get_weaviate(request)
 
-def forwarded_ip_headers(request: gr.Request | None) -> dict:
-    """Forward the real browser IP on the Gradio -> API self-call so rate
-    limits apply per visitor instead of to 127.0.0.1."""
-    if request is None:
-        return {}
-    ip = request.headers.get("x-forwarded-for") or (
-        request.client.host if request.client else None
-    )
-    return {"X-Forwarded-For": ip} if ip else {}
+    questions = [q.strip() for q in payload.questions]
+    if not questions or not all(questions):
+        raise HTTPException(status_code=400, detail="Provide a list of non-empty questions.")
+    if len(questions) > MAX_BATCH_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch may contain at most {MAX_BATCH_QUESTIONS} questions.",
+        )
+    tenant = normalize_tenant(payload.tenant)
+    collection = await run_in_threadpool(tenant_collection, wv, tenant)
+    charge_ask_quota(request, len(questions))
 
+    def error_line(i: int, overloaded: bool = False) -> dict:
+        return {
+            "index": i,
+            "question": questions[i],
+            "error": (
+                "The service is busy. Please retry shortly."
+                if overloaded
+                else "Internal error while answering the question."
+            ),
+        }
 
-def upload_pdf_ui(pdf_file, request: gr.Request):
-    if pdf_file is None:
-        return "Please upload a PDF."
+    def search_queries(query: str) -> tuple[tuple[str, str], set[str]]:
+        with track_degraded() as degraded:
+            return build_search_queries(query), degraded
 
-    with open(pdf_file.name, "rb") as f:
-        files = {"file": f}
-        r = requests.post(
-            f"{API_URL}/upload_pdf",
-            files=files,
-            headers=forwarded_ip_headers(request),
-            timeout=300,
-        )
+    async def results():
+        try:
+            prepared = await asyncio.gather(
+                *(run_in_threadpool(search_queries, q) for q in questions)
+            )
+            queries = [q for q, _ in prepared]
+            vectors = await run_in_threadpool(embed_queries, [v for _, v in queries])
+        except Exception as err:
+            overloaded = isinstance(err, Overloaded)
+            if not overloaded:
+                logger.exception("Batch query preparation failed")
+            for i in range(len(questions)):
+                yield json.dumps(error_line(i, overloaded=overloaded)) + "\n"
+            return
+
+        llm_slots = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+
+        def logged(i: int, started: float, result: dict, cached: bool) -> dict:
+            log_query(questions[i], tenant, payload.document_name, payload.include_retrieved_docs,
+                      (time.perf_counter() - started) * 1000, result["answer"], cached)
+            return {"index": i, "question": questions[i], **result}
+
+        async def answer_one(i: int) -> dict:
+            started = time.perf_counter()
+            try:
+                key = answer_cache_key(questions[i], collection, payload.document_name,
+                                       payload.include_retrieved_docs)
+                cached_answer = shared_state.get("answer", key)
+                if cached_answer is not None:
+                    return logged(i, started, cached_answer, cached=True)
+
+                with track_degraded() as degraded:
+                    retrieved = []
+                    if collection:
+                        retrieved = await run_in_threadpool(
+                            hybrid_search, wv, queries[i][0], vectors[i], current_settings().k,
+                            collection, payload.document_name or None, not TWO_PHASE_RETRIEVAL,
+                            RERANK_CANDIDATES,
+                        )
+                    async with llm_slots:
+                        result = await run_in_threadpool(
+                            answer_from_retrieved, questions[i], retrieved,
+                            hydrator(wv, collection), payload.include_retrieved_docs,
+                        )
+                store_answer(key, result, degraded | prepared[i][1])
+                return logged(i, started, result, cached=False)
+            except Overloaded as err:
+                logger.warning("Batch question %d shed: %s", i, err)
+                return error_line(i, overloaded=True)
+            except Exception:
+                logger.exception("Batch question %d failed", i)
+                return error_line(i)
+
+        for next_done in asyncio.as_completed([answer_one(i) for i in range(len(questions))]):
+            yield json.dumps(await next_done) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+# UI: API_ONLY=true never imports Gradio (faster cold starts for API workers)
+API_ONLY = os.getenv("API_ONLY", "false").lower() in ("1", "true", "yes")
 
-    if r.status_code != 200:
-        return f"❌ {r.text}"
 
-    data = r.json()
-    if data.get("status") == "success":
-        return data.get("message", "✅ PDF processed.")
-    return f"❌ {data.get('message', 'Upload failed')}"
+@app.get("/")
+def root():
+    return RedirectResponse(url="/docs" if API_ONLY else "/ui/")
 
-def ask_question_ui(question, request: gr.Request):
-    if not question.strip():
-        return "⚠️ Please enter a question.", "", ""
 
-    r = requests.post(
-        f"{API_URL}/ask_question",
-        data={"query": question},
-        headers=forwarded_ip_headers(request),
-        timeout=120,
-    )
+if not API_ONLY:
+    from app.ui import mount_ui
 
-    if r.status_code != 200:
-        return f"❌ {r.text}", "", ""
+    mount_ui(app)
 
-    data = r.json()
+# METRICS
+@app.get("/metrics")
+def metrics():
+    """Load and resilience counters for operators.
 
-    answer = data.get("answer", data.get("error", "Unknown error"))
-    retrieved_docs = data.get("retrieved_docs", [])
-    reranked_docs = data.get("reranked_docs", [])
+    Covers admission control per LLM stage, request deadlines, session
+    follow-ups, answer tiers and cache warming.
+    """
+    return {
+        "admission": admission_snapshot(),
+        "deadlines": deadline_snapshot(),
+        "sessions": session_snapshot(),
+        "answer_tiers": router_snapshot(),
+        "query_log": query_log_snapshot(),
+        "index_generation": index_generation(),
+    }
 
-    retrieved_text = "\n\n---\n\n".join(
-        f"Chunk: {int(doc.get('chunk_index') or 0)} | Score: {doc.get('score')}\n{doc.get('text')}"
-        for doc in retrieved_docs
-    ) if retrieved_docs else "No retrieved docs."
 
-    reranked_text = "\n\n---\n\n".join(
-        f"Chunk: {int(doc.get('chunk_index') or 0)} | Score: {doc.get('score')}\n{doc.get('text')}"
-        for doc in reranked_docs
-    ) if reranked_docs else "No reranked docs."
+# ADMIN: disabled unless ADMIN_API_KEY is set; callers send it as X-Admin-Key
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
 
-    return answer, retrieved_text, reranked_text
 
+def require_admin(request: Request) -> None:
+    supplied = request.headers.get("x-admin-key", "")
+    if not ADMIN_API_KEY or not hmac.compare_digest(supplied.encode(), ADMIN_API_KEY.encode()):
+        raise HTTPException(status_code=403, detail="Admin key required.")
 
-with gr.Blocks(title="HR Q&A Bot") as gradio_app:
-    gr.Markdown("## 🤖 HR Q&A Bot — Upload your HR PDF and ask questions")
 
-    with gr.Tab("📄 Upload PDF"):
-        pdf_input = gr.File(label="Upload HR policy PDF")
-        upload_btn = gr.Button("Upload & Process")
-        upload_output = gr.Textbox(label="Upload Status")
-        upload_btn.click(upload_pdf_ui, inputs=pdf_input, outputs=upload_output)
+class RetrievalSettingsUpdate(BaseModel):
+    alpha: float | None = None
+    k: int | None = None
+    rerank_chars: int | None = None
+    top_n: int | None = None
 
-    with gr.Tab("💬 Ask a Question"):
-        question_input = gr.Textbox(label="Ask a question about your uploaded document")
-        submit_btn = gr.Button("Get Answer")
 
-        answer_output = gr.Textbox(label="Answer", lines=10, interactive=False)
+@app.get("/admin/retrieval_settings")
+def get_retrieval_settings(request: Request):
+    require_admin(request)
+    return asdict(current_settings())
 
-        with gr.Accordion("Retrieved Docs", open=False):
-            retrieved_output = gr.Textbox(label="Retrieved Docs", lines=14, interactive=False)
-        with gr.Accordion("Reranked Docs Used", open=False):
-            reranked_output = gr.Textbox(label="Reranked Docs Used", lines=14, interactive=False)
 
-        submit_btn.click(
-            ask_question_ui,
-            inputs=question_input,
-            outputs=[answer_output, retrieved_output, reranked_output],
-        )
+@app.put("/admin/retrieval_settings")
+def put_retrieval_settings(request: Request, payload: RetrievalSettingsUpdate):
+    """Change retrieval settings at runtime, for every worker sharing the state."""
+    require_admin(request)
+    try:
+        updated = update_settings(**payload.model_dump(exclude_none=True))
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    return asdict(updated)
 
-@app.get("/gradio_api/config")
-def gradio_config_alias():
-    return RedirectResponse(url="/gradio_api/info", status_code=307)
 
-@app.get("/gradio_api/api")
-def gradio_api_alias():
-    return RedirectResponse(url="/gradio_api/info", status_code=307)
+class ProfileRequest(BaseModel):
+    requests: int = 20
+    interval_ms: float = 5
+
+
+@app.post("/admin/profile")
+def start_profile(request: Request, payload: ProfileRequest):
+    """Sample the stacks of this worker's next `requests` API requests."""
+    require_admin(request)
+    try:
+        profiler.arm(payload.requests, payload.interval_ms / 1000)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    return profiler.snapshot()
 
-@app.get("/")
-def root():
-    return RedirectResponse(url="/ui/")
 
-# Mount Gradio into FastAPI
-gr.mount_gradio_app(app, gradio_app, path="/ui")
+@app.get("/admin/profile")
+def get_profile(request: Request, folded: bool = False):
+    """Profiler status, or with `folded=true` the samples as folded stacks
+    (input for flamegraph.pl, speedscope or inferno)."""
+    require_admin(request)
+    if folded:
+        return PlainTextResponse(profiler.folded())
+    return profiler.snapshot()
+
 
 # HEALTH
 @app.get("/health")
 def health(request: Request):
-    wv = getattr(request.app.state, "weaviate", None)
+    connection = getattr(request.app.state, "weaviate_connection", None)
+    wv = connection.client if connection else None
     connected = False
     if wv:
         try:
             connected = wv.is_ready()
         except Exception:
             connected = False
-    return {"status": "ok", "weaviate": "connected" if connected else "disconnected"}
+    return {
+        "status": "ok",
+        "weaviate": "connected" if connected else "disconnected",
+        "weaviate_connection": connection.status() if connection else None,
+        "circuits": breaker_snapshot(),
+    }
@@ -0,0 +1,137 @@
+"""Re-embed an existing collection into a new one.
+
+Creates `--target` with the requested embedding dimensions and vector
+compression, streams every object out of `--source`, re-embeds its text
+and inserts it with the same properties. Objects whose content_hash is
+already in the target are skipped, so an interrupted run can be resumed.
+A target that already holds vectors of another size is refused before
+anything is written to it.
+
+Without `--dimensions` the vectors have the size the app embeds with:
+EMBED_DIMENSIONS if set, otherwise the model's full size.
+
+Afterwards point the app at the new collection:
+    WEAVIATE_COLLECTION=<target> EMBED_DIMENSIONS=<dims>
+
+Usage:
+    python -m app.migrate --target PDFDocument_512 --dimensions 512 --compression rq
+"""
+
+import argparse
+import logging
+import os
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+load_dotenv(BASE_DIR / "api_keys.env")
+
+from weaviate.classes.data import DataObject  # noqa: E402
+
+from app.llm_utils import embed_texts  # noqa: E402
+from app.near_dup import band_keys, minhash  # noqa: E402
+from app.weaviate_utils import (  # noqa: E402
+    COLLECTION,
+    PROPERTIES,
+    QUANTIZERS,
+    SNIPPET_CHARS,
+    connect,
+    ensure_schema,
+    fetch_existing_hashes,
+    stored_vector_size,
+)
+
+logger = logging.getLogger("hr_chatbot.migrate")
+
+
+def migrate_collection(
+    client,
+    source: str,
+    target: str,
+    dimensions: int | None = None,
+    compression: str = "none",
+    batch_size: int = 100,
+) -> dict:
+    """Copy `source` into a new `target` collection with fresh embeddings.
+
+    `dimensions=None` embeds like the app does (EMBED_DIMENSIONS, else the
+    model's full size).
+    """
+    if source == target:
+        raise ValueError("source and target collections must differ")
+
+    ensure_schema(client, name=target, compression=compression, dimensions=dimensions)
+    src = client.collections.get(source)
+    dst = client.collections.get(target)
+    target_dims = stored_vector_size(dst)
+    prop_names = [p.name for p in PROPERTIES]
+
+    stats = {"migrated": 0, "skipped_existing": 0}
+    started = time.perf_counter()
+
+    def flush(batch: list[dict]) -> None:
+        existing = fetch_existing_hashes(dst, [p["content_hash"] for p in batch])
+        todo = [p for p in batch if p["content_hash"] not in existing]
+        stats["skipped_existing"] += len(batch) - len(todo)
+        if not todo:
+            return
+        vectors = embed_texts([p["text"] for p in todo], dimensions=dimensions)
+        if target_dims is not None and len(vectors[0]) != target_dims:
+            raise ValueError(f"'{target}' already stores {target_dims}-dimension vectors, not "
+                             f"{len(vectors[0])}; use a new --target or --dimensions {target_dims}")
+        result = dst.data.insert_many([
+            DataObject(properties=props, vector=vec) for props, vec in zip(todo, vectors)
+        ])
+        if getattr(result, "errors", None):
+            raise RuntimeError(f"Weaviate insert errors: {result.errors}")
+        stats["migrated"] += len(todo)
+        logger.info("Migrated %d objects (%.1f/s)", stats["migrated"],
+                    stats["migrated"] / (time.perf_counter() - started))
+
+    batch: list[dict] = []
+    for obj in src.iterator(return_properties=prop_names):
+        props = {k: v for k, v in obj.properties.items() if v is not None}
+        if not props.get("text") or not props.get("content_hash"):
+            continue
+        props.setdefault("snippet", props["text"][:SNIPPET_CHARS])
+        if "minhash" not in props:
+            sig = minhash(props["text"])
+            props["minhash"], props["lsh_bands"] = sig.tolist(), band_keys(sig)
+        batch.append(props)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    return stats
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=COLLECTION, help=f"collection to copy (default {COLLECTION})")
+    parser.add_argument("--target", required=True, help="new collection name")
+    parser.add_argument("--dimensions", type=int, default=None, help="embedding dimensions (default: EMBED_DIMENSIONS, else the model's full size)")
+    parser.add_argument("--compression", choices=["none", *QUANTIZERS], default="none")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    client = connect(os.environ["WEAVIATE_URL"], os.environ["WEAVIATE_API_KEY"])
+    try:
+        stats = migrate_collection(
+            client, args.source, args.target,
+            dimensions=args.dimensions, compression=args.compression, batch_size=args.batch_size,
+        )
+    finally:
+        client.close()
+
+    print(f"Migrated {stats['migrated']} objects into '{args.target}' "
+          f"({stats['skipped_existing']} already present).")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
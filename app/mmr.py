@@ -0,0 +1,70 @@
+import os
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Maximal marginal relevance between search and rerank: drops overlapping
+# neighbours of the same passage before they reach the rerank prompt
+MMR_ENABLED = os.getenv("MMR_ENABLED", "false").lower() in ("1", "true", "yes")
+# candidates kept for the reranker
+MMR_K = int(os.getenv("MMR_K", "10"))
+# 1.0 = pure relevance, 0.0 = pure diversity
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+
+
+def _norms(matrix: np.ndarray) -> np.ndarray:
+    norms = np.sqrt(np.einsum("...i,...i->...", matrix, matrix))
+    return np.where(norms == 0, 1, norms)
+
+
+def mmr_select(
+    query_vec,
+    doc_vecs,
+    k: int | None = None,
+    lambda_mult: float | None = None,
+) -> list[int]:
+    """Indices of `k` rows of `doc_vecs`, in pick order, trading cosine
+    relevance to `query_vec` against similarity to rows already picked.
+
+    Only the picked rows' similarities are computed (k mat-vec products),
+    not the full n x n matrix.
+    """
+    k = MMR_K if k is None else k
+    lambda_mult = MMR_LAMBDA if lambda_mult is None else lambda_mult
+
+    docs = np.asarray(doc_vecs, dtype=np.float32)
+    n = len(docs)
+    if n <= k:
+        return list(range(n))
+    query = np.asarray(query_vec, dtype=np.float32)
+
+    norms = _norms(docs)
+    relevance = (docs @ query) / (norms * _norms(query))
+    selected = [int(np.argmax(relevance))]
+    # cosine similarity of every candidate to its closest already-selected doc
+    closest = (docs @ docs[selected[0]]) / (norms * norms[selected[0]])
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * closest
+        scores[~available] = -np.inf
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        available[pick] = False
+        np.maximum(closest, (docs @ docs[pick]) / (norms * norms[pick]), out=closest)
+    return selected
+
+
+def diversify(docs: list[dict], query_vec, k: int | None = None,
+              lambda_mult: float | None = None) -> list[dict]:
+    """MMR over search results carrying a `vector` key (which is removed).
+
+    Returns the docs unchanged (minus vectors) if any lacks a vector.
+    """
+    vectors = [doc.pop("vector", None) for doc in docs]
+    if not docs or any(v is None for v in vectors):
+        return docs
+    return [docs[i] for i in mmr_select(query_vec, vectors, k=k, lambda_mult=lambda_mult)]
@@ -0,0 +1,103 @@
+import os
+import re
+import zlib
+import hashlib
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# "skip" (don't index near-duplicates), "link" (index them with duplicate_of
+# pointing at the canonical chunk; search collapses them), or "off"
+NEAR_DUP_ACTION = os.getenv("NEAR_DUP_ACTION", "skip")
+# Estimated Jaccard similarity of word shingles above which two chunks count as the same
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.8"))
+
+# 20 bands x 6 rows: chunks at similarity 0.8 share a band with p > 0.99,
+# chunks at 0.5 with p ~ 0.27 (those are then rejected on the full signature)
+NUM_PERM = 120
+BANDS = 20
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 3
+
+# smallest prime above 2**32, so (a * x + b) % p stays inside uint64 for
+# 32-bit shingle hashes and a < 2**31
+_PRIME = np.uint64(4294967311)
+# Fixed seed: signatures are stored in Weaviate and must stay comparable
+_rng = np.random.default_rng(20240611)
+_A = _rng.integers(1, 2**31, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 2**31, NUM_PERM, dtype=np.uint64)
+
+_DIGITS_RE = re.compile(r"\d+")
+_WORD_RE = re.compile(r"\w+")
+
+
+def shingles(text: str) -> np.ndarray:
+    """Hashed word 3-grams of `text`, ignoring case, punctuation, spacing
+    and numbers (page numbers, dates and years in headers/footers)."""
+    words = _WORD_RE.findall(_DIGITS_RE.sub("0", text.lower()))
+    if len(words) <= SHINGLE_WORDS:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+    return np.unique(np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64))
+
+
+def figures(text: str) -> tuple[str, ...]:
+    """The numbers in `text`, sorted. Shingles ignore them, so a revision
+    that only changes a figure ("20 days" -> "25 days", "8am" -> "9am")
+    would look identical; near-duplicates must also have equal figures."""
+    return tuple(sorted(_DIGITS_RE.findall(text)))
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint64 values) of `text`'s shingles."""
+    hashes = shingles(text)
+    if hashes.size == 0:
+        return np.full(NUM_PERM, _PRIME, dtype=np.uint64)
+    return ((np.outer(_A, hashes) + _B[:, None]) % _PRIME).min(axis=1)
+
+
+def band_keys(signature: np.ndarray) -> list[str]:
+    """One LSH bucket key per band; near-duplicates share at least one."""
+    bands = np.ascontiguousarray(signature, dtype=np.uint64).reshape(BANDS, ROWS)
+    return [f"{b}:{hashlib.blake2b(band.tobytes(), digest_size=8).hexdigest()}" for b, band in enumerate(bands)]
+
+
+def similarity(sig_a, sig_b) -> float:
+    """Estimated Jaccard similarity from two signatures."""
+    return float(np.mean(np.asarray(sig_a, dtype=np.uint64) == np.asarray(sig_b, dtype=np.uint64)))
+
+
+class LSHIndex:
+    """In-memory banded LSH index: lookups only compare against chunks
+    sharing a bucket, never against everything indexed."""
+
+    def __init__(self, threshold: float | None = None):
+        self.threshold = NEAR_DUP_THRESHOLD if threshold is None else threshold
+        self._buckets: dict[str, list] = {}
+        self._signatures: dict = {}
+        self._figures: dict = {}
+
+    def add(self, key, signature: np.ndarray, figures: tuple | None = None) -> None:
+        self._signatures[key] = signature
+        self._figures[key] = figures
+        for band in band_keys(signature):
+            self._buckets.setdefault(band, []).append(key)
+
+    def query(self, signature: np.ndarray, figures: tuple | None = None):
+        """Key of the most similar indexed chunk at or above the threshold
+        (and with the same `figures`, when both sides have them), or None."""
+        candidates = {key for band in band_keys(signature) for key in self._buckets.get(band, ())}
+        best, best_score = None, self.threshold
+        for key in candidates:
+            if figures is not None and self._figures[key] is not None and figures != self._figures[key]:
+                continue
+            score = similarity(signature, self._signatures[key])
+            if score >= best_score:
+                best, best_score = key, score
+        return best
+
+    def __len__(self) -> int:
+        return len(self._signatures)
@@ -1,119 +1,415 @@
+import io
 import os
-import re
+import bisect
+import logging
+import itertools
+import threading
 import pdfplumber
+import pypdfium2 as pdfium
+from typing import BinaryIO, Callable, Iterable, Iterator
 
-def clean_extracted_text(text: str) -> str:
-    """Clean common PDF extraction artifacts."""
-    if not text:
-        return ""
+from app.text_normalize import (
+    PARAGRAPH_BREAK_RE,
+    SENTENCE_BREAK_RE,
+    WORD_RE,
+    CleaningRules,
+    clean_text,
+    normalize_whitespace,
+)
+
+logger = logging.getLogger(__name__)
+
+# "pdfium" (fast, per-page pdfplumber fallback) or "pdfplumber" (precise, slow)
+PDF_EXTRACT_BACKEND = os.getenv("PDF_EXTRACT_BACKEND", "pdfium")
+
+# pdfium is not thread-safe, and uploads are extracted on the threadpool:
+# every pdfium call in this process goes through this lock (held per page,
+# never across a yield; app.ingest's worker processes each have their own)
+_pdfium_lock = threading.Lock()
+
+# pdfium pages that look like this are re-extracted with pdfplumber
+DEGRADED_MIN_CHARS = 40
+DEGRADED_MIN_ALPHA_RATIO = 0.5
+DEGRADED_MAX_AVG_WORD_LEN = 20
+
+# pdfium emits CRLF line ends and marks end-of-line hyphenation with U+FFFE
+# (older builds: U+0002), having already joined the word
+_PDFIUM_TEXT_FIXUPS = str.maketrans({"\r": None, "\ufffe": None, "\x02": None})
+
+UNREADABLE_PDF = "Could not read this PDF (it may be corrupt or password-protected)."
+
+# A file path, or a seekable binary stream such as an upload's spooled buffer
+PdfSource = str | os.PathLike | BinaryIO
+
+
+class _StreamView(io.RawIOBase):
+    """Read-only view of a seekable stream with its own position.
+
+    pdfium and the pdfplumber fallback each get one, so both can read the
+    same in-memory upload without copying it or moving each other's offset.
+    """
+
+    def __init__(self, stream: BinaryIO):
+        super().__init__()
+        self._stream = stream
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._stream.seek(0, io.SEEK_END)
+        self._pos = max(offset, 0)
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        self._stream.seek(self._pos)
+        n = self._stream.readinto(buffer)
+        self._pos += n
+        return n
+
+
+def _open_source(source: PdfSource):
+    return source if isinstance(source, (str, os.PathLike)) else _StreamView(source)
 
-    text = re.sub(r"(\w)-\n(\w)", r"\1\2", text)
-    text = re.sub(r"[ \t]+", " ", text)
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    text = re.sub(r"(?<=[a-z])(?=[A-Z])", " ", text)
-    return text.strip()
+def clean_extracted_text(text: str, rules: CleaningRules | None = None) -> str:
+    """Clean common PDF extraction artifacts (see text_normalize.clean_text)."""
+    return clean_text(text, rules)
 
 
-def extract_text_from_pdf(pdf_path: str, max_pages: int | None = None) -> str:
-    """Extract text from all pages using pdfplumber."""
-    if not pdf_path:
-        raise ValueError("No PDF file path provided")
+def text_looks_degraded(text: str) -> bool:
+    """Heuristic for pdfium output worth re-extracting with pdfplumber:
+    words run together (missing spaces) or mostly non-alphabetic glyphs."""
+    chars = [c for c in text if not c.isspace()]
+    if len(chars) < DEGRADED_MIN_CHARS:
+        return False
+    alpha_ratio = sum(c.isalpha() for c in chars) / len(chars)
+    words = text.split()
+    avg_word_len = len(chars) / len(words)
+    return alpha_ratio < DEGRADED_MIN_ALPHA_RATIO or avg_word_len > DEGRADED_MAX_AVG_WORD_LEN
 
-    if not os.path.exists(pdf_path):
-        raise FileNotFoundError(f"PDF file not found: {pdf_path}")
 
-    text_chunks = []
+def _check_page_count(count: int, max_pages: int | None) -> None:
+    if max_pages is not None and count > max_pages:
+        raise ValueError(f"PDF has {count} pages; the maximum allowed is {max_pages}.")
 
+
+def _iter_pdfplumber_pages(source: PdfSource, max_pages: int | None) -> Iterator[str]:
+    """Raw page text from pdfplumber (precise, computes full char layout)."""
     try:
-        pdf_file = pdfplumber.open(pdf_path)
+        pdf_file = pdfplumber.open(_open_source(source))
     except Exception as e:
-        raise ValueError(
-            "Could not read this PDF (it may be corrupt or password-protected)."
-        ) from e
+        raise ValueError(UNREADABLE_PDF) from e
 
     with pdf_file as pdf:
-        if max_pages is not None and len(pdf.pages) > max_pages:
-            raise ValueError(
-                f"PDF has {len(pdf.pages)} pages; the maximum allowed is {max_pages}."
-            )
+        _check_page_count(len(pdf.pages), max_pages)
         for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                cleaned = clean_extracted_text(page_text)
-                if cleaned:
-                    text_chunks.append(cleaned)
+            try:
+                text = page.extract_text() or ""
+            finally:
+                page.close()
+            yield text
+
+
+def _iter_pdfium_pages(source: PdfSource, max_pages: int | None) -> Iterator[str]:
+    """Raw page text from pdfium (fast), re-extracting degraded pages with pdfplumber."""
+    try:
+        with _pdfium_lock:
+            pdf = pdfium.PdfDocument(_open_source(source))
+            page_count = len(pdf)
+    except Exception as e:
+        raise ValueError(UNREADABLE_PDF) from e
+
+    fallback = None  # pdfplumber document, opened on first degraded page
+    try:
+        _check_page_count(page_count, max_pages)
+        for i in range(page_count):
+            with _pdfium_lock:
+                page = pdf[i]
+                try:
+                    textpage = page.get_textpage()
+                    try:
+                        text = textpage.get_text_range().translate(_PDFIUM_TEXT_FIXUPS)
+                    finally:
+                        textpage.close()
+                finally:
+                    page.close()
+
+            if text_looks_degraded(text):
+                logger.info("pdfium output for page %d looks degraded; using pdfplumber", i + 1)
+                if fallback is None:
+                    try:
+                        fallback = pdfplumber.open(_open_source(source))
+                    except Exception as e:
+                        raise ValueError(UNREADABLE_PDF) from e
+                plumber_page = fallback.pages[i]
+                try:
+                    text = plumber_page.extract_text() or ""
+                finally:
+                    plumber_page.close()
+            yield text
+    finally:
+        if fallback is not None:
+            fallback.close()
+        with _pdfium_lock:
+            pdf.close()
+
+
+EXTRACT_BACKENDS: dict[str, Callable[[PdfSource, int | None], Iterator[str]]] = {
+    "pdfium": _iter_pdfium_pages,
+    "pdfplumber": _iter_pdfplumber_pages,
+}
 
-    if not text_chunks:
-        raise ValueError("PDF contains no extractable text (possibly scanned image)")
 
-    return "\n\n".join(text_chunks)
+def iter_numbered_pdf_pages(
+    pdf_path: PdfSource,
+    max_pages: int | None = None,
+    backend: str | None = None,
+    rules: CleaningRules | None = None,
+) -> Iterator[tuple[int, str]]:
+    """Yield (1-based page number, cleaned text) page by page.
+
+    `pdf_path` may also be a seekable binary stream (e.g. an upload's
+    spooled buffer), which is read in place rather than copied.
+    `backend` is one of EXTRACT_BACKENDS (default: PDF_EXTRACT_BACKEND);
+    `rules` selects the text clean-up (default: text_normalize.DEFAULT_RULES).
+    Each page's cached objects are released as soon as its text has been
+    extracted, so peak memory stays flat as the page count grows.
+    Pages without extractable text are skipped.
+    """
+    if pdf_path is None or isinstance(pdf_path, (str, os.PathLike)):
+        if not pdf_path:
+            raise ValueError("No PDF file path provided")
+
+        if not os.path.exists(pdf_path):
+            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+
+    backend = backend or PDF_EXTRACT_BACKEND
+    if backend not in EXTRACT_BACKENDS:
+        raise ValueError(f"Unknown PDF extraction backend: {backend!r}")
+
+    for page_number, page_text in enumerate(EXTRACT_BACKENDS[backend](pdf_path, max_pages), start=1):
+        if page_text:
+            cleaned = clean_extracted_text(page_text, rules)
+            if cleaned:
+                yield page_number, cleaned
+
+
+def iter_pdf_pages(
+    pdf_path: PdfSource,
+    max_pages: int | None = None,
+    backend: str | None = None,
+) -> Iterator[str]:
+    """Yield cleaned text page by page (see iter_numbered_pdf_pages)."""
+    for _, page_text in iter_numbered_pdf_pages(pdf_path, max_pages, backend):
+        yield page_text
+
+
+def extract_text_from_pdf(
+    pdf_path: PdfSource,
+    max_pages: int | None = None,
+    backend: str | None = None,
+) -> str:
+    """Extract text from all pages with the configured backend."""
+    text = "\n\n".join(iter_pdf_pages(pdf_path, max_pages=max_pages, backend=backend))
+    if not text:
+        raise ValueError("PDF contains no extractable text (possibly scanned image)")
+    return text
 
 
 def split_into_sentences(text: str) -> list[str]:
     """Simple sentence splitter."""
-    text = re.sub(r"\s+", " ", text).strip()
+    text = normalize_whitespace(text)
     if not text:
         return []
 
-    # Split on punctuation followed by space + capital/open quote/bracket
-    parts = re.split(r'(?<=[.!?])\s+(?=[A-Z“"(\[])', text)
+    parts = SENTENCE_BREAK_RE.split(text)
     return [p.strip() for p in parts if p.strip()]
 
 
-def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> list[str]:
-    """
-    Chunk by paragraphs first, then sentences if needed.
-    Produces cleaner semantic chunks than raw character slicing.
+def _paragraph_spans(text: str, offset: int) -> Iterator[tuple[str, int, int]]:
+    """Yield (stripped paragraph, start, end) with offsets shifted by `offset`."""
+    pos = 0
+    for sep in itertools.chain(PARAGRAPH_BREAK_RE.finditer(text), [None]):
+        end = sep.start() if sep else len(text)
+        segment = text[pos:end]
+        para = segment.strip()
+        if para:
+            start = offset + pos + (len(segment) - len(segment.lstrip()))
+            yield para, start, start + len(para)
+        if sep:
+            pos = sep.end()
+
+
+def _sentence_spans(para: str, offset: int) -> list[tuple[str, int, int]]:
+    """split_into_sentences(para), with each sentence's span in the source.
+
+    Whitespace is normalised once (joining the words) and normalised
+    positions are mapped back through the word starts.
     """
-    if not text or not text.strip():
+    words = list(WORD_RE.finditer(para))
+    if not words:
         return []
+    norm_starts = []
+    pos = 0
+    for w in words:
+        norm_starts.append(pos)
+        pos += len(w.group()) + 1
+    normalized = " ".join(w.group() for w in words)
 
-    if overlap >= chunk_size:
-        raise ValueError("overlap must be smaller than chunk_size")
+    def to_source(npos: int) -> int:
+        i = bisect.bisect_right(norm_starts, npos) - 1
+        return offset + words[i].start() + (npos - norm_starts[i])
 
-    # Split into paragraphs
-    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
-    units: list[str] = []
+    spans = []
+    start = 0
+    for sep in itertools.chain(SENTENCE_BREAK_RE.finditer(normalized), [None]):
+        end = sep.start() if sep else len(normalized)
+        if end > start:
+            spans.append((normalized[start:end], to_source(start), to_source(end - 1) + 1))
+        if sep:
+            start = sep.end()
+    return spans
+
+
+def _units(
+    pages: Iterable[tuple[int, str]], chunk_size: int, page_starts: list[tuple[int, int]]
+) -> Iterator[tuple[str, int, int]]:
+    """Paragraph / sentence-group units with document offsets.
+
+    Offsets index into the pages joined with "\n\n" (the text
+    extract_text_from_pdf returns); `page_starts` is filled with
+    (offset, page_number) as pages are consumed.
+    """
+    offset = 0
+    for page_number, page_text in pages:
+        page_starts.append((offset, page_number))
+        for para, start, end in _paragraph_spans(page_text, offset):
+            if len(para) <= chunk_size:
+                yield para, start, end
+                continue
 
-    for para in paragraphs:
-        if len(para) <= chunk_size:
-            units.append(para)
-        else:
             # Break oversized paragraphs into sentence groups
-            sentences = split_into_sentences(para)
+            sentences = _sentence_spans(para, start)
             if not sentences:
-                units.append(para[:chunk_size])
+                yield para[:chunk_size], start, start + chunk_size
                 continue
 
-            current = ""
-            for sent in sentences:
-                if not current:
-                    current = sent
-                elif len(current) + 1 + len(sent) <= chunk_size:
-                    current += " " + sent
+            group: list[str] = []
+            group_len = 0
+            group_start = group_end = start
+            for sent, s_start, s_end in sentences:
+                if not group:
+                    group, group_len, group_start = [sent], len(sent), s_start
+                elif group_len + 1 + len(sent) <= chunk_size:
+                    group.append(sent)
+                    group_len += 1 + len(sent)
                 else:
-                    units.append(current.strip())
-                    current = sent
-            if current:
-                units.append(current.strip())
-
-    # Merge units into chunks with soft overlap
-    chunks: list[str] = []
-    current = ""
-
-    for unit in units:
-        if not current:
-            current = unit
-        elif len(current) + 2 + len(unit) <= chunk_size:
-            current += "\n\n" + unit
+                    yield " ".join(group), group_start, group_end
+                    group, group_len, group_start = [sent], len(sent), s_start
+                group_end = s_end
+            if group:
+                yield " ".join(group), group_start, group_end
+        offset += len(page_text) + 2
+
+
+def iter_chunks(
+    pages: Iterable[tuple[int, str]],
+    chunk_size: int = 1000,
+    overlap: int = 200,
+    provenance: bool = True,
+) -> Iterator[dict | str]:
+    """Stream chunks from (page_number, page_text) pairs.
+
+    Same chunking as chunk_text over the pages joined with "\n\n", but
+    built from lists of parts as pages arrive. With `provenance`, yields
+    dicts with `text`, `page_start`/`page_end` and `char_start`/`char_end`
+    (offsets into the joined document text); otherwise yields the texts.
+    """
+    if overlap >= chunk_size:
+        raise ValueError("overlap must be smaller than chunk_size")
+
+    page_starts: list[tuple[int, int]] = []
+
+    def page_at(pos: int) -> int:
+        i = bisect.bisect_right(page_starts, (pos, float("inf"))) - 1
+        return page_starts[max(i, 0)][1]
+
+    def emit(text: str, start: int, end: int) -> dict | str:
+        if not provenance:
+            return text
+        return {
+            "text": text,
+            "page_start": page_at(start),
+            "page_end": page_at(end - 1),
+            "char_start": start,
+            "char_end": end,
+        }
+
+    # pieces of the chunk being built: (text, source start, source end)
+    pieces: list[tuple[str, int, int]] = []
+    length = 0  # len("\n\n".join(piece texts))
+
+    for unit, start, end in _units(pages, chunk_size, page_starts):
+        if not pieces:
+            pieces, length = [(unit, start, end)], len(unit)
+        elif length + 2 + len(unit) <= chunk_size:
+            pieces.append((unit, start, end))
+            length += 2 + len(unit)
         else:
-            chunks.append(current.strip())
+            text = "\n\n".join(p[0] for p in pieces)
+            yield emit(text, pieces[0][1], pieces[-1][2])
 
             # overlap by trailing characters from previous chunk
-            tail = current[-overlap:].strip()
-            current = (tail + "\n\n" + unit).strip() if tail else unit
+            raw_tail = text[-overlap:]
+            tail = raw_tail.strip()
+            if tail:
+                tail_pos = len(text) - len(raw_tail) + (len(raw_tail) - len(raw_tail.lstrip()))
+                tail_start = _source_position(pieces, tail_pos)
+                pieces = [(tail, tail_start, pieces[-1][2]), (unit, start, end)]
+                length = len(tail) + 2 + len(unit)
+            else:
+                pieces, length = [(unit, start, end)], len(unit)
+
+    if pieces:
+        yield emit("\n\n".join(p[0] for p in pieces), pieces[0][1], pieces[-1][2])
+
+
+def _source_position(pieces: list[tuple[str, int, int]], pos: int) -> int:
+    """Map a position in "\n\n".join(pieces) back to a source offset."""
+    piece_pos = 0
+    for text, start, end in pieces:
+        if pos < piece_pos + len(text):
+            return min(start + max(pos - piece_pos, 0), end)
+        piece_pos += len(text) + 2
+    return pieces[-1][2]
+
 
-    if current:
-        chunks.append(current.strip())
+def page_label(doc: dict) -> str:
+    """Page reference for a retrieved chunk ("page 3", "pages 3-4"), or ""."""
+    start, end = doc.get("page_start"), doc.get("page_end")
+    if start is None:
+        return ""
+    if end is None or end == start:
+        return f"page {start}"
+    return f"pages {start}-{end}"
+
+
+def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> list[str]:
+    """
+    Chunk by paragraphs first, then sentences if needed.
+    Produces cleaner semantic chunks than raw character slicing.
+    """
+    if not text or not text.strip():
+        return []
 
-    return chunks
\ No newline at end of file
+    return list(iter_chunks([(1, text)], chunk_size, overlap, provenance=False))
@@ -0,0 +1,139 @@
+"""On-demand sampling profiler for the next N API requests.
+
+`POST /admin/profile` arms it; while any of the next N traced requests
+is in flight, a background thread samples the Python stack of every
+thread every `interval` seconds. Threads parked on a lock, queue or
+selector are skipped, so the samples show where time is spent working.
+`GET /admin/profile?folded=true` returns the samples in the folded-stack
+format ("thread;outer;...;inner count" per line). flamegraph.pl,
+speedscope and inferno all read that format.
+
+Sampling costs one sys._current_frames() walk per interval and nothing
+at all while disarmed. Each worker process profiles its own requests.
+"""
+
+import os
+import sys
+import threading
+import time
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MAX_REQUESTS = int(os.getenv("PROFILE_MAX_REQUESTS", "1000"))
+# innermost Python frames of a thread that is waiting, not working
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),        # idle concurrent.futures worker
+    ("handlers.py", "dequeue"),      # idle QueueListener
+    ("query_log.py", "_run_jobs"),   # idle warming thread
+}
+# frames kept per sample (innermost), so runaway recursion stays bounded
+_MAX_DEPTH = 128
+
+
+def _label(code) -> str:
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._in_flight = 0
+        self._profiled = 0
+        self._interval = 0.005
+        self._stacks: Counter = Counter()
+        self._samples = 0
+        self._thread: threading.Thread | None = None
+
+    def arm(self, requests: int, interval: float = 0.005) -> None:
+        """Profile the next `requests` requests (discards earlier samples)."""
+        if not 1 <= requests <= PROFILE_MAX_REQUESTS:
+            raise ValueError(f"requests must be between 1 and {PROFILE_MAX_REQUESTS}")
+        if not 0.001 <= interval <= 1:
+            raise ValueError("interval must be between 1 and 1000 ms")
+        with self._lock:
+            if self._in_flight:
+                raise ValueError("A profile is being recorded; wait for it to finish")
+            self._remaining = requests
+            self._profiled = 0
+            self._interval = interval
+            self._stacks = Counter()
+            self._samples = 0
+
+    def request_started(self, path: str):
+        """Called by the trace middleware; returns the request's `finished`
+        callback when it is profiled, else None."""
+        if not self._remaining or path.startswith("/admin"):
+            return None
+        with self._lock:
+            if not self._remaining:
+                return None
+            self._remaining -= 1
+            self._profiled += 1
+            self._in_flight += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+                self._thread.start()
+        return self._request_finished
+
+    def _request_finished(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def _sample(self) -> None:
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._in_flight:
+                    self._thread = None
+                    return
+                interval = self._interval
+            names = {t.ident: t.name for t in threading.enumerate()}
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < _MAX_DEPTH:
+                    stack.append(_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                stacks.append(";".join(reversed(stack)))
+            with self._lock:
+                self._stacks.update(stacks)
+                self._samples += 1
+            time.sleep(interval)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            if self._in_flight:
+                status = "recording"
+            elif self._remaining:
+                status = "armed"
+            else:
+                status = "done" if self._samples else "idle"
+            return {
+                "status": status,
+                "requests_remaining": self._remaining,
+                "requests_profiled": self._profiled,
+                "in_flight": self._in_flight,
+                "samples": self._samples,
+                "interval_ms": self._interval * 1000,
+            }
+
+    def folded(self) -> str:
+        """Samples in folded-stack format, most frequent stack first."""
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+
+profiler = StackSampler()
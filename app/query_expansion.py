@@ -0,0 +1,243 @@
+import os
+import re
+import threading
+import time
+import logging
+from collections import Counter
+from typing import Iterable
+
+from app.llm_utils import expand_query
+from app.shared_state import cache_key, cached, index_generation
+
+logger = logging.getLogger(__name__)
+
+# "local" (dictionary first, LLM fallback), "llm" (always LLM), "off"
+QUERY_EXPANSION = os.getenv("QUERY_EXPANSION", "local")
+
+# Curated HR synonym groups. Any member found in a query pulls in the rest
+# of its group for the keyword (BM25) side of the hybrid search.
+HR_SYNONYMS: list[tuple[str, ...]] = [
+    ("sick", "ill", "unwell", "sickness", "illness"),
+    ("sick leave", "sickness absence", "sick day"),
+    ("medical certificate", "doctor's note", "note from their doctor", "fit note", "sick note"),
+    ("doctor", "gp", "physician"),
+    ("late", "delayed", "lateness", "tardy"),
+    ("absent", "absence", "off work", "away"),
+    ("contact", "notify", "inform", "tell", "report to"),
+    ("line manager", "deputy head", "head of department", "supervisor"),
+    ("holiday", "annual leave", "vacation", "time off"),
+    ("leave", "absence", "time off"),
+    ("maternity", "paternity", "parental leave"),
+    ("pay", "paid", "salary", "wages", "remuneration"),
+    ("deducted", "deduction", "docked"),
+    ("overtime", "extra hours", "banked hours"),
+    ("meeting", "staff meeting", "briefing"),
+    ("lesson", "class", "period"),
+    ("start", "begin", "commence"),
+    ("finish", "end", "close"),
+    ("timetable", "schedule", "rota"),
+    ("duty", "supervision", "on duty"),
+    ("lunchtime", "lunch break", "lunch"),
+    ("student", "pupil", "learner"),
+    ("teacher", "member of staff", "staff", "employee", "colleague"),
+    ("detention", "sanction", "consequence"),
+    ("behaviour", "conduct", "discipline"),
+    ("mobile phone", "phone", "cell phone", "smartphone"),
+    ("homework", "home learning", "assignment"),
+    ("cover work", "cover", "substitute", "supply"),
+    ("print", "printer", "printing", "photocopy"),
+    ("resign", "resignation", "notice period"),
+    ("dismissal", "termination", "disciplinary"),
+    ("grievance", "complaint"),
+    ("training", "professional development", "cpd", "inset"),
+    ("dress code", "uniform", "attire"),
+    ("expenses", "reimbursement", "claim"),
+    ("safeguarding", "child protection", "welfare"),
+]
+
+# Common HR / school abbreviations, expanded in both directions.
+HR_ABBREVIATIONS: dict[str, str] = {
+    "hr": "human resources",
+    "hod": "head of department",
+    "dh": "deputy head",
+    "slt": "senior leadership team",
+    "smt": "senior management team",
+    "cpd": "continuing professional development",
+    "inset": "in-service training",
+    "pto": "paid time off",
+    "toil": "time off in lieu",
+    "dbs": "disclosure and barring service",
+    "sen": "special educational needs",
+    "senco": "special educational needs coordinator",
+    "dsl": "designated safeguarding lead",
+    "myp": "middle years programme",
+    "dp": "diploma programme",
+    "ib": "international baccalaureate",
+    "pe": "physical education",
+    "ict": "information and communication technology",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+# "Deputy Head (DH)" style definitions found in the handbook text
+_ABBREV_DEF_RE = re.compile(r"\b((?:[A-Z][A-Za-z]+\s+){1,5}[A-Z]?[a-z]+)\s+\(([A-Z]{2,6})\)")
+_MAX_PHRASE_WORDS = 5
+
+
+# function words that say nothing about what a question is looking for
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "but", "so", "also", "then", "is", "are", "was", "were", "be",
+    "do", "does", "did", "i", "me", "my", "we", "our", "you", "your", "to", "of", "in", "on",
+    "for", "at", "by", "with", "from", "about", "what", "which", "who", "whom", "how", "when",
+    "where", "why", "can", "could", "should", "would", "will", "if", "much", "many", "any",
+    "that", "this", "it", "its", "those", "these", "they", "them", "there", "their", "take", "place",
+}
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def content_words(text: str) -> list[str]:
+    return [t for t in tokenize(text) if t not in STOPWORDS]
+
+
+def _build_phrase_index() -> dict[tuple[str, ...], set[str]]:
+    """Map each dictionary phrase (as a token tuple) to the terms it expands to."""
+    index: dict[tuple[str, ...], set[str]] = {}
+    for group in HR_SYNONYMS:
+        for term in group:
+            index.setdefault(tuple(tokenize(term)), set()).update(t for t in group if t != term)
+    for abbrev, long_form in HR_ABBREVIATIONS.items():
+        index.setdefault((abbrev,), set()).add(long_form)
+        index.setdefault(tuple(tokenize(long_form)), set()).add(abbrev)
+    return index
+
+
+_PHRASE_INDEX = _build_phrase_index()
+# first words of multi-word phrases, so most n-grams are rejected with one set lookup
+_PHRASE_STARTS = {phrase[0] for phrase in _PHRASE_INDEX if len(phrase) > 1}
+
+
+class CorpusVocabulary:
+    """Vocabulary mined from indexed chunks.
+
+    Keeps token counts (so dictionary expansions can be limited to terms the
+    handbook actually uses) and abbreviation definitions like
+    "Designated Safeguarding Lead (DSL)". Expansions are only limited while
+    the vocabulary is `current()`: `seed()` has read every stored chunk and
+    no worker has indexed anything since (the shared index generation
+    hasn't moved), so every worker filters a question the same way.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.term_counts: Counter[str] = Counter()
+        self.abbreviations: dict[str, str] = {}
+        self.complete = False
+        self.generation: int | None = None  # index generation the seed read
+        self.seeded_at = 0.0
+
+    def seed(self, texts: Iterable[str], batch_size: int = 1000) -> int:
+        """Learn every stored chunk's text, then mark the vocabulary complete."""
+        generation = index_generation()  # read first: later inserts make it stale
+        learned = 0
+        batch: list[str] = []
+        for text in texts:
+            batch.append(text)
+            if len(batch) >= batch_size:
+                self.learn(batch)
+                learned += len(batch)
+                batch = []
+        self.learn(batch)
+        self.generation, self.seeded_at, self.complete = generation, time.monotonic(), True
+        return learned + len(batch)
+
+    def current(self) -> bool:
+        """Seeded, and nothing indexed by any worker since."""
+        return self.complete and self.generation == index_generation()
+
+    def learn(self, texts: list[str]) -> None:
+        counts: Counter[str] = Counter()
+        abbrevs: dict[str, str] = {}
+        for text in texts:
+            counts.update(tokenize(text))
+            for long_form, abbrev in _ABBREV_DEF_RE.findall(text):
+                abbrevs[abbrev.lower()] = " ".join(long_form.lower().split())
+        with self._lock:
+            self.term_counts.update(counts)
+            self.abbreviations.update(abbrevs)
+
+    def __contains__(self, term: str) -> bool:
+        tokens = tokenize(term)
+        return bool(tokens) and all(self.term_counts[t] > 0 for t in tokens)
+
+    def __len__(self) -> int:
+        return len(self.term_counts)
+
+
+corpus_vocabulary = CorpusVocabulary()
+
+
+def _lookup(phrase: tuple[str, ...], vocab: CorpusVocabulary) -> set[str]:
+    terms = set(_PHRASE_INDEX.get(phrase, ()))
+    if len(phrase) == 1:
+        word = phrase[0]
+        if word in vocab.abbreviations:
+            terms.add(vocab.abbreviations[word])
+        # cheap plural folding: "meetings" -> "meeting"
+        if not terms and len(word) > 3 and word.endswith("s"):
+            terms = set(_PHRASE_INDEX.get((word[:-1],), ()))
+    return terms
+
+
+def expand_query_local(query: str, vocab: CorpusVocabulary | None = None) -> str | None:
+    """Expand `query` from the local HR dictionary and corpus vocabulary.
+
+    Returns the query followed by the added terms, or None when nothing in
+    the query is known locally (callers then fall back to the LLM).
+    """
+    vocab = vocab if vocab is not None else corpus_vocabulary
+    tokens = tokenize(query)
+    if not tokens:
+        return None
+
+    added: list[str] = []
+    seen = set(tokens)
+    for n in range(min(_MAX_PHRASE_WORDS, len(tokens)), 0, -1):
+        for i in range(len(tokens) - n + 1):
+            if n > 1 and tokens[i] not in _PHRASE_STARTS:
+                continue
+            for term in sorted(_lookup(tuple(tokens[i:i + n]), vocab)):
+                if term in seen:
+                    continue
+                # once we know the handbook's vocabulary, only add terms it uses
+                if vocab.current() and len(vocab) and term not in vocab:
+                    continue
+                seen.add(term)
+                added.append(term)
+
+    if not added:
+        return None
+    return f"{query} {' '.join(added)}"
+
+
+def build_search_queries(query: str, mode: str | None = None) -> tuple[str, str]:
+    """Return (keyword_query, vector_query) for `col.query.hybrid`.
+
+    A local expansion only feeds the BM25 side; the embedding already
+    captures synonyms, so the original question is embedded as-is. The LLM
+    expansion is only paid for when the local engine has nothing to add,
+    and then (as before) drives both sides.
+    """
+    mode = mode or QUERY_EXPANSION
+    if mode == "off":
+        return query, query
+    if mode == "local":
+        local = expand_query_local(query)
+        if local is not None:
+            return local, query
+        logger.debug("No local expansion for %r; falling back to LLM", query)
+    # cached across workers; a shed (unexpanded) result is not kept
+    expanded = cached("expansion", cache_key(query), lambda: expand_query(query),
+                      keep=lambda result: result != query)
+    return expanded, expanded
@@ -0,0 +1,152 @@
+"""Query log, hot-set cache warming and precomputed FAQ answers.
+
+Every answered question is appended to a JSONL log (QUERY_LOG_PATH,
+rotated at QUERY_LOG_MAX_MB with QUERY_LOG_BACKUPS old files kept): the
+question with its whitespace normalized, its scope, how long it took,
+whether the answer cache served it, and a hash of the answer. Lines are
+written by a listener thread, so a request never waits on the disk.
+
+The hot set is the most asked questions (counted case-insensitively)
+over the last QUERY_LOG_WINDOW lines. At startup a background job warms
+the expansion and embedding caches for the top HOT_SET_SIZE of them.
+The top FAQ_PRECOMPUTE_TOP_N also get their answers computed into the
+answer cache: once Weaviate is connected, and again after every upload,
+because an upload bumps the index generation and that retires cached
+answers. The most popular questions are then served with no upstream
+call. Jobs run one at a time on one thread. With a shared state tier,
+only the first worker to claim a job runs it.
+"""
+
+import hashlib
+import os
+import queue
+import threading
+import time
+import logging
+from collections import Counter, defaultdict, deque
+from typing import Any, Callable
+
+from app.jsonl_log import JsonlLog
+from app.llm_utils import embed_queries
+from app.query_expansion import build_search_queries
+from app.shared_state import state
+
+logger = logging.getLogger(__name__)
+
+QUERY_LOG_PATH = os.getenv("QUERY_LOG_PATH", "logs/query_log.jsonl")  # empty = no log
+QUERY_LOG_MAX_MB = float(os.getenv("QUERY_LOG_MAX_MB", "10"))
+QUERY_LOG_BACKUPS = int(os.getenv("QUERY_LOG_BACKUPS", "3"))
+QUERY_LOG_WINDOW = int(os.getenv("QUERY_LOG_WINDOW", "20000"))
+HOT_SET_SIZE = int(os.getenv("HOT_SET_SIZE", "50"))
+FAQ_PRECOMPUTE_TOP_N = int(os.getenv("FAQ_PRECOMPUTE_TOP_N", "10"))
+
+# a job one worker claimed is skipped by the others for this long
+_CLAIM_SECONDS = 300
+
+_log = (
+    JsonlLog(QUERY_LOG_PATH, int(QUERY_LOG_MAX_MB * 1024 * 1024), QUERY_LOG_BACKUPS)
+    if QUERY_LOG_PATH else None
+)
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split())
+
+
+def log_query(query: str, tenant: str | None, document_name: str | None, include_retrieved: bool,
+              ms: float, answer: str, cached: bool) -> None:
+    if _log is None:
+        return
+    _log.write({
+        "ts": round(time.time(), 3),
+        "query": normalize_query(query),
+        "tenant": tenant,
+        "document": document_name or None,
+        "full": include_retrieved,
+        "ms": round(ms, 1),
+        "cached": cached,
+        "result": hashlib.sha256(answer.encode("utf-8")).hexdigest()[:16],
+    })
+
+
+def hot_questions(limit: int) -> list[dict]:
+    """The `limit` most asked questions in the recent log, most asked first.
+
+    Questions differing only in case are counted together; each is
+    returned in its most common spelling.
+    """
+    if _log is None or limit <= 0:
+        return []
+    counts: Counter = Counter()
+    spellings: dict[tuple, Counter] = defaultdict(Counter)
+    for entry in deque(_log.entries(), maxlen=QUERY_LOG_WINDOW):
+        key = (entry["query"].casefold(), entry.get("tenant"), entry.get("document"), entry.get("full", True))
+        counts[key] += 1
+        spellings[key][entry["query"]] += 1
+    return [
+        {
+            "query": spellings[key].most_common(1)[0][0],
+            "tenant": key[1],
+            "document_name": key[2],
+            "include_retrieved": key[3],
+            "count": count,
+        }
+        for key, count in counts.most_common(limit)
+    ]
+
+
+def claim(job: str) -> bool:
+    """True for the first worker to claim `job` in the last _CLAIM_SECONDS
+    (an atomic insert-if-absent in the shared state)."""
+    return state.add("warming", job, True, ttl=_CLAIM_SECONDS)
+
+
+def warm_hot_set(limit: int = HOT_SET_SIZE) -> int:
+    """Fill the expansion and embedding caches for the hot set (no Weaviate needed)."""
+    hot = hot_questions(limit)
+    if not hot or not claim("hot_set"):
+        return 0
+    queries = [build_search_queries(h["query"]) for h in hot]
+    embed_queries([vector_query for _, vector_query in queries])
+    state.incr("hot_set_warmed", len(hot))
+    logger.info("Warmed expansion and embedding caches for %d hot questions", len(hot))
+    return len(hot)
+
+
+_jobs: queue.SimpleQueue = queue.SimpleQueue()
+_pending: set[str] = set()
+_jobs_lock = threading.Lock()
+_worker: threading.Thread | None = None
+
+
+def _run_jobs() -> None:
+    while True:
+        name, job = _jobs.get()
+        with _jobs_lock:
+            # a job scheduled again while this run is under way runs again
+            _pending.discard(name)
+        try:
+            job()
+        except Exception:
+            logger.exception("Background job %s failed", name)
+
+
+def run_in_background(name: str, job: Callable[[], Any]) -> None:
+    """Queue `job` on the warming thread, unless `name` is already queued."""
+    global _worker
+    with _jobs_lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+        if _worker is None:
+            _worker = threading.Thread(target=_run_jobs, name="cache-warming", daemon=True)
+            _worker.start()
+    _jobs.put((name, job))
+
+
+def query_log_snapshot() -> dict:
+    return {
+        "path": str(_log.path) if _log else None,
+        "hot_set_warmed": state.counter("hot_set_warmed"),
+        "faq_precomputed": state.counter("faq_precomputed"),
+    }
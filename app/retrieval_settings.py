@@ -0,0 +1,79 @@
+import os
+import threading
+import logging
+from dataclasses import asdict, dataclass, fields, replace
+
+from app.shared_state import state
+
+logger = logging.getLogger(__name__)
+
+# Stored snippets are this long, so the reranker can't be shown more
+MAX_RERANK_CHARS = 400
+
+
+@dataclass(frozen=True)
+class RetrievalSettings:
+    """Retrieval knobs read on every request (see evals/sweep.py for tuning).
+
+    alpha: hybrid weighting, 0 = BM25 only, 1 = vector only
+    k: hits fetched from Weaviate per question
+    rerank_chars: characters of each hit shown to the reranker
+    top_n: reranked hits given to the answer model
+    """
+
+    alpha: float = 0.65
+    k: int = 20
+    rerank_chars: int = MAX_RERANK_CHARS
+    top_n: int = 4
+
+    def validate(self) -> "RetrievalSettings":
+        if not 0.0 <= self.alpha <= 1.0:
+            raise ValueError("alpha must be between 0 and 1")
+        if not 1 <= self.k <= 100:
+            raise ValueError("k must be between 1 and 100")
+        if not 50 <= self.rerank_chars <= MAX_RERANK_CHARS:
+            raise ValueError(f"rerank_chars must be between 50 and {MAX_RERANK_CHARS}")
+        if not 1 <= self.top_n <= self.k:
+            raise ValueError("top_n must be between 1 and k")
+        return self
+
+
+_current = RetrievalSettings(
+    alpha=float(os.getenv("RETRIEVAL_ALPHA", "0.65")),
+    k=int(os.getenv("RETRIEVAL_K", "20")),
+    rerank_chars=int(os.getenv("RERANK_CHARS", str(MAX_RERANK_CHARS))),
+    top_n=int(os.getenv("ANSWER_TOP_N", "4")),
+).validate()
+_version = 0
+_lock = threading.RLock()
+
+
+def current_settings() -> RetrievalSettings:
+    """The settings last put by any worker (kept in the shared state; a
+    worker reloads them when the version counter moves)."""
+    global _current, _version
+    version = state.counter("retrieval_settings")
+    if version != _version:
+        stored = state.setting("retrieval")
+        with _lock:
+            if stored is not None:
+                _current = RetrievalSettings(**stored)
+            _version = version
+    return _current
+
+
+def update_settings(**changes) -> RetrievalSettings:
+    """Apply `changes` (unknown names or out-of-range values raise
+    ValueError) and return the new settings, for every worker."""
+    global _current, _version
+    unknown = set(changes) - {f.name for f in fields(RetrievalSettings)}
+    if unknown:
+        raise ValueError(f"Unknown retrieval settings: {', '.join(sorted(unknown))}")
+    with _lock:
+        updated = replace(current_settings(), **changes).validate()
+        # store before bumping the version, so a worker that sees the new
+        # version also finds the new settings
+        state.put_setting("retrieval", asdict(updated))
+        _current, _version = updated, state.incr("retrieval_settings")
+        logger.info("Retrieval settings updated: %s", asdict(_current))
+        return _current
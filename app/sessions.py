@@ -0,0 +1,126 @@
+"""Conversation sessions: recent turns and the chunks each one was answered from.
+
+A client that sends the same `session_id` with each question gets its
+recent turns remembered (in the shared state tier, so every worker sees
+them). A follow-up like "and how many days is that?" is answered from the
+previous turn's chunks when a cheap lexical check says the previous
+question and answer cover it: expansion, embedding, search and rerank are
+all skipped, and the answer model sees the earlier question alongside the
+follow-up.
+
+Sessions expire SESSION_TTL_SECONDS after their last turn, keep at most
+SESSION_MAX_TURNS turns and SESSION_MAX_CONTEXT_CHARS of chunk text
+(oldest turns' chunks are dropped first); the shared cache's
+CACHE_MAX_ENTRIES bounds how many sessions are kept at all.
+"""
+
+import os
+import re
+import logging
+
+from app.query_expansion import content_words, tokenize
+from app.shared_state import state
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "1800"))
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "6"))
+SESSION_MAX_CONTEXT_CHARS = int(os.getenv("SESSION_MAX_CONTEXT_CHARS", "20000"))
+# share of a follow-up's content words that must appear in the previous question and answer
+SESSION_REUSE_MIN_COVERAGE = float(os.getenv("SESSION_REUSE_MIN_COVERAGE", "0.5"))
+
+# longer questions are new questions, not follow-ups
+FOLLOW_UP_MAX_WORDS = 12
+
+_SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{16,128}$")
+
+# openers and pronouns that lean on the previous turn ("there", "then" and
+# "one" don't: "Is there a dress code?" is a question of its own)
+_FOLLOW_UP_OPENERS = {"and", "also", "so", "but", "what about", "how about", "what if"}
+_REFERRING_WORDS = {"that", "this", "it", "its", "those", "these", "they", "them"}
+
+
+def valid_session_id(session_id: str) -> bool:
+    """Client-chosen ids must be long enough not to be guessed."""
+    return bool(_SESSION_ID_RE.match(session_id))
+
+
+def load_session(session_id: str) -> dict:
+    return state.get("session", session_id) or {"turns": []}
+
+
+def record_turn(session_id: str, session: dict, scope: list, question: str, answer: str,
+                docs: list[dict], reused: bool = False) -> None:
+    """Append a turn (and the chunks it was answered from) and save the session."""
+    turns = [*session["turns"], {
+        "scope": scope,
+        "question": question,
+        "answer": answer,
+        "docs": docs,
+        "reused": reused,
+    }][-SESSION_MAX_TURNS:]
+
+    # memory cap: drop chunks from the oldest turns first (the latest turn's stay)
+    budget = SESSION_MAX_CONTEXT_CHARS
+    for turn in reversed(turns):
+        size = sum(len(doc.get("text") or "") for doc in turn["docs"])
+        if size > budget and turn is not turns[-1]:
+            turn["docs"] = []
+        else:
+            budget -= size
+    state.set("session", session_id, {"turns": turns}, ttl=SESSION_TTL_SECONDS)
+    state.incr("session_turns_recorded")
+    if reused:
+        state.incr("session_follow_ups_reused")
+
+
+def _is_follow_up(tokens: list[str]) -> bool:
+    text = " ".join(tokens)
+    return any(text == o or text.startswith(o + " ") for o in _FOLLOW_UP_OPENERS) or any(
+        t in _REFERRING_WORDS for t in tokens
+    )
+
+
+def follow_up_docs(session: dict, question: str, scope: list) -> list[dict] | None:
+    """The previous turn's chunks if `question` is a follow-up they cover, else None.
+
+    Cheap by design (no model call): the question must be short, lean on
+    the previous turn (an opener like "and ..." or a pronoun like "that"),
+    and most of its content words must appear in the previous question or
+    answer. The chunks themselves are not counted: a few thousand
+    characters of handbook text contain most everyday words.
+    """
+    if not session["turns"]:
+        return None
+    last = session["turns"][-1]
+    if last["scope"] != scope or not last["docs"]:
+        return None
+
+    tokens = tokenize(question)
+    if not tokens or len(tokens) > FOLLOW_UP_MAX_WORDS or not _is_follow_up(tokens):
+        return None
+
+    content = set(content_words(question)) - _REFERRING_WORDS
+    if content:
+        known = set(tokenize(last["question"])) | set(tokenize(last["answer"]))
+        # "days" is covered by "day"
+        covered = sum(1 for t in content if t in known or t.rstrip("s") in known)
+        if covered / len(content) < SESSION_REUSE_MIN_COVERAGE:
+            return None
+    return last["docs"]
+
+
+def contextual_question(session: dict, question: str) -> str:
+    """The follow-up with the turn it refers to, for the answer model."""
+    last = session["turns"][-1]
+    return (
+        f"{question}\n(This is a follow-up. Previous question: {last['question']} "
+        f"Previous answer: {last['answer']})"
+    )
+
+
+def session_snapshot() -> dict:
+    return {
+        "follow_ups_reused": state.counter("session_follow_ups_reused"),
+        "turns_recorded": state.counter("session_turns_recorded"),
+    }
@@ -0,0 +1,286 @@
+"""State shared by every uvicorn worker on one host.
+
+Holds the rate-limit buckets, the expansion / embedding / answer caches,
+durable runtime settings (their own table, outside the cache) and the
+index generation counter (bumped on every insert; answer cache
+keys include it, so new documents invalidate cached answers).
+
+With SHARED_STATE_PATH set, all of it lives in one SQLite database in WAL
+mode, so `uvicorn --workers N` enforces one rate limit per client and
+every worker reads the caches the others warmed. Unset, each process
+keeps its own in-memory copy (fine for a single worker).
+"""
+
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Callable
+
+from limits.storage import Storage
+
+logger = logging.getLogger(__name__)
+
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH") or None
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "3600"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires REAL NOT NULL);
+"""
+
+
+def cache_key(*parts: Any) -> str:
+    blob = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class MemoryState:
+    """Per-process state: LRU cache with TTLs, plus counters."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[tuple[str, str], tuple[float, Any]] = OrderedDict()
+        self._counters: dict[str, int] = {}
+        self._settings: dict[str, Any] = {}
+
+    def get(self, namespace: str, key: str) -> Any | None:
+        with self._lock:
+            entry = self._cache.get((namespace, key))
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._cache[(namespace, key)]
+                return None
+            self._cache.move_to_end((namespace, key))
+            return entry[1]
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float | None = None) -> None:
+        expires = time.time() + (CACHE_TTL_SECONDS if ttl is None else ttl)
+        with self._lock:
+            self._cache[(namespace, key)] = (expires, value)
+            self._cache.move_to_end((namespace, key))
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def add(self, namespace: str, key: str, value: Any, ttl: float | None = None) -> bool:
+        """`set` only if `key` is absent or expired; True if it was stored."""
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get((namespace, key))
+            if entry is not None and entry[0] > now:
+                return False
+            self._cache[(namespace, key)] = (now + (CACHE_TTL_SECONDS if ttl is None else ttl), value)
+            self._cache.move_to_end((namespace, key))
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+            return True
+
+    def incr(self, name: str, amount: int = 1) -> int:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+            return self._counters[name]
+
+    def counter(self, name: str) -> int:
+        return self._counters.get(name, 0)
+
+    def setting(self, name: str) -> Any | None:
+        return self._settings.get(name)
+
+    def put_setting(self, name: str, value: Any) -> None:
+        """Store a durable setting (never expired or evicted)."""
+        with self._lock:
+            self._settings[name] = value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._counters.clear()
+            self._settings.clear()
+
+
+class SQLiteState:
+    """Host-wide state in one SQLite file (WAL: readers never block the writer)."""
+
+    def __init__(self, path: str, max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self.connection().executescript(_SCHEMA)
+
+    def connection(self) -> sqlite3.Connection:
+        # one connection per thread, and never one inherited across a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, namespace: str, key: str) -> Any | None:
+        row = self.connection().execute(
+            "SELECT value FROM cache WHERE namespace = ? AND key = ? AND expires > ?",
+            (namespace, key, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float | None = None) -> None:
+        now = time.time()
+        expires = now + (CACHE_TTL_SECONDS if ttl is None else ttl)
+        conn = self.connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, expires) VALUES (?, ?, ?, ?)",
+            (namespace, key, json.dumps(value), expires),
+        )
+        # amortised cleanup: drop expired rows, then the soonest-expiring overflow
+        if random.random() < 0.01:
+            conn.execute("DELETE FROM cache WHERE expires <= ?", (now,))
+            conn.execute(
+                "DELETE FROM cache WHERE (namespace, key) IN (SELECT namespace, key FROM cache "
+                "ORDER BY expires LIMIT max(0, (SELECT count(*) FROM cache) - ?))",
+                (self.max_entries,),
+            )
+
+    def add(self, namespace: str, key: str, value: Any, ttl: float | None = None) -> bool:
+        """`set` only if `key` is absent or expired, atomically across
+        processes; True if it was stored."""
+        now = time.time()
+        expires = now + (CACHE_TTL_SECONDS if ttl is None else ttl)
+        return self.connection().execute(
+            "INSERT INTO cache (namespace, key, value, expires) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, expires = excluded.expires "
+            "WHERE cache.expires <= ?",
+            (namespace, key, json.dumps(value), expires, now),
+        ).rowcount == 1
+
+    def incr(self, name: str, amount: int = 1) -> int:
+        return self.connection().execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value RETURNING value",
+            (name, amount),
+        ).fetchone()[0]
+
+    def counter(self, name: str) -> int:
+        row = self.connection().execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def setting(self, name: str) -> Any | None:
+        row = self.connection().execute("SELECT value FROM settings WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_setting(self, name: str, value: Any) -> None:
+        """Store a durable setting (never expired or evicted)."""
+        self.connection().execute(
+            "INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)", (name, json.dumps(value))
+        )
+
+    def clear(self) -> None:
+        conn = self.connection()
+        for table in ("cache", "counters", "settings", "rate_limits"):
+            conn.execute(f"DELETE FROM {table}")
+
+
+def open_state(path: str | None = None) -> MemoryState | SQLiteState:
+    return SQLiteState(path) if path else MemoryState()
+
+
+state = open_state(SHARED_STATE_PATH)
+
+
+def cached(namespace: str, key: str, compute: Callable[[], Any], ttl: float | None = None,
+           keep: Callable[[Any], bool] | None = None) -> Any:
+    """Value of `key` in `namespace`, computed (and stored) on a miss.
+
+    `keep` can veto storing a result (e.g. a degraded fallback).
+    """
+    value = state.get(namespace, key)
+    if value is not None:
+        return value
+    value = compute()
+    if value is not None and (keep is None or keep(value)):
+        state.set(namespace, key, value, ttl)
+    return value
+
+
+def index_generation() -> int:
+    return state.counter("index_generation")
+
+
+def bump_index_generation() -> int:
+    return state.incr("index_generation")
+
+
+class SQLiteStorage(Storage):
+    """`limits` storage over the shared SQLite file (fixed-window strategy).
+
+    Registered for ``sqlite:///<path>`` storage URIs.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        # sqlite:///relative.db or sqlite:////absolute/path.db
+        self._state = SQLiteState(uri.removeprefix("sqlite:///"))
+
+    @property
+    def base_exceptions(self) -> type[Exception]:
+        return sqlite3.Error
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        now = time.time()
+        return self._state.connection().execute(
+            "INSERT INTO rate_limits (key, count, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET "
+            "count = CASE WHEN expires <= ? THEN excluded.count ELSE count + excluded.count END, "
+            "expires = CASE WHEN expires <= ? THEN excluded.expires ELSE expires END "
+            "RETURNING count",
+            (key, amount, now + expiry, now, now),
+        ).fetchone()[0]
+
+    def get(self, key: str) -> int:
+        row = self._state.connection().execute(
+            "SELECT count FROM rate_limits WHERE key = ? AND expires > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        row = self._state.connection().execute(
+            "SELECT expires FROM rate_limits WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self) -> bool:
+        try:
+            self._state.connection().execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int | None:
+        return self._state.connection().execute("DELETE FROM rate_limits").rowcount
+
+    def clear(self, key: str) -> None:
+        self._state.connection().execute("DELETE FROM rate_limits WHERE key = ?", (key,))
+
+
+def limiter_storage_uri() -> str:
+    """storage_uri for slowapi's Limiter: the shared file, or per-process memory."""
+    return f"sqlite:///{SHARED_STATE_PATH}" if SHARED_STATE_PATH else "memory://"
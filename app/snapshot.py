@@ -0,0 +1,240 @@
+"""Export a collection with its vectors, or import such a snapshot.
+
+A snapshot is a directory of parts, each at most `--part-size` objects:
+
+    snapshot.json        collection, properties, dimensions, parts, rows
+    part-00000.jsonl     one object's properties per line
+    part-00000.npy       float32 (rows x dimensions) vectors, same order
+
+Export streams the collection through a cursor and import reads one part
+at a time (vectors memory-mapped), so memory is bounded by the part size,
+not the corpus. Import never calls the embeddings API: objects keep their
+stored vectors, get a uuid derived from their content_hash, and hashes
+already in the target are skipped, so an interrupted import can be rerun.
+
+Usage:
+    python -m app.snapshot export snapshots/2024-06 --collection PDFDocument
+    python -m app.snapshot import snapshots/2024-06 --collection PDFDocument --concurrency 8
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+load_dotenv(BASE_DIR / "api_keys.env")
+
+from weaviate.classes.data import DataObject  # noqa: E402
+
+from app.weaviate_utils import (  # noqa: E402
+    COLLECTION,
+    PROPERTIES,
+    QUANTIZERS,
+    connect,
+    ensure_schema,
+    fetch_existing_hashes,
+    stored_vector_size,
+)
+from app.shared_state import bump_index_generation  # noqa: E402
+
+logger = logging.getLogger("hr_chatbot.snapshot")
+
+SNAPSHOT_FORMAT = 1
+INDEX_FILE = "snapshot.json"
+
+
+def object_uuid(content_hash: str) -> str:
+    """Stable object id for a chunk, so re-importing upserts instead of duplicating."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"chunk:{content_hash}"))
+
+
+def _part_name(i: int) -> str:
+    return f"part-{i:05d}"
+
+
+def export_collection(client, collection: str, out_dir: str | Path, part_size: int = 10_000) -> dict:
+    """Stream `collection` (properties and vectors) into `out_dir`."""
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    col = client.collections.get(collection)
+    prop_names = [p.name for p in PROPERTIES]
+
+    parts: list[dict] = []
+    rows: list[dict] = []
+    vectors: list[list[float]] = []
+    dims = None
+    started = time.perf_counter()
+
+    def flush() -> None:
+        name = _part_name(len(parts))
+        with open(out / f"{name}.jsonl", "w") as f:
+            for props in rows:
+                f.write(json.dumps(props, ensure_ascii=False) + "\n")
+        np.save(out / f"{name}.npy", np.asarray(vectors, dtype=np.float32))
+        parts.append({"name": name, "rows": len(rows)})
+        total = sum(p["rows"] for p in parts)
+        logger.info("Exported %d objects (%.0f rows/s)", total, total / (time.perf_counter() - started))
+        rows.clear()
+        vectors.clear()
+
+    for obj in col.iterator(include_vector=True, return_properties=prop_names):
+        vector = obj.vector.get("default") if isinstance(obj.vector, dict) else obj.vector
+        if not vector or not obj.properties.get("content_hash"):
+            continue
+        if dims is None:
+            dims = len(vector)
+        elif len(vector) != dims:
+            raise ValueError(f"Mixed vector dimensions in '{collection}' ({dims} and {len(vector)})")
+        rows.append({k: v for k, v in obj.properties.items() if v is not None})
+        vectors.append(vector)
+        if len(rows) >= part_size:
+            flush()
+    if rows:
+        flush()
+
+    total = sum(p["rows"] for p in parts)
+    (out / INDEX_FILE).write_text(json.dumps({
+        "format": SNAPSHOT_FORMAT,
+        "collection": collection,
+        "properties": prop_names,
+        "dimensions": dims,
+        "parts": parts,
+        "rows": total,
+    }, indent=2))
+
+    elapsed = time.perf_counter() - started
+    return {"rows": total, "parts": len(parts), "seconds": elapsed,
+            "rows_per_s": total / elapsed if elapsed else 0.0}
+
+
+def read_index(snapshot_dir: str | Path) -> dict:
+    index = json.loads((Path(snapshot_dir) / INDEX_FILE).read_text())
+    if index.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format: {index.get('format')!r}")
+    return index
+
+
+def iter_part_batches(snapshot_dir: str | Path, part: dict, batch_size: int):
+    """Yield (properties, vectors) batches of one part."""
+    base = Path(snapshot_dir) / part["name"]
+    vectors = np.load(f"{base}.npy", mmap_mode="r")
+    with open(f"{base}.jsonl") as f:
+        batch: list[dict] = []
+        start = 0
+        for line in f:
+            batch.append(json.loads(line))
+            if len(batch) >= batch_size:
+                yield batch, vectors[start: start + len(batch)]
+                start += len(batch)
+                batch = []
+        if batch:
+            yield batch, vectors[start: start + len(batch)]
+
+
+def import_snapshot(
+    client,
+    snapshot_dir: str | Path,
+    collection: str,
+    batch_size: int = 200,
+    concurrency: int = 4,
+    compression: str | None = None,
+) -> dict:
+    """Insert a snapshot into `collection` (created if missing) without re-embedding."""
+    index = read_index(snapshot_dir)
+    ensure_schema(client, name=collection, compression=compression, vector_size=index["dimensions"])
+    col = client.collections.get(collection)
+    stored = stored_vector_size(col)
+    if stored is not None and stored != index["dimensions"]:
+        raise ValueError(f"'{collection}' stores {stored}-dimension vectors; "
+                         f"the snapshot has {index['dimensions']}")
+
+    stats = {"imported": 0, "skipped_existing": 0}
+    started = time.perf_counter()
+
+    def insert(props: list[dict], vectors: np.ndarray) -> tuple[int, int]:
+        existing = fetch_existing_hashes(col, [p["content_hash"] for p in props])
+        objects = [
+            DataObject(properties=p, vector=v.tolist(), uuid=object_uuid(p["content_hash"]))
+            for p, v in zip(props, vectors) if p["content_hash"] not in existing
+        ]
+        if objects:
+            result = col.data.insert_many(objects)
+            if getattr(result, "errors", None):
+                raise RuntimeError(f"Weaviate insert errors: {result.errors}")
+            bump_index_generation()
+        return len(objects), len(props) - len(objects)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        in_flight = set()
+
+        def collect(done) -> None:
+            for future in done:
+                in_flight.discard(future)
+                imported, skipped = future.result()
+                stats["imported"] += imported
+                stats["skipped_existing"] += skipped
+            logger.info("Imported %d objects (%.0f rows/s)", stats["imported"],
+                        stats["imported"] / (time.perf_counter() - started))
+
+        for part in index["parts"]:
+            for props, vectors in iter_part_batches(snapshot_dir, part, batch_size):
+                # bound memory: at most two batches queued per worker
+                if len(in_flight) >= 2 * concurrency:
+                    collect(wait(in_flight, return_when=FIRST_COMPLETED).done)
+                # np.array copies the batch out of the memory map
+                in_flight.add(pool.submit(insert, props, np.array(vectors)))
+        while in_flight:
+            collect(wait(in_flight, return_when=FIRST_COMPLETED).done)
+
+    elapsed = time.perf_counter() - started
+    rows = stats["imported"] + stats["skipped_existing"]
+    return {**stats, "seconds": elapsed, "rows_per_s": rows / elapsed if elapsed else 0.0}
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="write a collection to a snapshot directory")
+    export.add_argument("path")
+    export.add_argument("--collection", default=COLLECTION)
+    export.add_argument("--part-size", type=int, default=10_000, help="objects per part file")
+
+    load = commands.add_parser("import", help="load a snapshot directory into a collection")
+    load.add_argument("path")
+    load.add_argument("--collection", default=None, help="target collection (default: the exported one)")
+    load.add_argument("--batch-size", type=int, default=200)
+    load.add_argument("--concurrency", type=int, default=4, help="concurrent insert batches")
+    load.add_argument("--compression", choices=["none", *QUANTIZERS], default=None,
+                      help="vector compression if the collection is created")
+    args = parser.parse_args()
+
+    client = connect(os.environ["WEAVIATE_URL"], os.environ["WEAVIATE_API_KEY"])
+    try:
+        if args.command == "export":
+            stats = export_collection(client, args.collection, args.path, part_size=args.part_size)
+            print(f"Exported {stats['rows']} objects from '{args.collection}' into {stats['parts']} parts "
+                  f"in {stats['seconds']:.1f}s ({stats['rows_per_s']:.0f} rows/s).")
+        else:
+            collection = args.collection or read_index(args.path)["collection"]
+            stats = import_snapshot(client, args.path, collection, batch_size=args.batch_size,
+                                    concurrency=args.concurrency, compression=args.compression)
+            print(f"Imported {stats['imported']} objects into '{collection}' "
+                  f"({stats['skipped_existing']} already present) in {stats['seconds']:.1f}s "
+                  f"({stats['rows_per_s']:.0f} rows/s).")
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
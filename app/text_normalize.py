@@ -0,0 +1,81 @@
+import os
+import re
+from dataclasses import dataclass
+
+# Patterns are compiled once at import; pdf_utils' cleaner, sentence splitter
+# and chunker all share them.
+HYPHEN_BREAK_RE = re.compile(r"(\w)-\n(\w)")
+# Same result as `[ \t]+` -> " ", minus the no-op rewrite of every single space
+SPACE_RUN_RE = re.compile(r"[ \t]{2,}|\t")
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+# Space runs and blank-line runs are disjoint characters, so when a page has
+# both they are fixed in one fused pass
+LAYOUT_WHITESPACE_RE = re.compile(r"[ \t]{2,}|\t|\n{3,}")
+# Consuming the lowercase letter scans faster than the zero-width
+# `(?<=[a-z])(?=[A-Z])`; it's put back by the replacement template
+CAMEL_CASE_RE = re.compile(r"[a-z](?=[A-Z])")
+WHITESPACE_RE = re.compile(r"\s+")
+PARAGRAPH_BREAK_RE = re.compile(r"\n\s*\n")
+# Split on punctuation followed by space + capital/open quote/bracket
+SENTENCE_BREAK_RE = re.compile(r'(?<=[.!?])\s+(?=[A-Z“"(\[])')
+WORD_RE = re.compile(r"\S+")
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ("0", "false", "no", "off")
+
+
+@dataclass(frozen=True)
+class CleaningRules:
+    """Which clean-up rules clean_text applies (all on by default).
+
+    Turn `split_camel_case` off for documents whose product names
+    ("PowerSchool", "iPad") must not be split into words.
+    """
+
+    join_hyphenated: bool = True
+    collapse_spaces: bool = True
+    squeeze_blank_lines: bool = True
+    split_camel_case: bool = True
+
+
+DEFAULT_RULES = CleaningRules(split_camel_case=_env_flag("PDF_SPLIT_CAMEL_CASE", True))
+
+
+def _layout_whitespace(match: re.Match) -> str:
+    return "\n\n" if match.group()[0] == "\n" else " "
+
+
+def clean_text(text: str, rules: CleaningRules | None = None) -> str:
+    """Clean common PDF extraction artifacts.
+
+    Each rule first checks (at C speed) whether its trigger appears at all,
+    so clean pages skip most regex scans.
+    """
+    if not text:
+        return ""
+    rules = rules or DEFAULT_RULES
+
+    if rules.join_hyphenated and "-\n" in text:
+        text = HYPHEN_BREAK_RE.sub(r"\1\2", text)
+
+    spaces = rules.collapse_spaces and ("\t" in text or "  " in text)
+    blank_lines = rules.squeeze_blank_lines and "\n\n\n" in text
+    if spaces and blank_lines:
+        text = LAYOUT_WHITESPACE_RE.sub(_layout_whitespace, text)
+    elif spaces:
+        text = SPACE_RUN_RE.sub(" ", text)
+    elif blank_lines:
+        text = BLANK_LINES_RE.sub("\n\n", text)
+
+    if rules.split_camel_case:
+        text = CAMEL_CASE_RE.sub(r"\g<0> ", text)
+    return text.strip()
+
+
+def normalize_whitespace(text: str) -> str:
+    """Collapse every whitespace run to one space and strip."""
+    return WHITESPACE_RE.sub(" ", text).strip()
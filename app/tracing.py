@@ -0,0 +1,186 @@
+"""Request traces: nested, timed spans exported to a local JSONL file.
+
+TraceMiddleware gives every API request a trace id (a valid incoming
+`X-Trace-Id` is kept, and the id is returned in that header) and a root
+span. Code on the request's path opens child spans with
+
+    with span("weaviate.hybrid", k=k) as s:
+        ...
+        s.set(hits=len(docs))
+
+The current trace and span live in contextvars, so spans nest correctly
+across the threadpool and within_deadline() hops. Each span becomes one
+line in TRACE_PATH: trace, span and parent ids, name, start time,
+duration, its attributes (token counts, payload sizes, ...) and the
+error type if it raised. Lines are written by a background thread
+(app.jsonl_log), and the file is rotated at TRACE_MAX_MB.
+
+Outside a request (CLIs, background jobs), or with TRACE_PATH empty,
+span() does nothing.
+"""
+
+import itertools
+import os
+import re
+import secrets
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from app.jsonl_log import JsonlLog
+
+logger = logging.getLogger(__name__)
+
+TRACE_PATH = os.getenv("TRACE_PATH", "logs/traces.jsonl")  # empty = no tracing
+TRACE_MAX_MB = float(os.getenv("TRACE_MAX_MB", "20"))
+TRACE_BACKUPS = int(os.getenv("TRACE_BACKUPS", "3"))
+
+# health checks, docs and the Gradio UI's assets would drown out the API
+_UNTRACED_PREFIXES = ("/health", "/metrics", "/docs", "/redoc", "/openapi.json", "/ui")
+_TRACE_ID_RE = re.compile(r"^[0-9a-f]{8,32}$")
+
+_log = JsonlLog(TRACE_PATH, int(TRACE_MAX_MB * 1024 * 1024), TRACE_BACKUPS) if TRACE_PATH else None
+# span ids only need to be unique within a trace: a counter (from a random
+# start, for traces that span services) is far cheaper than urandom per span
+_span_ids = itertools.count(secrets.randbits(48))
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attrs", "started")
+
+    def __init__(self, trace_id: str, parent_id: str | None, name: str, attrs: dict):
+        self.trace_id = trace_id
+        self.span_id = f"{next(_span_ids):x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.started = time.time()
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+
+class _NoSpan:
+    trace_id = None
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+_trace_id: ContextVar[str | None] = ContextVar("trace_id", default=None)
+_span: ContextVar[Span | None] = ContextVar("span", default=None)
+
+
+def current_trace_id() -> str | None:
+    return _trace_id.get()
+
+
+def current_span() -> Span | _NoSpan:
+    return _span.get() or NO_SPAN
+
+
+@contextmanager
+def span(name: str, **attrs: Any):
+    """A child of the current span, timed and exported when it ends."""
+    trace_id = _trace_id.get()
+    if trace_id is None or _log is None:
+        yield NO_SPAN
+        return
+    parent = _span.get()
+    s = Span(trace_id, parent.span_id if parent else None, name, attrs)
+    token = _span.set(s)
+    t0 = time.perf_counter()
+    try:
+        yield s
+    except BaseException as err:
+        s.attrs["error"] = type(err).__name__
+        raise
+    finally:
+        _span.reset(token)
+        _log.write({
+            "trace": s.trace_id,
+            "span": s.span_id,
+            "parent": s.parent_id,
+            "name": s.name,
+            "start": round(s.started, 6),
+            "ms": round((time.perf_counter() - t0) * 1000, 3),
+            "attrs": s.attrs,
+        })
+
+
+@contextmanager
+def trace(name: str, trace_id: str | None = None, **attrs: Any):
+    """Start a trace (with `name` as its root span) for the enclosed work."""
+    if trace_id is None or not _TRACE_ID_RE.match(trace_id):
+        trace_id = secrets.token_hex(8)
+    token = _trace_id.set(trace_id)
+    try:
+        with span(name, **attrs) as root:
+            yield root
+    finally:
+        _trace_id.reset(token)
+
+
+def record_usage(response, **sizes: Any) -> None:
+    """Token counts of an OpenAI response (and any payload `sizes`) on the
+    current span."""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        sizes.update(
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+            total_tokens=getattr(usage, "total_tokens", None),
+        )
+    current_span().set(**sizes)
+
+
+class TraceMiddleware:
+    """ASGI middleware: one trace per API request, its id in `X-Trace-Id`.
+
+    Pure ASGI (not BaseHTTPMiddleware) so a streamed response, like
+    /ask_batch's, stays inside its trace until the last line is sent.
+    Calls `on_request(path)` when tracing starts; it returns a callable to
+    run when the request ends, or None (used by the profiler).
+    """
+
+    def __init__(self, app, on_request=None):
+        self.app = app
+        self.on_request = on_request
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(_UNTRACED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        incoming = headers.get(b"x-trace-id", b"").decode("latin-1").lower() or None
+        finished = self.on_request(scope["path"]) if self.on_request else None
+        try:
+            with trace(f"{scope['method']} {scope['path']}", trace_id=incoming) as root:
+                trace_id = _trace_id.get()
+                sizes = {"request_bytes": 0, "response_bytes": 0}
+
+                async def counting_receive():
+                    message = await receive()
+                    sizes["request_bytes"] += len(message.get("body", b""))
+                    return message
+
+                async def send_with_trace_id(message):
+                    if message["type"] == "http.response.start":
+                        root.set(status=message["status"])
+                        message["headers"] = [*message.get("headers", []), (b"x-trace-id", trace_id.encode())]
+                    elif message["type"] == "http.response.body":
+                        sizes["response_bytes"] += len(message.get("body", b""))
+                    await send(message)
+
+                try:
+                    await self.app(scope, counting_receive, send_with_trace_id)
+                finally:
+                    root.set(**sizes)
+        finally:
+            if finished is not None:
+                finished()
@@ -0,0 +1,141 @@
+"""Gradio UI mounted at /ui (not imported at all when API_ONLY is set).
+
+The UI calls the API over HTTP like any other client, forwarding the
+visitor's IP so per-client rate limits still apply.
+"""
+
+import os
+import secrets
+
+import gradio as gr
+import requests
+from fastapi import FastAPI
+from fastapi.responses import RedirectResponse
+
+from app.deadline import ASK_DEADLINE_SECONDS, UPLOAD_DEADLINE_SECONDS
+from app.pdf_utils import page_label
+from app.sessions import SESSION_TTL_SECONDS
+
+API_URL = os.getenv("API_URL", "http://127.0.0.1:8000")
+
+# the API answers (or gives up with a 504) within its own deadline; the
+# margin covers form parsing and the upload transfer before it starts
+UI_TIMEOUT_MARGIN = 30
+
+
+def forwarded_ip_headers(request: gr.Request | None) -> dict:
+    """Forward the real browser IP on the Gradio -> API self-call so rate
+    limits apply per visitor instead of to 127.0.0.1."""
+    if request is None:
+        return {}
+    ip = request.headers.get("x-forwarded-for") or (
+        request.client.host if request.client else None
+    )
+    return {"X-Forwarded-For": ip} if ip else {}
+
+
+def upload_pdf_ui(pdf_file, request: gr.Request):
+    if pdf_file is None:
+        return "Please upload a PDF."
+
+    with open(pdf_file.name, "rb") as f:
+        files = {"file": f}
+        r = requests.post(
+            f"{API_URL}/upload_pdf",
+            files=files,
+            headers=forwarded_ip_headers(request),
+            timeout=UPLOAD_DEADLINE_SECONDS + UI_TIMEOUT_MARGIN,
+        )
+
+    if r.status_code != 200:
+        return f"❌ {r.text}"
+
+    data = r.json()
+    if data.get("status") == "success":
+        return data.get("message", "✅ PDF processed.")
+    return f"❌ {data.get('message', 'Upload failed')}"
+
+def new_session_id() -> str:
+    return secrets.token_urlsafe(16)
+
+
+def ask_question_ui(question, session_id, request: gr.Request):
+    if not question.strip():
+        return "⚠️ Please enter a question.", "", ""
+
+    r = requests.post(
+        f"{API_URL}/ask_question",
+        data={"query": question, "include_retrieved_docs": "true", "session_id": session_id},
+        headers=forwarded_ip_headers(request),
+        timeout=ASK_DEADLINE_SECONDS + UI_TIMEOUT_MARGIN,
+    )
+
+    if r.status_code != 200:
+        return f"❌ {r.text}", "", ""
+
+    data = r.json()
+
+    answer = data.get("answer", data.get("error", "Unknown error"))
+    retrieved_docs = data.get("retrieved_docs", [])
+    reranked_docs = data.get("reranked_docs", [])
+
+    def format_doc(doc: dict) -> str:
+        page = page_label(doc)
+        page = f" | {page.capitalize()}" if page else ""
+        source = f"{doc['document_name']} | " if doc.get("document_name") else ""
+        return f"{source}Chunk: {int(doc.get('chunk_index') or 0)}{page} | Score: {doc.get('score')}\n{doc.get('text') or doc.get('snippet')}"
+
+    retrieved_text = "\n\n---\n\n".join(
+        format_doc(doc) for doc in retrieved_docs
+    ) if retrieved_docs else "No retrieved docs."
+
+    reranked_text = "\n\n---\n\n".join(
+        format_doc(doc) for doc in reranked_docs
+    ) if reranked_docs else "No reranked docs."
+
+    return answer, retrieved_text, reranked_text
+
+
+def build_ui() -> gr.Blocks:
+    with gr.Blocks(title="HR Q&A Bot") as gradio_app:
+        gr.Markdown("## 🤖 HR Q&A Bot — Upload your HR PDF and ask questions")
+
+        with gr.Tab("📄 Upload PDF"):
+            pdf_input = gr.File(label="Upload HR policy PDF")
+            upload_btn = gr.Button("Upload & Process")
+            upload_output = gr.Textbox(label="Upload Status")
+            upload_btn.click(upload_pdf_ui, inputs=pdf_input, outputs=upload_output)
+
+        with gr.Tab("💬 Ask a Question"):
+            # one conversation per browser tab, so follow-ups reuse its context
+            session_id = gr.State(new_session_id, time_to_live=SESSION_TTL_SECONDS)
+            question_input = gr.Textbox(label="Ask a question about your uploaded document")
+            submit_btn = gr.Button("Get Answer")
+
+            answer_output = gr.Textbox(label="Answer", lines=10, interactive=False)
+
+            with gr.Accordion("Retrieved Docs", open=False):
+                retrieved_output = gr.Textbox(label="Retrieved Docs", lines=14, interactive=False)
+            with gr.Accordion("Reranked Docs Used", open=False):
+                reranked_output = gr.Textbox(label="Reranked Docs Used", lines=14, interactive=False)
+
+            submit_btn.click(
+                ask_question_ui,
+                inputs=[question_input, session_id],
+                outputs=[answer_output, retrieved_output, reranked_output],
+            )
+            new_btn = gr.Button("New conversation", size="sm")
+            new_btn.click(new_session_id, outputs=session_id)
+    return gradio_app
+
+
+def mount_ui(app: FastAPI) -> None:
+    @app.get("/gradio_api/config")
+    def gradio_config_alias():
+        return RedirectResponse(url="/gradio_api/info", status_code=307)
+
+    @app.get("/gradio_api/api")
+    def gradio_api_alias():
+        return RedirectResponse(url="/gradio_api/info", status_code=307)
+
+    gr.mount_gradio_app(app, build_ui(), path="/ui")
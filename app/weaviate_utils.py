@@ -1,18 +1,110 @@
+import os
+import re
+import random
 import time
+import threading
 import hashlib
 import logging
 import weaviate
 from weaviate.auth import AuthApiKey
 from weaviate.classes.init import AdditionalConfig, Timeout
-from weaviate.classes.config import Configure, DataType, Property, VectorDistances
+from weaviate.classes.config import Configure, DataType, Property, Tokenization, VectorDistances
 from weaviate.classes.data import DataObject
 from weaviate.classes.query import MetadataQuery, Filter
 
-from app.llm_utils import embed_texts, embed_text, expand_query
+from app.admission import Overloaded
+from app.circuit_breaker import BREAKERS
+from app.deadline import DeadlineExceeded, call_timeout, within_deadline
+from app.llm_utils import embed_texts, embed_text
+from app.mmr import diversify
+from app.near_dup import NEAR_DUP_ACTION, NEAR_DUP_THRESHOLD, LSHIndex, band_keys, figures, minhash, similarity
+from app.query_expansion import build_search_queries, corpus_vocabulary
+from app.retrieval_settings import MAX_RERANK_CHARS, current_settings
+from app.shared_state import bump_index_generation
+from app.tracing import span
 
 logger = logging.getLogger(__name__)
 
-COLLECTION = "PDFDocument"
+COLLECTION = os.getenv("WEAVIATE_COLLECTION", "PDFDocument")
+
+# Vector index compression for new collections: none | rq | bq | sq | pq
+VECTOR_COMPRESSION = os.getenv("VECTOR_COMPRESSION", "none")
+
+QUANTIZERS = {
+    "rq": Configure.VectorIndex.Quantizer.rq,
+    "bq": Configure.VectorIndex.Quantizer.bq,
+    "sq": Configure.VectorIndex.Quantizer.sq,
+    "pq": Configure.VectorIndex.Quantizer.pq,
+}
+
+PROPERTIES = [
+    Property(name="text", data_type=DataType.TEXT),
+    Property(name="chunk_index", data_type=DataType.INT),
+    # whole-value tokens, so a filter on "handbook.pdf" doesn't also match
+    # "staff-handbook.pdf" (word tokenization splits on '-', '.' and spaces)
+    Property(name="document_name", data_type=DataType.TEXT, tokenization=Tokenization.FIELD),
+    Property(name="content_hash", data_type=DataType.TEXT),
+    # provenance: source pages and offsets into the extracted document text
+    Property(name="page_start", data_type=DataType.INT),
+    Property(name="page_end", data_type=DataType.INT),
+    Property(name="char_start", data_type=DataType.INT),
+    Property(name="char_end", data_type=DataType.INT),
+    # leading slice of `text`, enough for the reranker; not indexed so it
+    # doesn't count twice in BM25
+    Property(name="snippet", data_type=DataType.TEXT, index_searchable=False, index_filterable=False),
+    # near-duplicate detection (app.near_dup): MinHash signature, its LSH
+    # bucket keys, and the canonical chunk's content_hash for linked duplicates
+    Property(name="minhash", data_type=DataType.INT_ARRAY, index_filterable=False),
+    Property(name="lsh_bands", data_type=DataType.TEXT_ARRAY, index_searchable=False),
+    Property(name="duplicate_of", data_type=DataType.TEXT, index_searchable=False),
+]
+
+PROVENANCE_FIELDS = ("page_start", "page_end", "char_start", "char_end")
+
+# What rerank_chunks_with_llm reads of each candidate (at most)
+SNIPPET_CHARS = MAX_RERANK_CHARS
+
+# Each tenant (department, school, ...) gets its own collection, so a query
+# only ever scans that tenant's documents.
+_TENANT_RE = re.compile(r"^[A-Za-z0-9_]{1,48}$")
+
+
+def valid_tenant(tenant: str) -> bool:
+    """Whether `tenant` can name a collection (letters, digits, underscores)."""
+    return bool(_TENANT_RE.match(tenant))
+
+
+def collection_name(tenant: str | None = None) -> str:
+    """Collection holding `tenant`'s documents (the shared one for None)."""
+    if not tenant:
+        return COLLECTION
+    if not valid_tenant(tenant):
+        raise ValueError("Tenant names may only contain letters, digits and underscores.")
+    return f"{COLLECTION}_{tenant.lower()}"
+
+
+_ready_collections: set[str] = set()
+_ready_lock = threading.Lock()
+
+
+def tenant_collection(client, tenant: str | None, create: bool = False) -> str | None:
+    """Resolve `tenant` to its collection name.
+
+    With `create`, the collection is created on first use (uploads);
+    otherwise None is returned while it doesn't exist yet (searches).
+    """
+    name = collection_name(tenant)
+    if name in _ready_collections or name == COLLECTION:
+        return name
+    with _ready_lock:
+        if name in _ready_collections:
+            return name
+        if create:
+            ensure_schema(client, name=name)
+        elif not client.collections.exists(name):
+            return None
+        _ready_collections.add(name)
+    return name
 
 
 def connect(weaviate_url: str, weaviate_api_key: str):
@@ -30,34 +122,192 @@ def connect(weaviate_url: str, weaviate_api_key: str):
     )
 
 
-def ensure_schema(client):
+class BackgroundConnection:
+    """Weaviate client connected (and reconnected) in a background thread.
+
+    The first connect, `on_connect` (e.g. ensure_schema) and every retry
+    run off the caller's thread, so the app can serve /health while
+    Weaviate is still unreachable. Failed attempts back off exponentially
+    (with jitter) up to `max_backoff` seconds; once connected, readiness
+    is checked every `check_interval` seconds and a dead client is closed
+    and replaced.
+    """
+
+    def __init__(self, connect_fn, on_connect=None, min_backoff: float = 1.0,
+                 max_backoff: float = 60.0, check_interval: float = 30.0):
+        self._connect_fn = connect_fn
+        self._on_connect = on_connect
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.check_interval = check_interval
+        self.client = None
+        self.state = "idle"
+        self.attempts = 0
+        self.last_error: str | None = None
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "BackgroundConnection":
+        self.state = "connecting"
+        self._thread = threading.Thread(target=self._run, name="weaviate-connect", daemon=True)
+        self._thread.start()
+        return self
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def status(self) -> dict:
+        return {"state": self.state, "attempts": self.attempts, "last_error": self.last_error}
+
+    def _run(self) -> None:
+        backoff = self.min_backoff
+        while not self._stop.is_set():
+            if self.client is None:
+                self.attempts += 1
+                client = None
+                try:
+                    client = self._connect_fn()
+                    if self._on_connect is not None:
+                        self._on_connect(client)
+                except Exception as err:
+                    if client is not None:
+                        # connected but e.g. ensure_schema failed: don't leak it
+                        try:
+                            client.close()
+                        except Exception:
+                            logger.debug("Error closing Weaviate client", exc_info=True)
+                    self.last_error = str(err)
+                    delay = backoff * random.uniform(0.8, 1.2)
+                    logger.warning("Weaviate connect attempt %d failed: %s — retrying in %.1fs",
+                                   self.attempts, err, delay)
+                    backoff = min(backoff * 2, self.max_backoff)
+                    self._stop.wait(delay)
+                    continue
+                if self._stop.is_set():
+                    client.close()
+                    break
+                self.client, self.state, self.last_error = client, "connected", None
+                backoff = self.min_backoff
+                self._ready.set()
+                logger.info("Connected to Weaviate (attempt %d)", self.attempts)
+                continue
+
+            if self._stop.wait(self.check_interval):
+                break
+            try:
+                healthy = self.client.is_ready()
+            except Exception:
+                healthy = False
+            if not healthy:
+                logger.warning("Weaviate connection lost; reconnecting")
+                self._drop()
+                self.state = "reconnecting"
+
+    def _drop(self) -> None:
+        client, self.client = self.client, None
+        self._ready.clear()
+        if client is not None:
+            try:
+                client.close()
+            except Exception:
+                logger.debug("Error closing Weaviate client", exc_info=True)
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._drop()
+        self.state = "closed"
+
+
+def ensure_schema(client, name: str | None = None, compression: str | None = None,
+                  dimensions: int | None = None, vector_size: int | None = None):
     """
     Create collection once, do NOT delete data.
     BYO vectors (we supply vectors explicitly at insert time).
+    Properties added since the collection was created are added in place
+    (existing objects simply have no value for them).
+    `compression` (default VECTOR_COMPRESSION) only applies on creation;
+    moving an existing collection over is app.migrate's job.
+    A known `vector_size` (e.g. a snapshot's) skips the embeddings call
+    that otherwise checks the size on creation.
     """
-    if client.collections.exists(COLLECTION):
-        logger.info("Weaviate collection '%s' exists", COLLECTION)
+    name = name or COLLECTION
+    compression = compression or VECTOR_COMPRESSION
+
+    if client.collections.exists(name):
+        logger.info("Weaviate collection '%s' exists", name)
+        col = client.collections.get(name)
+        properties = col.config.get().properties
+        existing = {p.name for p in properties}
+        if any(p.name == "document_name" and p.tokenization != Tokenization.FIELD for p in properties):
+            # tokenization can't be changed in place; searches post-filter by
+            # exact name meanwhile, so scoped searches may return fewer hits
+            logger.warning(
+                "'%s' tokenizes document_name by word, so document filters over-match. Copy it to a new "
+                "collection with `python -m app.snapshot export` + `import` (no re-embedding) and point "
+                "WEAVIATE_COLLECTION at the copy.", name,
+            )
+        for prop in PROPERTIES:
+            if prop.name not in existing:
+                col.config.add_property(prop)
+                logger.info("Added property '%s' to '%s'", prop.name, name)
         return
 
-    dims = len(embed_text("dimension check"))
+    if compression != "none" and compression not in QUANTIZERS:
+        raise ValueError(f"Unknown vector compression: {compression!r}")
+
+    dims = vector_size or len(embed_text("dimension check", dimensions=dimensions))
     logger.info("Embedding dims (sanity check only): %d", dims)
 
     client.collections.create(
-        name=COLLECTION,
+        name=name,
         vector_config=Configure.Vectors.self_provided(
             vector_index_config=Configure.VectorIndex.hfresh(
-                distance_metric=VectorDistances.COSINE
+                distance_metric=VectorDistances.COSINE,
+                quantizer=QUANTIZERS[compression]() if compression != "none" else None,
             )
         ),
-        properties=[
-            Property(name="text", data_type=DataType.TEXT),
-            Property(name="chunk_index", data_type=DataType.INT),
-            Property(name="document_name", data_type=DataType.TEXT),
-            Property(name="content_hash", data_type=DataType.TEXT),
-        ],
+        properties=PROPERTIES,
     )
 
-    logger.info("Created '%s' (BYO vectors, cosine)", COLLECTION)
+    logger.info("Created '%s' (BYO vectors, cosine, %d dims, compression=%s)", name, dims, compression)
+
+def learn_corpus_vocabulary(client) -> int:
+    """Seed the local expansion vocabulary from every stored chunk (the
+    shared collection and each tenant's), unless it is still current.
+
+    Every worker reads the same collections, so all of them filter
+    expansions the same way, including by documents indexed before the
+    restart, by another worker or by the bulk-ingest CLI.
+    """
+    if corpus_vocabulary.current():
+        return 0
+    names = sorted(
+        name for name in client.collections.list_all(simple=True)
+        if name == COLLECTION or name.startswith(f"{COLLECTION}_")
+    )
+
+    def texts():
+        for name in names:
+            for obj in client.collections.get(name).iterator(return_properties=["text"]):
+                yield obj.properties.get("text") or ""
+
+    learned = corpus_vocabulary.seed(texts())
+    logger.info("Learned the vocabulary of %d stored chunks in %d collections", learned, len(names))
+    return learned
+
+
+def stored_vector_size(col) -> int | None:
+    """Length of the vectors already stored in `col` (None while it is empty)."""
+    res = col.query.fetch_objects(limit=1, include_vector=True, return_properties=["content_hash"])
+    for obj in res.objects:
+        vector = obj.vector.get("default") if isinstance(obj.vector, dict) else obj.vector
+        if vector:
+            return len(vector)
+    return None
+
 
 def chunk_hash(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()
@@ -68,31 +318,101 @@ def fetch_existing_hashes(col, hashes: list[str], batch_size: int = 100) -> set[
     existing: set[str] = set()
     for i in range(0, len(hashes), batch_size):
         batch = hashes[i:i + batch_size]
-        res = col.query.fetch_objects(
-            filters=Filter.by_property("content_hash").contains_any(batch),
-            limit=len(batch),
-            return_properties=["content_hash"],
-        )
+        with BREAKERS["weaviate.search"].guard():
+            res = within_deadline(
+                col.query.fetch_objects,
+                filters=Filter.by_property("content_hash").contains_any(batch),
+                limit=len(batch),
+                return_properties=["content_hash"],
+            )
         existing.update(o.properties["content_hash"] for o in res.objects)
     return existing
 
-def insert_chunks(
-    client,
-    chunks: list[str],
-    document_name: str,
-    batch_size: int = 12,
-    max_retries: int = 3,
-):
-    if not chunks:
-        raise ValueError("No chunks to insert into Weaviate")
+# Weaviate's default QUERY_MAXIMUM_RESULTS caps offset + limit
+_MAX_NEAR_DUP_CANDIDATES = 10_000
+
 
-    col = client.collections.get(COLLECTION)
+def fetch_near_duplicates(col, signatures: list, chunk_figures: list[tuple] | None = None,
+                          batch_size: int = 25) -> list[str | None]:
+    """For each MinHash signature, the content_hash of a stored chunk it
+    near-duplicates (None if none). With `chunk_figures` (near_dup.figures
+    of each chunk), a stored chunk with other figures never matches.
 
+    Only chunks sharing an LSH bucket are fetched and compared, paged
+    through with one contains_any query per page of each `batch_size`
+    signatures.
+    """
+    matches: list[str | None] = []
+    for start in range(0, len(signatures), batch_size):
+        batch = signatures[start:start + batch_size]
+        batch_figures = chunk_figures[start:start + batch_size] if chunk_figures else [None] * len(batch)
+        keys = sorted({key for sig in batch for key in band_keys(sig)})
+        page = max(100, 4 * len(batch))
+        candidates = []
+        for offset in range(0, _MAX_NEAR_DUP_CANDIDATES, page):
+            with BREAKERS["weaviate.search"].guard():
+                res = within_deadline(
+                    col.query.fetch_objects,
+                    filters=Filter.by_property("lsh_bands").contains_any(keys),
+                    limit=page,
+                    offset=offset,
+                    return_properties=["content_hash", "minhash", "duplicate_of", "text"],
+                )
+            candidates.extend(o.properties for o in res.objects if o.properties.get("minhash"))
+            if len(res.objects) < page:
+                break
+        else:
+            logger.warning("Near-duplicate lookup stopped at %d candidates; some near-duplicates may be "
+                           "indexed", _MAX_NEAR_DUP_CANDIDATES)
+        for sig, figs in zip(batch, batch_figures):
+            best, best_score = None, NEAR_DUP_THRESHOLD
+            for props in candidates:
+                if figs is not None and figures(props.get("text") or "") != figs:
+                    continue
+                score = similarity(sig, props["minhash"])
+                if score >= best_score:
+                    best = props.get("duplicate_of") or props["content_hash"]
+                    best_score = score
+            matches.append(best)
+    return matches
+
+
+def find_near_duplicates(col, chunks: list[tuple[str, str]]) -> tuple[dict, dict]:
+    """MinHash `chunks` ((text, content_hash) pairs) and find near-duplicates.
+
+    Returns ({content_hash: signature}, {content_hash: canonical content_hash})
+    where the canonical chunk is either already stored or earlier in `chunks`.
+    """
+    signatures = {h: minhash(text) for text, h in chunks}
+    chunk_figures = {h: figures(text) for text, h in chunks}
+    stored = fetch_near_duplicates(col, list(signatures.values()), list(chunk_figures.values()))
+
+    duplicate_of = {}
+    in_upload = LSHIndex()
+    for (content_hash, sig), canonical in zip(signatures.items(), stored):
+        canonical = canonical or in_upload.query(sig, chunk_figures[content_hash])
+        if canonical is None:
+            in_upload.add(content_hash, sig, chunk_figures[content_hash])
+        else:
+            duplicate_of[content_hash] = canonical
+    return signatures, duplicate_of
+
+
+def prepare_chunks(col, chunks: list[str] | list[dict], document_name: str) -> tuple[list[dict], dict]:
+    """Dedupe `chunks` and build the properties of the ones to insert.
+
+    Drops repeats within `chunks`, chunks already stored in `col`, and
+    (per NEAR_DUP_ACTION) near-duplicates. Returns (properties, stats).
+    """
     # 1) dedupe within the current upload first
     unique_chunks = []
     seen_hashes = set()
+    provenance = {}
 
     for i, chunk in enumerate(chunks):
+        if isinstance(chunk, dict):
+            provenance[i] = {f: chunk[f] for f in PROVENANCE_FIELDS if f in chunk}
+            chunk = chunk["text"]
         content_hash = chunk_hash(chunk)
         if content_hash in seen_hashes:
             continue
@@ -104,91 +424,231 @@ def insert_chunks(
     chunks_to_insert = [t for t in unique_chunks if t[2] not in existing]
     skipped_existing = len(unique_chunks) - len(chunks_to_insert)
 
-    if not chunks_to_insert:
-        logger.info("No new chunks to insert; all chunks already exist")
-        return {
-            "inserted": 0,
-            "skipped_existing": skipped_existing,
-            "unique_in_upload": len(unique_chunks),
+    # 3) near-duplicates (headers, dates, whitespace) of stored or earlier chunks
+    signatures, duplicate_of = {}, {}
+    if NEAR_DUP_ACTION != "off" and chunks_to_insert:
+        signatures, duplicate_of = find_near_duplicates(col, [(c, h) for _, c, h in chunks_to_insert])
+        if NEAR_DUP_ACTION == "skip":
+            chunks_to_insert = [t for t in chunks_to_insert if t[2] not in duplicate_of]
+        logger.info("%d near-duplicate chunks (%s)", len(duplicate_of), NEAR_DUP_ACTION)
+
+    to_insert = []
+    for orig_idx, chunk, content_hash in chunks_to_insert:
+        properties = {
+            "text": chunk,
+            "snippet": chunk[:SNIPPET_CHARS],
+            "chunk_index": orig_idx,
+            "document_name": document_name,
+            "content_hash": content_hash,
+            **provenance.get(orig_idx, {}),
         }
+        if content_hash in signatures:
+            sig = signatures[content_hash]
+            properties["minhash"] = sig.tolist()
+            properties["lsh_bands"] = band_keys(sig)
+        if content_hash in duplicate_of:
+            properties["duplicate_of"] = duplicate_of[content_hash]
+        to_insert.append(properties)
+
+    return to_insert, {
+        "skipped_existing": skipped_existing,
+        "unique_in_upload": len(unique_chunks),
+        "near_duplicates": len(duplicate_of),
+    }
+
 
-    total = 0
+def write_objects(col, batch: list[dict], max_retries: int = 3) -> int:
+    """Embed one batch of prepared properties and insert it, retrying the
+    insert with backoff. Returns the number of objects written."""
+    texts = [p["text"] for p in batch]
+    try:
+        vectors = embed_texts(texts)
+    except (Overloaded, DeadlineExceeded):
+        raise
+    except Exception as e:
+        raise RuntimeError(f"Embedding batch failed (size={len(texts)}): {e}")
 
-    for batch_start in range(0, len(chunks_to_insert), batch_size):
-        batch = chunks_to_insert[batch_start: batch_start + batch_size]
-        batch_texts = [chunk for _, chunk, _ in batch]
+    objects = [DataObject(properties=props, vector=vec) for props, vec in zip(batch, vectors)]
 
+    for attempt in range(1, max_retries + 1):
         try:
-            vectors = embed_texts(batch_texts)
+            with span("weaviate.insert", objects=len(objects), attempt=attempt), BREAKERS["weaviate.insert"].guard():
+                # not through within_deadline: an insert abandoned at the
+                # deadline can still commit, behind a 504 and without
+                # bumping the index generation. It is bounded by the
+                # client's insert timeout instead, and never started with
+                # the budget already spent.
+                call_timeout(float("inf"), "insert")
+                result = col.data.insert_many(objects)
+
+            if hasattr(result, "errors") and result.errors:
+                raise RuntimeError(f"Weaviate insert errors: {result.errors}")
+
+            # invalidates cached answers in every worker
+            bump_index_generation()
+            return len(objects)
+
+        except (Overloaded, DeadlineExceeded):
+            # an open circuit or a spent budget: retrying can't help
+            raise
         except Exception as e:
-            raise RuntimeError(f"Embedding batch failed (size={len(batch_texts)}): {e}")
-
-        objects = []
-        for (orig_idx, chunk, content_hash), vec in zip(batch, vectors):
-            objects.append(
-                DataObject(
-                    properties={
-                        "text": chunk,
-                        "chunk_index": orig_idx,
-                        "document_name": document_name,
-                        "content_hash": content_hash,
-                    },
-                    vector=vec,
-                )
+            if attempt == max_retries:
+                raise
+            backoff = 2 ** (attempt - 1)
+            logger.warning(
+                "Insert batch failed (attempt %d/%d): %s — retrying in %ds",
+                attempt, max_retries, e, backoff,
             )
+            # never sleep past the request's deadline
+            time.sleep(call_timeout(backoff, "insert"))
+    return 0
 
-        for attempt in range(1, max_retries + 1):
-            try:
-                result = col.data.insert_many(objects)
 
-                if hasattr(result, "errors") and result.errors:
-                    raise RuntimeError(f"Weaviate insert errors: {result.errors}")
+def insert_chunks(
+    client,
+    chunks: list[str] | list[dict],
+    document_name: str,
+    batch_size: int = 12,
+    max_retries: int = 3,
+    collection: str | None = None,
+):
+    """Embed and insert chunks, skipping ones already stored.
 
-                total += len(objects)
-                break
+    `chunks` are texts, or dicts from pdf_utils.iter_chunks whose page and
+    offset provenance is stored alongside `chunk_index`.
+    """
+    if not chunks:
+        raise ValueError("No chunks to insert into Weaviate")
 
-            except Exception as e:
-                if attempt == max_retries:
-                    raise
-                backoff = 2 ** (attempt - 1)
-                logger.warning(
-                    "Insert batch failed (attempt %d/%d): %s — retrying in %ds",
-                    attempt, max_retries, e, backoff,
-                )
-                time.sleep(backoff)
+    col = client.collections.get(collection or COLLECTION)
+    with span("insert_chunks", chunks=len(chunks)) as s:
+        with span("prepare_chunks", chunks=len(chunks)) as prepared:
+            to_insert, stats = prepare_chunks(col, chunks, document_name)
+            prepared.set(to_insert=len(to_insert), **stats)
+
+        if not to_insert:
+            logger.info("No new chunks to insert; all chunks already exist")
+            return {"inserted": 0, **stats}
+
+        total = 0
+        for batch_start in range(0, len(to_insert), batch_size):
+            total += write_objects(col, to_insert[batch_start: batch_start + batch_size], max_retries)
+        s.set(inserted=total, payload_chars=sum(len(p["text"]) for p in to_insert))
+
+    # mine the new chunks' vocabulary for local query expansion
+    corpus_vocabulary.learn([p["text"] for p in to_insert])
 
     logger.info("Inserted %d new chunks into Weaviate", total)
-    logger.info("Skipped %d chunks already present in Weaviate", skipped_existing)
+    logger.info("Skipped %d chunks already present in Weaviate", stats["skipped_existing"])
 
-    return {
-        "inserted": total,
-        "skipped_existing": skipped_existing,
-        "unique_in_upload": len(unique_chunks),
-    }
+    return {"inserted": total, **stats}
 
-def search_weaviate(client, query: str, k: int = 20):
-    col = client.collections.get(COLLECTION)
 
-    expanded_query = expand_query(query)
-    query_vec = embed_text(expanded_query)
+def hybrid_search(client, keyword_query: str, query_vec: list[float], k: int = 20,
+                  collection: str | None = None, document_name: str | None = None,
+                  full_text: bool = True, mmr_k: int | None = None, alpha: float | None = None):
+    """Run one hybrid (BM25 + vector) query with precomputed inputs,
+    optionally restricted to one document.
 
-    res = col.query.hybrid(
-        query=expanded_query,
-        vector=query_vec,
-        alpha=0.65,
-        limit=k,
-        return_properties=["text", "chunk_index"],
-        return_metadata=MetadataQuery(score=True),
-    )
+    With `full_text=False` only ids, scores, metadata and the stored
+    snippet come back (no `text` key); fetch the winners' text with
+    hydrate_docs. With `mmr_k`, the stored vectors are returned too and
+    the hits are cut to a diverse `mmr_k` (app.mmr). `alpha` defaults to
+    the current retrieval setting.
+    """
+    col = client.collections.get(collection or COLLECTION)
+    content = ["text"] if full_text else ["snippet"]
+
+    with span("weaviate.hybrid", k=k, full_text=full_text) as s, BREAKERS["weaviate.search"].guard():
+        res = within_deadline(
+            col.query.hybrid,
+            query=keyword_query,
+            vector=query_vec,
+            alpha=current_settings().alpha if alpha is None else alpha,
+            limit=k,
+            filters=Filter.by_property("document_name").equal(document_name) if document_name else None,
+            return_properties=[*content, "chunk_index", "document_name", "page_start", "page_end",
+                               "content_hash", "duplicate_of"],
+            return_metadata=MetadataQuery(score=True),
+            include_vector=mmr_k is not None,
+        )
+        s.set(hits=len(res.objects))
 
     if not res.objects:
         return []
 
-    return [
-        {
-            "text": o.properties["text"],
+    docs = []
+    seen_groups = set()
+    for o in res.objects:
+        if document_name and o.properties.get("document_name") != document_name:
+            # a collection created before document_name used field tokenization
+            continue
+        # linked near-duplicates: keep only the best-scoring member of each group
+        group = o.properties.get("duplicate_of") or o.properties.get("content_hash")
+        if group is not None:
+            if group in seen_groups:
+                continue
+            seen_groups.add(group)
+        doc = {
+            "id": str(o.uuid),
             "chunk_index": o.properties.get("chunk_index"),
+            "document_name": o.properties.get("document_name"),
+            "page_start": o.properties.get("page_start"),
+            "page_end": o.properties.get("page_end"),
             "score": o.metadata.score if o.metadata else None,
         }
-        for o in res.objects
-    ]
\ No newline at end of file
+        if full_text:
+            doc["text"] = o.properties["text"]
+        else:
+            doc["snippet"] = o.properties.get("snippet")
+        if mmr_k is not None:
+            doc["vector"] = o.vector.get("default") if isinstance(o.vector, dict) else o.vector
+        docs.append(doc)
+
+    if mmr_k is not None:
+        docs = diversify(docs, query_vec, k=mmr_k)
+
+    if not full_text:
+        # objects indexed before snippets existed: derive them from the text
+        legacy = [d for d in docs if not d["snippet"]]
+        for doc in hydrate_docs(client, legacy, collection=collection):
+            doc["snippet"] = doc.pop("text")[:SNIPPET_CHARS]
+    return docs
+
+
+def hydrate_docs(client, docs: list[dict], collection: str | None = None) -> list[dict]:
+    """Fill in `text` (in place) for docs from a full_text=False search.
+
+    One fetch by id for all docs still missing their text.
+    """
+    missing = {d["id"]: d for d in docs if "text" not in d}
+    if not missing:
+        return docs
+
+    col = client.collections.get(collection or COLLECTION)
+    with span("weaviate.hydrate", docs=len(missing)), BREAKERS["weaviate.search"].guard():
+        res = within_deadline(
+            col.query.fetch_objects,
+            filters=Filter.by_id().contains_any(list(missing)),
+            limit=len(missing),
+            return_properties=["text"],
+        )
+    for o in res.objects:
+        missing[str(o.uuid)]["text"] = o.properties["text"]
+    for doc in missing.values():
+        doc.setdefault("text", "")
+    return docs
+
+
+def search_weaviate(client, query: str, k: int | None = None, expansion: str | None = None,
+                    collection: str | None = None, document_name: str | None = None,
+                    full_text: bool = True, mmr_k: int | None = None, alpha: float | None = None):
+    with span("search_weaviate", query_chars=len(query)) as s:
+        with span("expand_query"):
+            keyword_query, vector_query = build_search_queries(query, mode=expansion)
+        with span("embed_query"):
+            query_vec = embed_text(vector_query)
+        docs = hybrid_search(client, keyword_query, query_vec, k=k or current_settings().k, collection=collection,
+                             document_name=document_name, full_text=full_text, mmr_k=mmr_k, alpha=alpha)
+        s.set(results=len(docs))
+    return docs
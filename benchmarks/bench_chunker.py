@@ -0,0 +1,63 @@
+"""Scaling benchmark for the streaming chunker.
+
+Chunks synthetic handbook text of growing size (MB) and reports time and
+MB/s; flat MB/s across sizes means linear scaling. Runs the chunker with
+and without page/offset provenance.
+
+Usage:
+    python benchmarks/bench_chunker.py
+    python benchmarks/bench_chunker.py --sizes 1 4 16
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.pdf_utils import iter_chunks  # noqa: E402
+from benchmarks.handbook_pdf import handbook_paragraphs  # noqa: E402
+
+PAGE_CHARS = 4000
+
+
+def make_pages(megabytes: float) -> list[str]:
+    """Handbook pages totalling ~`megabytes`, with some oversized paragraphs."""
+    paragraphs = handbook_paragraphs(200, seed=2)
+    pages, page, size = [], [], 0
+    i = 0
+    while size < megabytes * 1_000_000:
+        para = paragraphs[i % len(paragraphs)]
+        if i % 7 == 0:
+            para = " ".join(paragraphs[i % len(paragraphs):i % len(paragraphs) + 4])
+        page.append(para)
+        size += len(para) + 2
+        if sum(len(p) for p in page) >= PAGE_CHARS:
+            pages.append("\n\n".join(page))
+            page = []
+        i += 1
+    if page:
+        pages.append("\n\n".join(page))
+    return pages
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    print(f"{'MB':>5} {'provenance':>11} {'chunks':>8} {'seconds':>8} {'MB/s':>7}")
+    for mb in args.sizes:
+        pages = make_pages(mb)
+        for provenance in (False, True):
+            t0 = time.perf_counter()
+            n = sum(1 for _ in iter_chunks(enumerate(pages, 1), provenance=provenance))
+            elapsed = time.perf_counter() - t0
+            print(f"{mb:>5g} {str(provenance):>11} {n:>8} {elapsed:>8.3f} {mb / elapsed:>7.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
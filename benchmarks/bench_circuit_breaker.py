@@ -0,0 +1,137 @@
+"""Fault injection: how a worker pool rides out an upstream outage, with
+and without a circuit breaker.
+
+A local stand-in plays the dependency: healthy calls take --latency ms;
+during the outage every call hangs for --timeout seconds and then fails,
+like an OpenAI or Weaviate call that times out. Each request makes up to
+1 + --retries attempts, as the OpenAI client does. Requests arrive at
+--rate per second and are served by --workers threads (the app's
+threadpool): healthy, then --outage seconds down, then healthy again.
+
+Per mode it reports the median latency of requests arriving during the
+outage, how many calls still reached the failing dependency, and the
+recovery time: how long after the dependency came back requests were
+answered promptly again (the backlog of stuck requests drained).
+
+Usage:
+    python benchmarks/bench_circuit_breaker.py
+    python benchmarks/bench_circuit_breaker.py --rate 100 --workers 8 --outage 5 --reset 2
+"""
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.circuit_breaker import CircuitBreaker, CircuitOpen  # noqa: E402
+
+
+class StandIn:
+    def __init__(self, latency: float, timeout: float):
+        self.latency = latency
+        self.timeout = timeout
+        self.down = False
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def call(self) -> None:
+        with self._lock:
+            self.calls += 1
+        if self.down:
+            time.sleep(self.timeout)
+            raise TimeoutError("injected outage")
+        time.sleep(self.latency)
+
+
+def request(upstream: StandIn, breaker: CircuitBreaker | None, retries: int) -> bool:
+    try:
+        probing = breaker.acquire() if breaker else False
+    except CircuitOpen:
+        return False
+    attempts = 1 if probing else 1 + retries
+    for attempt in range(attempts):
+        try:
+            upstream.call()
+        except TimeoutError as err:
+            if attempt == attempts - 1:
+                if breaker:
+                    breaker.record_failure(err)
+                return False
+            continue
+        if breaker:
+            breaker.record_success()
+        return True
+    return False
+
+
+def run(args, with_breaker: bool) -> dict:
+    upstream = StandIn(args.latency / 1000, args.timeout)
+    breaker = CircuitBreaker("bench", failure_threshold=args.threshold, reset_timeout=args.reset) if with_breaker else None
+    pool = ThreadPoolExecutor(max_workers=args.workers)
+    outage_start, outage_end = args.warmup, args.warmup + args.outage
+    stop = outage_end + args.after
+    start = time.perf_counter()
+
+    def timed() -> tuple[bool, float]:
+        ok = request(upstream, breaker, args.retries)
+        return ok, time.perf_counter() - start
+
+    submitted, outage_calls, calls_before = [], 0, 0
+    interval = 1 / args.rate
+    while (now := time.perf_counter() - start) < stop:
+        if not upstream.down and outage_start <= now < outage_end:
+            upstream.down, calls_before = True, upstream.calls
+        elif upstream.down and now >= outage_end:
+            upstream.down, outage_calls = False, upstream.calls - calls_before
+        submitted.append((now, pool.submit(timed)))
+        time.sleep(max(0.0, start + now + interval - time.perf_counter()))
+    pool.shutdown(wait=True)
+
+    results = [(arrived, *future.result()) for arrived, future in submitted]
+    during = [done - arrived for arrived, _, done in results if outage_start <= arrived < outage_end]
+    # recovered from the first arrival after the outage that was answered
+    # promptly, with every later arrival answered promptly too
+    prompt = 10 * args.latency / 1000
+    recovery = float("nan")
+    for arrived, ok, done in reversed([r for r in results if r[0] >= outage_end]):
+        if not ok or done - arrived > prompt:
+            break
+        recovery = arrived - outage_end
+    return {
+        "p50": statistics.median(during) * 1000 if during else float("nan"),
+        "outage_calls": outage_calls,
+        "recovery": recovery,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=50, help="requests per second")
+    parser.add_argument("--workers", type=int, default=8, help="threads serving requests")
+    parser.add_argument("--latency", type=float, default=20, help="healthy call latency, ms")
+    parser.add_argument("--timeout", type=float, default=0.5, help="seconds a call hangs during the outage")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--threshold", type=int, default=5, help="consecutive failures that open the circuit")
+    parser.add_argument("--reset", type=float, default=1.0, help="seconds before a half-open probe")
+    parser.add_argument("--warmup", type=float, default=1.0)
+    parser.add_argument("--outage", type=float, default=3.0)
+    parser.add_argument("--after", type=float, default=3.0)
+    args = parser.parse_args()
+
+    print(f"{args.rate:.0f} req/s on {args.workers} workers, {args.outage:.0f}s outage, calls hang {args.timeout}s, "
+          f"{args.retries} retries, reset {args.reset}s")
+    print(f"{'mode':<10} {'outage p50 ms':>14} {'calls during outage':>20} {'recovery s':>11}")
+    for label, with_breaker in (("none", False), ("breaker", True)):
+        r = run(args, with_breaker)
+        print(f"{label:<10} {r['p50']:>14.0f} {r['outage_calls']:>20} {r['recovery']:>11.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
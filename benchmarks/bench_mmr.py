@@ -0,0 +1,64 @@
+"""Latency of the MMR diversity step (app.mmr) on search-sized inputs.
+
+Times mmr_select over n candidates of embedding size d, picking k; the
+request path runs it once per question on the hybrid search hits. "core"
+is the selection itself on float32 arrays; "from lists" adds converting
+the vectors the Weaviate client returns as Python lists, which dominates
+at full embedding size.
+
+Usage:
+    python benchmarks/bench_mmr.py
+    python benchmarks/bench_mmr.py --candidates 20 50 100 --dims 1536 512
+"""
+
+import argparse
+import sys
+import time
+from statistics import mean
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.mmr import MMR_LAMBDA, mmr_select  # noqa: E402
+
+
+def time_calls(fn, repeats: int) -> list[float]:
+    """Sorted per-call timings in microseconds."""
+    timings = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1e6)
+    return sorted(timings)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[20, 50, 100])
+    parser.add_argument("--dims", type=int, nargs="+", default=[1536, 512])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'n':>5} {'dims':>5} {'k':>4} {'core mean us':>13} {'core p99 us':>12} {'from lists us':>14}")
+    for dims in args.dims:
+        for n in args.candidates:
+            query = rng.normal(size=dims).astype(np.float32)
+            docs = rng.normal(size=(n, dims)).astype(np.float32)
+            core = time_calls(lambda: mmr_select(query, docs, k=args.k, lambda_mult=MMR_LAMBDA), args.repeats)
+            query_list, docs_list = query.tolist(), docs.tolist()
+            lists = time_calls(
+                lambda: mmr_select(query_list, docs_list, k=args.k, lambda_mult=MMR_LAMBDA),
+                max(1, args.repeats // 10),
+            )
+            print(f"{n:>5} {dims:>5} {args.k:>4} {mean(core):>13.1f} "
+                  f"{core[int(len(core) * 0.99) - 1]:>12.1f} {mean(lists):>14.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,108 @@
+"""Near-duplicate detection throughput and accuracy (app.near_dup).
+
+Builds N distinct chunks plus ~10% near-duplicates of them (new header and
+footer lines, changed dates and times, reflowed whitespace), then runs
+the ingestion path: MinHash each chunk and look it up in the LSH index
+before adding it. Reports chunks/s, how many signatures each lookup
+compared, and recall/false positives against the planted duplicates.
+For small N the pairwise comparison it replaces is timed too.
+
+Usage:
+    python benchmarks/bench_near_dup.py
+    python benchmarks/bench_near_dup.py --sizes 1000 10000 50000
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import app.near_dup as nd  # noqa: E402
+from benchmarks.handbook_pdf import SENTENCES, TOPICS  # noqa: E402
+
+VOCAB = sorted({w for s in SENTENCES + TOPICS for w in re.findall(r"[A-Za-z]+", s)})
+PAIRWISE_MAX = 2000
+
+
+def make_corpus(n: int, seed: int = 0) -> tuple[list[str], set[int]]:
+    """`n` distinct ~170-word chunks with near-duplicates mixed in; returns
+    (chunks, positions of the planted duplicates)."""
+    rng = random.Random(seed)
+    # letters only: near_dup ignores digits, so "term12" and "term13" would be one word
+    words = VOCAB + ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=7)) for _ in range(5000)]
+    originals = [" ".join(rng.choice(words) for _ in range(170)) for _ in range(n)]
+
+    chunks, planted = [], set()
+    for i, text in enumerate(originals):
+        chunks.append(text)
+        if rng.random() < 0.1:
+            year, page = rng.randint(2019, 2025), rng.randint(1, 99)
+            copy = f"Staff Handbook {year}\n{text}\nPage {page} of 99 - updated 0{rng.randint(1, 9)}/{year}"
+            copy = copy.replace(" ", "  ", 5)
+            planted.add(len(chunks))
+            chunks.append(copy)
+    return chunks, planted
+
+
+def run_lsh(chunks: list[str]) -> tuple[float, float, set[int], float]:
+    """Returns (minhash s, index s, flagged positions, comparisons/lookup)."""
+    t0 = time.perf_counter()
+    signatures = [nd.minhash(c) for c in chunks]
+    t1 = time.perf_counter()
+
+    comparisons = 0
+    real_similarity = nd.similarity
+
+    def counting_similarity(a, b):
+        nonlocal comparisons
+        comparisons += 1
+        return real_similarity(a, b)
+
+    nd.similarity = counting_similarity
+    try:
+        index, flagged = nd.LSHIndex(), set()
+        for pos, sig in enumerate(signatures):
+            if index.query(sig) is not None:
+                flagged.add(pos)
+            else:
+                index.add(pos, sig)
+    finally:
+        nd.similarity = real_similarity
+    return t1 - t0, time.perf_counter() - t1, flagged, comparisons / len(chunks)
+
+
+def run_pairwise(chunks: list[str]) -> float:
+    signatures = [nd.minhash(c) for c in chunks]
+    t0 = time.perf_counter()
+    kept = []
+    for sig in signatures:
+        if not any(nd.similarity(sig, other) >= nd.NEAR_DUP_THRESHOLD for other in kept):
+            kept.append(sig)
+    return time.perf_counter() - t0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000, 50000],
+                        help="number of distinct chunks (duplicates are added on top)")
+    args = parser.parse_args()
+
+    print(f"{'chunks':>7} {'minhash s':>10} {'lsh s':>7} {'chunks/s':>9} {'cmp/lookup':>11} "
+          f"{'recall':>7} {'false+':>7} {'pairwise s':>11}")
+    for n in args.sizes:
+        chunks, planted = make_corpus(n)
+        t_hash, t_index, flagged, cmp_per_lookup = run_lsh(chunks)
+        recall = len(flagged & planted) / len(planted) if planted else 1.0
+        pairwise = f"{run_pairwise(chunks):>11.2f}" if len(chunks) <= PAIRWISE_MAX else f"{'-':>11}"
+        print(f"{len(chunks):>7} {t_hash:>10.2f} {t_index:>7.2f} {len(chunks) / (t_hash + t_index):>9.0f} "
+              f"{cmp_per_lookup:>11.2f} {recall:>7.3f} {len(flagged - planted):>7} {pairwise}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
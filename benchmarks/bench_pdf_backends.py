@@ -0,0 +1,70 @@
+"""Throughput and chunk-parity benchmark for the PDF extraction backends.
+
+Extracts generated handbooks with every backend in EXTRACT_BACKENDS,
+reports pages/s, and checks that the chunks match the pdfplumber
+reference (mean difflib similarity of aligned chunks; 1.000 = identical).
+
+Usage:
+    python benchmarks/bench_pdf_backends.py
+    python benchmarks/bench_pdf_backends.py --pages 20 100 --repeat 3
+"""
+
+import argparse
+import difflib
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.pdf_utils import EXTRACT_BACKENDS, chunk_text, extract_text_from_pdf  # noqa: E402
+from benchmarks.handbook_pdf import write_handbook_pdf  # noqa: E402
+
+REFERENCE = "pdfplumber"
+
+
+def chunk_similarity(chunks: list[str], reference: list[str]) -> float:
+    """Mean similarity of chunk i vs reference chunk i; missing chunks score 0."""
+    if not chunks and not reference:
+        return 1.0
+    total = sum(
+        1.0 if a == b else difflib.SequenceMatcher(None, a, b).ratio()
+        for a, b in zip(chunks, reference)
+    )
+    return total / max(len(chunks), len(reference))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--repeat", type=int, default=1, help="best-of-N timing")
+    args = parser.parse_args()
+
+    print(f"{'pages':>6} {'backend':>11} {'pages/s':>9} {'speedup':>8} {'chunks':>7} {'similarity':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            pdf_path = str(Path(tmp) / f"handbook-{pages}.pdf")
+            write_handbook_pdf(pdf_path, pages)
+
+            results = {}
+            for backend in EXTRACT_BACKENDS:
+                best = float("inf")
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter()
+                    text = extract_text_from_pdf(pdf_path, backend=backend)
+                    best = min(best, time.perf_counter() - t0)
+                results[backend] = (best, chunk_text(text))
+
+            ref_time, ref_chunks = results[REFERENCE]
+            for backend, (elapsed, chunks) in results.items():
+                print(
+                    f"{pages:>6} {backend:>11} {pages / elapsed:>9.1f} {ref_time / elapsed:>7.1f}x "
+                    f"{len(chunks):>7} {chunk_similarity(chunks, ref_chunks):>11.3f}"
+                )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,77 @@
+"""Peak-RSS benchmark for PDF text extraction.
+
+Extracts generated handbooks of increasing page count, each in a fresh
+subprocess, and reports peak RSS for the streaming extractor
+(`iter_pdf_pages`) next to the old collect-everything approach.
+
+Usage:
+    python benchmarks/bench_pdf_memory.py
+    python benchmarks/bench_pdf_memory.py --pages 25 50 100 200
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from benchmarks.handbook_pdf import write_handbook_pdf  # noqa: E402
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(mode: str, pdf_path: str) -> None:
+    if mode == "streaming":
+        from app.pdf_utils import iter_pdf_pages
+
+        total = sum(len(page) for page in iter_pdf_pages(pdf_path))
+    else:
+        # pre-streaming behaviour: every page's layout cache stays alive
+        import pdfplumber
+        from app.pdf_utils import clean_extracted_text
+
+        with pdfplumber.open(pdf_path) as pdf:
+            pages = [clean_extracted_text(p.extract_text() or "") for p in pdf.pages]
+        total = len("\n\n".join(pages))
+    print(json.dumps({"chars": total, "peak_rss_mb": peak_rss_mb()}))
+
+
+def measure(mode: str, pdf_path: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", mode, pdf_path],
+        check=True, capture_output=True, text=True, cwd=BASE_DIR,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PDF"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return 0
+
+    print(f"{'pages':>6} {'collect (MB)':>13} {'streaming (MB)':>15}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            pdf_path = str(Path(tmp) / f"handbook-{pages}.pdf")
+            write_handbook_pdf(pdf_path, pages)
+            collect = measure("collect", pdf_path)
+            streaming = measure("streaming", pdf_path)
+            print(f"{pages:>6} {collect['peak_rss_mb']:>13.1f} {streaming['peak_rss_mb']:>15.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
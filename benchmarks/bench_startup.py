@@ -0,0 +1,121 @@
+"""Cold-start cost of the API: import time and time-to-ready.
+
+For each mode (full app with the Gradio UI, and API_ONLY) measures, in
+fresh interpreters:
+
+    import      seconds to `import app.main`
+    serving     seconds from launching uvicorn until /health answers
+    weaviate    seconds until /health reports Weaviate connected
+                (only with real WEAVIATE_URL / WEAVIATE_API_KEY; else "-")
+
+Missing credentials are replaced with placeholders, so import and serving
+times can be tracked without any keys.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --ready-timeout 60
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv(BASE_DIR / "api_keys.env")
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+PLACEHOLDERS = {
+    "OPENAI_API_KEY": "sk-bench-placeholder",
+    "WEAVIATE_URL": "https://bench-placeholder.invalid",
+    "WEAVIATE_API_KEY": "bench-placeholder",
+}
+
+
+def mode_env(api_only: bool) -> dict:
+    return {**PLACEHOLDERS, **os.environ, "API_ONLY": "true" if api_only else "false"}
+
+
+def time_import(env: dict) -> float:
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], env=env, cwd=BASE_DIR,
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def health(port: int) -> dict | None:
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as r:
+            return json.load(r)
+    except OSError:
+        return None
+
+
+def time_ready(env: dict, timeout: float, wait_for_weaviate: bool) -> tuple[float | None, float | None]:
+    """Seconds until /health answers, and until it reports Weaviate connected."""
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    serving = connected = None
+    try:
+        while time.perf_counter() - started < timeout and proc.poll() is None:
+            body = health(port)
+            if body is not None and serving is None:
+                serving = time.perf_counter() - started
+                if not wait_for_weaviate:
+                    break
+            if body and body.get("weaviate") == "connected":
+                connected = time.perf_counter() - started
+                break
+            time.sleep(0.02)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return serving, connected
+
+
+def summarize(values: list[float | None]) -> str:
+    values = [v for v in values if v is not None]
+    return f"{statistics.median(values):8.2f}" if values else f"{'-':>8}"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--ready-timeout", type=float, default=20.0,
+                        help="seconds to wait for Weaviate to connect per run")
+    args = parser.parse_args()
+
+    live = all(os.environ.get(k) for k in ("WEAVIATE_URL", "WEAVIATE_API_KEY"))
+    print(f"median of {args.runs} runs, seconds" + ("" if live else " (no Weaviate credentials)"))
+    print(f"{'mode':<10} {'import':>8} {'serving':>8} {'weaviate':>8}")
+    for label, api_only in (("full", False), ("api-only", True)):
+        env = mode_env(api_only)
+        imports = [time_import(env) for _ in range(args.runs)]
+        ready = [time_ready(env, args.ready_timeout, live) for _ in range(args.runs)]
+        print(f"{label:<10} {summarize(imports)} {summarize([r[0] for r in ready])} "
+              f"{summarize([r[1] for r in ready])}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
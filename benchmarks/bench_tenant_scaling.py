@@ -0,0 +1,123 @@
+"""Search latency as unrelated documents pile up (live Weaviate).
+
+Indexes one "target" handbook, then grows a pile of unrelated documents in
+the shared collection and times three ways of searching the target:
+
+    shared      hybrid search over the whole shared collection
+    filtered    same collection, filtered to the target's document_name
+    tenant      the target's own tenant collection (never sees the pile)
+
+Vectors are random (no embedding calls at insert/search time), so the
+numbers isolate Weaviate's side. The benchmark collections are deleted
+afterwards. Needs WEAVIATE_URL / WEAVIATE_API_KEY, plus OPENAI_API_KEY for
+ensure_schema's one-off dimension check per collection.
+
+Usage:
+    python benchmarks/bench_tenant_scaling.py
+    python benchmarks/bench_tenant_scaling.py --docs 0 50 200 --chunks-per-doc 100
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv(BASE_DIR / "api_keys.env")
+
+from weaviate.classes.data import DataObject  # noqa: E402
+
+from app.weaviate_utils import chunk_hash, connect, ensure_schema, hybrid_search  # noqa: E402
+from benchmarks.handbook_pdf import handbook_paragraphs  # noqa: E402
+
+SHARED = "BenchTenantShared"
+TENANT = "BenchTenantTarget"
+TARGET_DOC = "target-handbook.pdf"
+DIMS = 256
+
+
+def random_vector(rng: random.Random) -> list[float]:
+    return [rng.gauss(0, 1) for _ in range(DIMS)]
+
+
+def insert_doc(client, collection: str, name: str, n_chunks: int, seed: int) -> list[tuple[str, list[float]]]:
+    rng = random.Random(seed)
+    rows = []
+    for i, text in enumerate(handbook_paragraphs(n_chunks, seed=seed)):
+        text = f"{name} section {i}: {text}"
+        rows.append((text, random_vector(rng)))
+    objects = [
+        DataObject(
+            properties={"text": text, "chunk_index": i, "document_name": name, "content_hash": chunk_hash(text)},
+            vector=vec,
+        )
+        for i, (text, vec) in enumerate(rows)
+    ]
+    for start in range(0, len(objects), 500):
+        result = client.collections.get(collection).data.insert_many(objects[start:start + 500])
+        if getattr(result, "errors", None):
+            raise RuntimeError(f"Weaviate insert errors: {result.errors}")
+    return rows
+
+
+def time_searches(client, queries, repeats: int, **scope) -> tuple[float, float]:
+    timings = []
+    for _ in range(repeats):
+        for text, vec in queries:
+            t0 = time.perf_counter()
+            hybrid_search(client, " ".join(text.split()[:8]), vec, k=20, **scope)
+            timings.append((time.perf_counter() - t0) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, nargs="+", default=[0, 25, 100, 250],
+                        help="cumulative number of unrelated documents in the shared collection")
+    parser.add_argument("--chunks-per-doc", type=int, default=80)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    client = connect(os.environ["WEAVIATE_URL"], os.environ["WEAVIATE_API_KEY"])
+    try:
+        for name in (SHARED, TENANT):
+            client.collections.delete(name)
+            ensure_schema(client, name=name)
+
+        target = insert_doc(client, SHARED, TARGET_DOC, args.chunks_per_doc, seed=0)
+        insert_doc(client, TENANT, TARGET_DOC, args.chunks_per_doc, seed=0)
+        queries = random.Random(1).sample(target, min(args.queries, len(target)))
+
+        print(f"{'docs':>6} {'objects':>8} {'shared p50/p95 ms':>19} "
+              f"{'filtered p50/p95 ms':>21} {'tenant p50/p95 ms':>19}")
+        loaded = 0
+        for n_docs in sorted(args.docs):
+            for d in range(loaded, n_docs):
+                insert_doc(client, SHARED, f"unrelated-{d}.pdf", args.chunks_per_doc, seed=d + 1)
+            loaded = max(loaded, n_docs)
+
+            shared = time_searches(client, queries, args.repeats, collection=SHARED)
+            filtered = time_searches(client, queries, args.repeats, collection=SHARED, document_name=TARGET_DOC)
+            tenant = time_searches(client, queries, args.repeats, collection=TENANT)
+            objects = (loaded + 1) * args.chunks_per_doc
+            print(f"{loaded:>6} {objects:>8} "
+                  f"{shared[0]:>9.1f}/{shared[1]:<9.1f} {filtered[0]:>10.1f}/{filtered[1]:<10.1f} "
+                  f"{tenant[0]:>9.1f}/{tenant[1]:<9.1f}")
+    finally:
+        for name in (SHARED, TENANT):
+            client.collections.delete(name)
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
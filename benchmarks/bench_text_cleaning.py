@@ -0,0 +1,87 @@
+"""Microbenchmark for the text-cleaning rules.
+
+Cleans raw per-page text extracted (with pdfplumber, i.e. before any
+clean-up) from a generated handbook, and reports MB/s for each rule on
+its own and for the whole pipeline, next to the original uncompiled
+four-pass cleaner.
+
+Usage:
+    python benchmarks/bench_text_cleaning.py
+    python benchmarks/bench_text_cleaning.py --pages 40 --repeat 20
+"""
+
+import argparse
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.pdf_utils import EXTRACT_BACKENDS  # noqa: E402
+from app.text_normalize import CleaningRules, clean_text  # noqa: E402
+from benchmarks.handbook_pdf import write_handbook_pdf  # noqa: E402
+
+NO_RULES = CleaningRules(
+    join_hyphenated=False, collapse_spaces=False, squeeze_blank_lines=False, split_camel_case=False,
+)
+
+
+def legacy_clean(text: str) -> str:
+    text = re.sub(r"(\w)-\n(\w)", r"\1\2", text)
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = re.sub(r"(?<=[a-z])(?=[A-Z])", " ", text)
+    return text.strip()
+
+
+def raw_pages(n_pages: int) -> list[str]:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "handbook.pdf")
+        write_handbook_pdf(path, n_pages)
+        pages = list(EXTRACT_BACKENDS["pdfplumber"](path, None))
+    # PDF layouts vary: give a third of the pages tab stops and ragged spacing
+    return [
+        p.replace(". ", ".  ").replace(": ", ":\t") + "\n\n\n" if i % 3 == 0 else p
+        for i, p in enumerate(pages)
+    ]
+
+
+def throughput(fn, pages: list[str], repeat: int) -> float:
+    megabytes = sum(len(p) for p in pages) / 1_000_000
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for page in pages:
+            fn(page)
+        best = min(best, time.perf_counter() - t0)
+    return megabytes / best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=10, help="best-of-N timing")
+    args = parser.parse_args()
+
+    pages = raw_pages(args.pages)
+    cases = {
+        "legacy (4 uncompiled passes)": legacy_clean,
+        "clean_text (all rules)": clean_text,
+        "clean_text (no camel case)": lambda t: clean_text(t, CleaningRules(split_camel_case=False)),
+    }
+    for rule in ("join_hyphenated", "collapse_spaces", "squeeze_blank_lines", "split_camel_case"):
+        rules = CleaningRules(**{f: f == rule for f in NO_RULES.__dataclass_fields__})
+        cases[f"  {rule} only"] = lambda t, rules=rules: clean_text(t, rules)
+
+    print(f"{sum(len(p) for p in pages) / 1e6:.2f} MB of raw page text, {len(pages)} pages\n")
+    print(f"{'case':<32} {'MB/s':>8}")
+    for name, fn in cases.items():
+        print(f"{name:<32} {throughput(fn, pages, args.repeat):>8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
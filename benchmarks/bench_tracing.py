@@ -0,0 +1,70 @@
+"""Cost of tracing on the request thread: microseconds per span with the
+JSONL exporter on, with tracing off (no trace / no TRACE_PATH), and how
+fast the background writer drains spans to disk.
+
+Each simulated request opens a root span and --spans child spans with a
+couple of attributes, the shape of a traced /ask_question.
+
+Usage:
+    python benchmarks/bench_tracing.py
+    python benchmarks/bench_tracing.py --requests 20000 --spans 12
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import app.tracing as tracing  # noqa: E402
+from app.jsonl_log import JsonlLog  # noqa: E402
+
+
+def simulate(requests: int, spans: int, traced: bool) -> float:
+    """Seconds spent on the calling thread."""
+    start = time.perf_counter()
+    for _ in range(requests):
+        if traced:
+            with tracing.trace("POST /ask_question") as root:
+                for i in range(spans):
+                    with tracing.span("stage", index=i) as s:
+                        s.set(hits=20)
+                root.set(status=200)
+        else:
+            for i in range(spans + 1):
+                with tracing.span("stage", index=i) as s:
+                    s.set(hits=20)
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--spans", type=int, default=8, help="child spans per request")
+    args = parser.parse_args()
+    total_spans = args.requests * (args.spans + 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log = JsonlLog(Path(tmp) / "traces.jsonl", max_bytes=50 * 1024 * 1024, backups=1)
+        tracing._log = log
+        off = simulate(args.requests, args.spans, traced=False)
+        on = simulate(args.requests, args.spans, traced=True)
+        drain_start = time.perf_counter()
+        log.flush()
+        drained = time.perf_counter() - drain_start + on
+        size_mb = sum(p.stat().st_size for p in log.files()) / 1024 / 1024
+
+    print(f"{args.requests} requests x {args.spans + 1} spans")
+    print(f"{'mode':<12} {'us/span':>8} {'us/request':>11}")
+    print(f"{'off':<12} {off / total_spans * 1e6:>8.2f} {off / args.requests * 1e6:>11.1f}")
+    print(f"{'traced':<12} {on / total_spans * 1e6:>8.2f} {on / args.requests * 1e6:>11.1f}")
+    print(f"writer: {total_spans / drained:,.0f} spans/s to disk, {size_mb:.1f} MB "
+          f"({size_mb * 1024 * 1024 / total_spans:.0f} B/span)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,94 @@
+"""Upload-to-extraction latency: disk round trip vs in-place spooled buffer.
+
+Both paths start from the upload as Starlette hands it over, already held
+in a SpooledTemporaryFile, and time until the first page's text is
+available and until extraction finishes:
+
+    disk     copy the buffer to --disk-dir in 1 MB chunks, extract from the
+             path, delete the file (the old save_upload flow)
+    spooled  extract straight from the buffer (the current flow)
+
+Point --disk-dir at the network-backed mount (e.g. /home/uploads on Azure
+App Service) to see the round trip the spooled path avoids; on a local
+SSD the difference is small.
+
+Usage:
+    python benchmarks/bench_upload_spool.py
+    python benchmarks/bench_upload_spool.py --disk-dir /home/uploads --pages 10 50 100 --repeat 5
+"""
+
+import argparse
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.pdf_utils import iter_numbered_pdf_pages  # noqa: E402
+from benchmarks.handbook_pdf import handbook_pdf_bytes  # noqa: E402
+
+SPOOL_MAX_BYTES = 32 * 1024 * 1024
+
+
+def spooled_upload(data: bytes):
+    buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    buffer.write(data)
+    buffer.seek(0)
+    return buffer
+
+
+def time_extraction(source) -> tuple[float, float]:
+    """Seconds to the first page and to the last."""
+    started = time.perf_counter()
+    first = None
+    for _ in iter_numbered_pdf_pages(source):
+        if first is None:
+            first = time.perf_counter() - started
+    return first, time.perf_counter() - started
+
+
+def disk_round_trip(data: bytes, disk_dir: Path) -> tuple[float, float]:
+    buffer = spooled_upload(data)
+    started = time.perf_counter()
+    path = disk_dir / "bench-upload.pdf"
+    with open(path, "wb") as f:
+        shutil.copyfileobj(buffer, f, 1 << 20)
+    copied = time.perf_counter() - started
+    try:
+        first, total = time_extraction(str(path))
+    finally:
+        path.unlink(missing_ok=True)
+    return copied + first, time.perf_counter() - started
+
+
+def in_place(data: bytes) -> tuple[float, float]:
+    return time_extraction(spooled_upload(data))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--repeat", type=int, default=5, help="median of N runs")
+    parser.add_argument("--disk-dir", default=None, help="directory for the disk round trip (default: a temp dir)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        disk_dir = Path(args.disk_dir or tmp)
+        print(f"disk round trip via {disk_dir}; median of {args.repeat} runs, ms")
+        print(f"{'pages':>6} {'MB':>6} {'path':>8} {'first page':>11} {'all pages':>10}")
+        for pages in args.pages:
+            data = handbook_pdf_bytes(pages)
+            for label, run in (("disk", lambda: disk_round_trip(data, disk_dir)), ("spooled", lambda: in_place(data))):
+                runs = [run() for _ in range(args.repeat)]
+                first = statistics.median(r[0] for r in runs) * 1000
+                total = statistics.median(r[1] for r in runs) * 1000
+                print(f"{pages:>6} {len(data) / 1e6:>6.2f} {label:>8} {first:>11.1f} {total:>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,173 @@
+"""/ask_question throughput as uvicorn workers are added on one host.
+
+Runs `uvicorn app.main:app --workers N` in API_ONLY mode with a shared
+SQLite state file (SHARED_STATE_PATH), pre-warms the shared answer cache
+for a set of questions, and drives cached /ask_question requests from
+several client processes. Every request still goes through form parsing,
+the shared rate limiter and a shared cache read, so the numbers show how
+the request path scales across cores and whether the SQLite tier becomes
+the bottleneck. No OpenAI or Weaviate calls are made.
+
+Also checks that the rate limit is enforced once across all workers (not
+once per worker).
+
+Usage:
+    python benchmarks/bench_workers.py
+    python benchmarks/bench_workers.py --workers 1 2 4 8 --seconds 10 --clients 16
+"""
+
+import argparse
+import http.client
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+QUESTIONS = [f"What is the policy on topic {i}?" for i in range(50)]
+
+BASE_ENV = {
+    "OPENAI_API_KEY": "sk-bench-placeholder",
+    "WEAVIATE_URL": "https://bench-placeholder.invalid",
+    "WEAVIATE_API_KEY": "bench-placeholder",
+    "API_ONLY": "true",
+}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def warm_answer_cache(env: dict) -> None:
+    """Store an answer for every question, keyed exactly as the app keys them."""
+    code = (
+        "import sys, app.main as m\n"
+        "for q in sys.argv[1:]:\n"
+        "    key = m.answer_cache_key(q, m.collection_name(None), None, False)\n"
+        "    m.shared_state.set('answer', key, {'answer': 'cached', 'reranked_docs': []})\n"
+    )
+    subprocess.run([sys.executable, "-c", code, *QUESTIONS], env=env, cwd=BASE_DIR, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def start_server(env: dict, workers: int) -> tuple[subprocess.Popen, int]:
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env, cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                # give every worker a moment to finish booting
+                time.sleep(1.0 * workers)
+                return proc, port
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+def ask(conn: http.client.HTTPConnection, question: str, ip: str) -> int:
+    body = urllib.parse.urlencode({"query": question, "include_retrieved_docs": "false"})
+    conn.request("POST", "/ask_question", body=body, headers={
+        "Content-Type": "application/x-www-form-urlencoded",
+        "X-Forwarded-For": ip,
+    })
+    response = conn.getresponse()
+    response.read()
+    return response.status
+
+
+def client_loop(port: int, seconds: float, client_id: int, results) -> None:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    latencies, errors = [], 0
+    end = time.perf_counter() + seconds
+    i = 0
+    while time.perf_counter() < end:
+        started = time.perf_counter()
+        ip = f"10.{client_id}.{i // 250 % 250}.{i % 250}"
+        status = ask(conn, QUESTIONS[(client_id + i) % len(QUESTIONS)], ip)
+        latencies.append(time.perf_counter() - started)
+        errors += status != 200
+        i += 1
+    results.put((latencies, errors))
+
+
+def load(port: int, clients: int, seconds: float) -> tuple[float, float, int]:
+    """Requests/s, median latency (ms) and non-200 count."""
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    procs = [ctx.Process(target=client_loop, args=(port, seconds, c, results)) for c in range(clients)]
+    for p in procs:
+        p.start()
+    collected = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    latencies = [lat for lats, _ in collected for lat in lats]
+    return len(latencies) / seconds, statistics.median(latencies) * 1000, sum(e for _, e in collected)
+
+
+def check_shared_limit(env: dict, workers: int) -> tuple[int, int]:
+    """(allowed, sent) for one client IP against a 30/hour limit."""
+    proc, port = start_server({**env, "ASK_RATE_LIMIT": "30/hour"}, workers)
+    try:
+        allowed = 0
+        for i in range(60):
+            # a new connection per request spreads them over the workers
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            allowed += ask(conn, QUESTIONS[i % len(QUESTIONS)], "192.0.2.1") == 200
+            conn.close()
+        return allowed, 60
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8, help="load-generating processes")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, **BASE_ENV, "SHARED_STATE_PATH": str(Path(tmp) / "state.db"),
+               "ASK_RATE_LIMIT": "1000000/hour"}
+        warm_answer_cache(env)
+
+        print(f"{os.cpu_count()} CPUs, {args.clients} client processes, {args.seconds:.0f}s per run")
+        print(f"{'workers':>7} {'req/s':>8} {'p50 ms':>8} {'errors':>6} {'speedup':>7}")
+        baseline = None
+        for workers in args.workers:
+            proc, port = start_server(env, workers)
+            try:
+                rps, p50, errors = load(port, args.clients, args.seconds)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+            baseline = baseline or rps
+            print(f"{workers:>7} {rps:>8.0f} {p50:>8.1f} {errors:>6} {rps / baseline:>6.2f}x")
+
+        allowed, sent = check_shared_limit(env, max(args.workers))
+        print(f"\nrate limit 30/hour with {max(args.workers)} workers: {allowed}/{sent} requests allowed "
+              f"({'shared' if allowed == 30 else 'NOT shared'})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
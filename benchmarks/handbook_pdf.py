@@ -0,0 +1,104 @@
+"""Generate synthetic staff-handbook PDFs for benchmarks (no extra deps).
+
+Writes a plain PDF 1.4 file with Helvetica text: numbered sections of
+handbook-style paragraphs, wrapped to a fixed line width, ~50 lines/page.
+"""
+
+import random
+import textwrap
+
+TOPICS = [
+    "sick leave", "annual leave", "staff meetings", "lesson times", "lunchtime duty",
+    "mobile phones", "homework", "detentions", "cover work", "printing",
+    "morning duty", "safeguarding", "expenses", "dress code", "training",
+]
+
+SENTENCES = [
+    "Staff who are unable to attend work because of {topic} must inform their Deputy Head before 07:30.",
+    "The policy on {topic} applies to all members of staff, including part-time and supply teachers.",
+    "Any questions about {topic} should be directed to the Human Resources office in writing.",
+    "Failure to follow the {topic} procedure may be recorded and deducted from banked hours.",
+    "A medical certificate or a note from their doctor is required after three consecutive days.",
+    "Staff meetings are mandatory and take place every Wednesday from 15:45 until 17:00.",
+    "Lessons start at 08:30 and finish at 15:30, with a twenty-minute break at 10:30.",
+    "Three members of staff are on duty at lunchtime and must monitor the hallways and canteen.",
+    "Cover work must be uploaded to Manage Bac at the beginning of the day for every lesson missed.",
+    "Students must hand in their phone during form time and may only use it in study periods.",
+    "The line manager reviews {topic} arrangements each term together with the Senior Leadership Team (SLT).",
+    "Records relating to {topic} are kept for the duration of employment plus six years.",
+]
+
+
+def handbook_paragraphs(n_paragraphs: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    paragraphs = []
+    for i in range(n_paragraphs):
+        topic = TOPICS[i % len(TOPICS)]
+        body = " ".join(
+            rng.choice(SENTENCES).format(topic=topic) for _ in range(rng.randint(3, 7))
+        )
+        paragraphs.append(f"{i + 1}. {topic.title()}. {body}")
+    return paragraphs
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def handbook_pdf_bytes(pages: int, seed: int = 0, lines_per_page: int = 50, width: int = 95) -> bytes:
+    """Return the bytes of a `pages`-page handbook PDF."""
+    lines: list[str] = []
+    paragraphs = iter(handbook_paragraphs(pages * 12, seed=seed))
+    page_lines: list[list[str]] = []
+    while len(page_lines) < pages:
+        if len(lines) >= lines_per_page:
+            page_lines.append(lines[:lines_per_page])
+            lines = lines[lines_per_page:]
+            continue
+        lines.extend(textwrap.wrap(next(paragraphs), width) + [""])
+
+    objects: list[bytes] = []
+
+    def add(obj: bytes) -> int:
+        objects.append(obj)
+        return len(objects)
+
+    catalog = add(b"")  # placeholders, filled in once the page ids are known
+    pages_id = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    page_ids = []
+    for page in page_lines:
+        ops = ["BT", "/F1 10 Tf", "12 TL", "50 760 Td"]
+        for line in page:
+            ops.append(f"({_escape(line)}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+            % (pages_id, font, content)
+        ))
+
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id
+    kids = b" ".join(b"%d 0 R" % p for p in page_ids)
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (i, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog, xref,
+    )
+    return bytes(out)
+
+
+def write_handbook_pdf(path, pages: int, seed: int = 0) -> None:
+    with open(path, "wb") as f:
+        f.write(handbook_pdf_bytes(pages, seed=seed))
@@ -0,0 +1,68 @@
+"""Record/replay store for the eval's paid and networked calls.
+
+In "record" mode every call (query expansion, embedding, Weaviate search,
+rerank) runs for real and its result and latency are saved under a key
+built from its inputs. In "replay" mode results come from the file,
+so a recorded run can be repeated offline at no cost. A call that wasn't
+recorded raises KeyError. Latencies reported on replay are the recorded
+ones, so stage timings stay comparable.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+MODES = ("off", "record", "replay")
+
+
+class Cassette:
+    def __init__(self, path: str | Path | None = None, mode: str = "off"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode: {mode!r}")
+        if mode != "off" and path is None:
+            raise ValueError("A cassette path is required to record or replay")
+        self.path = Path(path) if path else None
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] = {}
+        if mode == "replay":
+            self._entries = json.loads(self.path.read_text())
+        elif mode == "record" and self.path.exists():
+            # extend an existing recording rather than dropping it
+            self._entries = json.loads(self.path.read_text())
+
+    @staticmethod
+    def key(kind: str, *inputs: Any) -> str:
+        blob = json.dumps([kind, *inputs], sort_keys=True, ensure_ascii=False)
+        return f"{kind}:{hashlib.sha256(blob.encode('utf-8')).hexdigest()[:24]}"
+
+    def call(self, kind: str, inputs: tuple, fn: Callable[[], Any]) -> tuple[Any, float]:
+        """Return (result, milliseconds) of `fn()`, recorded or replayed."""
+        key = self.key(kind, *inputs)
+        if self.mode == "replay":
+            try:
+                entry = self._entries[key]
+            except KeyError:
+                raise KeyError(f"{kind} call not in cassette {self.path}; record it first") from None
+            return entry["result"], entry["ms"]
+
+        t0 = time.perf_counter()
+        result = fn()
+        ms = (time.perf_counter() - t0) * 1000
+        if self.mode == "record":
+            with self._lock:
+                self._entries[key] = {"result": result, "ms": ms}
+        return result, ms
+
+    def save(self) -> None:
+        if self.mode != "record":
+            return
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,18 +1,39 @@
 """Retrieval-quality eval for the HR chatbot.
 
 Runs each question in qa_pairs.json against the live Weaviate index and
-reports hit-rate: whether any expected phrase appears in the retrieved
-chunks. Costs a few cents in OpenAI calls (query expansion + embeddings;
-plus reranking with --rerank).
+reports hit-rate (whether any expected phrase appears in the retrieved
+chunks), MRR and nDCG@k of the chunks containing one, and per-stage
+latency. Costs a few cents in OpenAI calls (query expansion + embeddings;
+plus reranking with --rerank, answers with --answers) unless replayed from a
+cassette.
 
 Usage:
     python evals/run_eval.py            # hit@20 and hit@4 on raw retrieval
     python evals/run_eval.py --rerank   # also hit@4 after LLM reranking
+    python evals/run_eval.py --expansion both   # local vs LLM query expansion
+    python evals/run_eval.py --mmr --rerank     # effect of MMR on hit@4 and rerank tokens
+    python evals/run_eval.py --collections PDFDocument PDFDocument_512:512
+        # recall@k (vs the first collection) and search latency per
+        # embedding-dimension / compression setting
+    python evals/run_eval.py --answers
+        # answer accuracy, latency and cost of each generation tier
+        # (extractive, fast, full) and of the router choosing between them
+    python evals/run_eval.py --workers 8 --record evals/cassettes/base.json
+    python evals/run_eval.py --replay evals/cassettes/base.json --json runs/today.json
+        # record once, then re-run offline for free; --json - prints JSON to stdout
 """
 
 import argparse
+import hashlib
 import json
+import math
+import os
+import statistics
+import subprocess
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -22,9 +43,23 @@ from dotenv import load_dotenv
 
 load_dotenv(BASE_DIR / "api_keys.env")
 
-import os
+from app.answer_router import (  # noqa: E402
+    ANSWER_SYSTEM_PROMPT, FAST_ANSWER_CHUNKS, FAST_ANSWER_MODEL, FULL_ANSWER_MODEL, TIERS,
+    best_sentence, build_answer_prompt, generate_answer, route_answer,
+)
+from app.llm_utils import build_rerank_prompt, embed_text, rerank_chunks_with_llm  # noqa: E402
+from app.mmr import MMR_K  # noqa: E402
+from app.query_expansion import build_search_queries, content_words, tokenize  # noqa: E402
+from app.retrieval_settings import current_settings  # noqa: E402
+from app.weaviate_utils import connect, hybrid_search  # noqa: E402
+from evals.cassette import Cassette  # noqa: E402
+
+# human-readable progress; moved to stderr when the JSON report goes to stdout
+ECHO = sys.stdout
 
-from app.weaviate_utils import connect, search_weaviate  # noqa: E402
+
+def echo(*parts) -> None:
+    print(*parts, file=ECHO)
 
 
 def normalize(text: str) -> str:
@@ -36,57 +71,440 @@ def phrase_in_docs(phrases: list[str], docs: list[dict]) -> bool:
     return any(normalize(p) in blob for p in phrases)
 
 
-def main() -> int:
-    parser = argparse.ArgumentParser(description=__doc__)
-    parser.add_argument("--rerank", action="store_true", help="also score hit@4 after LLM reranking")
-    parser.add_argument("--k", type=int, default=20, help="retrieval depth (default 20, matching the app)")
-    args = parser.parse_args()
+def answer_correct(phrases: list[str], answer: str) -> bool:
+    """An expected phrase appears in the answer, or most of its content
+    words do (answers paraphrase: "on Wednesdays" for "every Wednesday")."""
+    text, words = normalize(answer), set(tokenize(answer))
+    for phrase in phrases:
+        if normalize(phrase) in text:
+            return True
+        wanted = content_words(phrase)
+        if wanted and sum(w in words or w.rstrip("s") in words for w in wanted) / len(wanted) >= 0.75:
+            return True
+    return False
 
-    qa_pairs = json.loads((BASE_DIR / "evals" / "qa_pairs.json").read_text())
 
-    client = connect(os.environ["WEAVIATE_URL"], os.environ["WEAVIATE_API_KEY"])
-    try:
-        hits_k = hits_4 = hits_rerank = 0
-        failures = []
+def relevance(phrases: list[str], docs: list[dict]) -> list[int]:
+    """1 for each doc containing an expected phrase, else 0."""
+    return [int(phrase_in_docs(phrases, [d])) for d in docs]
 
-        for pair in qa_pairs:
-            question = pair["question"]
-            phrases = pair["expected_phrases"]
-            retrieved = search_weaviate(client, question, k=args.k)
 
-            hit_k = phrase_in_docs(phrases, retrieved)
-            hit_4 = phrase_in_docs(phrases, retrieved[:4])
-            hits_k += hit_k
-            hits_4 += hit_4
+def reciprocal_rank(rels: list[int]) -> float:
+    return next((1 / rank for rank, rel in enumerate(rels, 1) if rel), 0.0)
 
-            line = f"  hit@{args.k}={'Y' if hit_k else 'n'}  hit@4={'Y' if hit_4 else 'n'}"
 
-            if args.rerank:
-                from app.llm_utils import rerank_chunks_with_llm
+def ndcg(rels: list[int]) -> float:
+    """Binary-relevance nDCG over the ranked list."""
+    dcg = sum(rel / math.log2(rank + 1) for rank, rel in enumerate(rels, 1))
+    ideal = sum(1 / math.log2(rank + 1) for rank in range(1, sum(rels) + 1))
+    return dcg / ideal if ideal else 0.0
 
-                reranked = rerank_chunks_with_llm(question, retrieved)[:4]
-                hit_r = phrase_in_docs(phrases, reranked)
-                hits_rerank += hit_r
-                line += f"  rerank@4={'Y' if hit_r else 'n'}"
 
-            print(f"{line}  {question}")
-            if not hit_k:
-                failures.append(question)
+def vector_digest(vec: list[float]) -> str:
+    return hashlib.sha256(json.dumps(vec).encode("utf-8")).hexdigest()[:24]
 
-        n = len(qa_pairs)
-        print(f"\nhit@{args.k}: {hits_k}/{n} ({hits_k / n:.0%})")
-        print(f"hit@4 (raw order): {hits_4}/{n} ({hits_4 / n:.0%})")
+
+def latency_summary(values: list[float]) -> dict:
+    values = sorted(values)
+    return {
+        "mean": statistics.mean(values),
+        "p50": values[len(values) // 2],
+        "p95": values[int(0.95 * (len(values) - 1))],
+        "max": values[-1],
+    }
+
+
+class Services:
+    """The eval's calls to OpenAI and Weaviate, routed through a cassette."""
+
+    def __init__(self, client, cassette: Cassette):
+        self.client = client
+        self.cassette = cassette
+
+    def expand(self, question: str, mode: str) -> tuple[tuple[str, str], float]:
+        queries, ms = self.cassette.call(
+            "expand", (question, mode), lambda: list(build_search_queries(question, mode=mode))
+        )
+        return tuple(queries), ms
+
+    def embed(self, text: str, dimensions: int | None = None) -> tuple[list[float], float]:
+        return self.cassette.call("embed", (text, dimensions), lambda: embed_text(text, dimensions=dimensions))
+
+    def search(self, keyword_query: str, vec: list[float], k: int, collection: str | None = None,
+               mmr_k: int | None = None, alpha: float | None = None) -> tuple[list[dict], float]:
+        inputs = (keyword_query, vector_digest(vec), k, collection, mmr_k)
+        if alpha is not None:
+            inputs += (alpha,)
+        return self.cassette.call(
+            "search",
+            inputs,
+            lambda: hybrid_search(self.client, keyword_query, vec, k=k, collection=collection,
+                                  mmr_k=mmr_k, alpha=alpha),
+        )
+
+    def rerank(self, question: str, docs: list[dict], max_chars: int | None = None) -> tuple[list[dict], float]:
+        def run() -> list[int]:
+            position = {id(d): i for i, d in enumerate(docs)}
+            return [position[id(d)] for d in rerank_chunks_with_llm(question, docs, max_chars=max_chars)]
+
+        inputs = (question, [d.get("id") or d["text"] for d in docs])
+        if max_chars is not None:
+            inputs += (max_chars,)
+        order, ms = self.cassette.call("rerank", inputs, run)
+        return [docs[i] for i in order], ms
+
+    def answer(self, question: str, docs: list[dict], model: str) -> tuple[str, float]:
+        inputs = (question, [d.get("id") or d["text"] for d in docs], model)
+        return self.cassette.call("answer", inputs, lambda: generate_answer(question, docs, model=model))
+
+
+def rerank_tokens(question: str, docs: list[dict], max_chars: int | None = None) -> int:
+    """Approximate rerank prompt size (~4 characters per token)."""
+    return len(build_rerank_prompt(question, docs, max_chars=max_chars)) // 4
+
+
+# USD per 1M (input, output) tokens; models missing here are reported without a cost
+ANSWER_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+
+
+def answer_cost(model: str, question: str, docs: list[dict], answer: str) -> float | None:
+    """Approximate USD cost of one generation (~4 characters per token)."""
+    if model not in ANSWER_PRICES:
+        return None
+    price_in, price_out = ANSWER_PRICES[model]
+    tokens_in = len(ANSWER_SYSTEM_PROMPT + build_answer_prompt(question, docs)) / 4
+    return (tokens_in * price_in + len(answer) / 4 * price_out) / 1e6
+
+
+def evaluate_question(services: Services, pair: dict, args, expansion: str) -> dict:
+    """Score one question; returns its metrics and per-stage latency."""
+    question, phrases = pair["question"], pair["expected_phrases"]
+    latency: dict[str, float] = {}
+
+    (keyword_query, vector_query), latency["expand"] = services.expand(question, expansion)
+    query_vec, latency["embed"] = services.embed(vector_query)
+    retrieved, latency["search"] = services.search(keyword_query, query_vec, args.k)
+
+    rels = relevance(phrases, retrieved)
+    record = {
+        "question": question,
+        "hit_k": any(rels),
+        "hit_4": any(rels[:4]),
+        "rr": reciprocal_rank(rels),
+        "ndcg": ndcg(rels),
+        "rerank_tokens": rerank_tokens(question, retrieved),
+    }
+
+    diverse = []
+    if args.mmr:
+        diverse, latency["mmr_search"] = services.search(keyword_query, query_vec, args.k, mmr_k=args.mmr_k)
+        record["mmr_hit_4"] = phrase_in_docs(phrases, diverse[:4])
+        record["mmr_rerank_tokens"] = rerank_tokens(question, diverse)
+
+    if args.rerank:
+        reranked, latency["rerank"] = services.rerank(question, retrieved)
+        record["rerank_hit_4"] = phrase_in_docs(phrases, reranked[:4])
+        record["rerank_rr"] = reciprocal_rank(relevance(phrases, reranked))
+        if args.mmr:
+            reranked, latency["mmr_rerank"] = services.rerank(question, diverse)
+            record["mmr_rerank_hit_4"] = phrase_in_docs(phrases, reranked[:4])
+
+    record["latency_ms"] = latency
+    return record
+
+
+def format_metric(name: str, value: float) -> str:
+    if "tokens" in name:
+        return f"~{value:.0f}"
+    if "@" in name:
+        return f"{value:.1%}"
+    return f"{value:.3f}"
+
+
+def yn(flag: bool) -> str:
+    return "Y" if flag else "n"
+
+
+def run_mode(services: Services, qa_pairs: list[dict], args, expansion: str) -> dict:
+    """Score every question with one query-expansion mode."""
+    echo(f"\n[expansion={expansion}]")
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        records = list(pool.map(lambda pair: evaluate_question(services, pair, args, expansion), qa_pairs))
+    wall_s = time.perf_counter() - t0
+
+    for r in records:
+        line = f"  hit@{args.k}={yn(r['hit_k'])}  hit@4={yn(r['hit_4'])}  rr={r['rr']:.2f}"
+        if args.mmr:
+            line += f"  mmr@4={yn(r['mmr_hit_4'])}"
         if args.rerank:
-            print(f"hit@4 (after rerank): {hits_rerank}/{n} ({hits_rerank / n:.0%})")
-        if failures:
-            print("\nMisses at full depth:")
-            for q in failures:
-                print(f"  - {q}")
-
-        # treat < 70% hit@k as failure so this can gate CI/manual checks
-        return 0 if hits_k / n >= 0.7 else 1
+            line += f"  rerank@4={yn(r['rerank_hit_4'])}"
+            if args.mmr:
+                line += f"  mmr+rerank@4={yn(r['mmr_rerank_hit_4'])}"
+        echo(f"{line}  {r['latency_ms']['expand']:8.2f}ms  {r['question']}")
+
+    n = len(records)
+
+    def rate(field: str) -> float:
+        return sum(r[field] for r in records) / n
+
+    metrics = {
+        f"hit@{args.k}": rate("hit_k"),
+        "hit@4": rate("hit_4"),
+        "mrr": statistics.mean(r["rr"] for r in records),
+        f"ndcg@{args.k}": statistics.mean(r["ndcg"] for r in records),
+        "rerank_prompt_tokens": statistics.mean(r["rerank_tokens"] for r in records),
+    }
+    if args.rerank:
+        metrics["rerank@4"] = rate("rerank_hit_4")
+        metrics["rerank_mrr"] = statistics.mean(r["rerank_rr"] for r in records)
+    if args.mmr:
+        metrics["mmr@4"] = rate("mmr_hit_4")
+        metrics["mmr_rerank_prompt_tokens"] = statistics.mean(r["mmr_rerank_tokens"] for r in records)
+        if args.rerank:
+            metrics["mmr_rerank@4"] = rate("mmr_rerank_hit_4")
+
+    stages = {stage for r in records for stage in r["latency_ms"]}
+    latency = {
+        stage: latency_summary([r["latency_ms"][stage] for r in records if stage in r["latency_ms"]])
+        for stage in sorted(stages)
+    }
+
+    echo("")
+    for name, value in metrics.items():
+        echo(f"{name}: {format_metric(name, value)}")
+    echo(f"\n{'stage':<12} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for stage, summary in latency.items():
+        echo(f"{stage:<12} {summary['mean']:>8.1f} {summary['p50']:>8.1f} {summary['p95']:>8.1f}")
+    echo(f"wall time: {wall_s:.1f}s with {args.workers} worker(s)")
+
+    misses = [r["question"] for r in records if not r["hit_k"]]
+    if misses:
+        echo("\nMisses at full depth:")
+        for q in misses:
+            echo(f"  - {q}")
+
+    return {"n": n, "metrics": metrics, "latency_ms": latency, "wall_s": wall_s,
+            "misses": misses, "questions": records}
+
+
+def answer_question(services: Services, pair: dict, args) -> dict:
+    """Answer one question with every tier, and with the router's pick."""
+    question = pair["question"]
+    (keyword_query, vector_query), _ = services.expand(question, args.expansion)
+    query_vec, _ = services.embed(vector_query)
+    retrieved, _ = services.search(keyword_query, query_vec, args.k)
+    reranked, _ = services.rerank(question, retrieved)
+    top_docs = reranked[:current_settings().top_n]
+
+    t0 = time.perf_counter()
+    sentence = best_sentence(question, top_docs[0]["text"])[0] if top_docs else ""
+    tiers = {"extractive": {"answer": sentence, "ms": (time.perf_counter() - t0) * 1000, "cost": 0.0}}
+    for tier, model, docs in (
+        ("fast", FAST_ANSWER_MODEL, top_docs[:FAST_ANSWER_CHUNKS]),
+        ("full", FULL_ANSWER_MODEL, top_docs),
+    ):
+        answer, ms = services.answer(question, docs, model)
+        tiers[tier] = {"answer": answer, "ms": ms, "cost": answer_cost(model, question, docs, answer)}
+
+    route = route_answer(question, top_docs, routing=True)
+    tiers["routed"] = {**tiers[route.tier], "tier": route.tier}
+    for result in tiers.values():
+        result["correct"] = answer_correct(pair["expected_phrases"], result["answer"])
+    return {"question": question, "complexity": route.complexity, "confidence": route.confidence,
+            "tiers": tiers}
+
+
+def compare_answer_tiers(services: Services, qa_pairs: list[dict], args) -> dict:
+    """Accuracy, generation latency and cost per tier over the QA set."""
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        records = list(pool.map(lambda pair: answer_question(services, pair, args), qa_pairs))
+
+    for r in records:
+        marks = "  ".join(f"{tier}={yn(r['tiers'][tier]['correct'])}" for tier in (*TIERS, "routed"))
+        echo(f"  {marks}  -> {r['tiers']['routed']['tier']:<10} {r['question']}")
+
+    n = len(records)
+    summary = {}
+    echo(f"\n{'tier':<11} {'accuracy':>9} {'mean ms':>8} {'p95 ms':>8} {'$ / 1k questions':>17}")
+    for tier in (*TIERS, "routed"):
+        results = [r["tiers"][tier] for r in records]
+        costs = [res["cost"] for res in results]
+        cost = None if None in costs else sum(costs) / n * 1000
+        summary[tier] = {
+            "accuracy": sum(res["correct"] for res in results) / n,
+            "latency_ms": latency_summary([res["ms"] for res in results]),
+            "cost_per_1k_usd": cost,
+        }
+        row = summary[tier]
+        echo(
+            f"{tier:<11} {row['accuracy']:>9.1%} {row['latency_ms']['mean']:>8.1f} {row['latency_ms']['p95']:>8.1f} "
+            f"{'n/a' if cost is None else f'{cost:.3f}':>17}"
+        )
+    mix = {tier: sum(r["tiers"]["routed"]["tier"] == tier for r in records) for tier in TIERS}
+    echo("routed to: " + ", ".join(f"{tier} {count}" for tier, count in mix.items()))
+    return {"n": n, "tiers": summary, "routed_mix": mix, "questions": records}
+
+
+def compare_collections(services: Services, qa_pairs: list[dict], args) -> list[dict]:
+    """Score each `name[:dims]` collection; recall@k is measured against the first."""
+    settings = []
+    for spec in args.collections:
+        name, _, dims = spec.partition(":")
+        settings.append((name, int(dims) if dims else None))
+
+    def search(pair: dict, name: str, dims: int | None) -> tuple[list[dict], float]:
+        (keyword_query, vector_query), _ = services.expand(pair["question"], args.expansion)
+        vec, _ = services.embed(vector_query, dims)
+        return services.search(keyword_query, vec, args.k, collection=name)
+
+    baseline_docs: dict[str, set[str]] = {}
+    rows = []
+    echo(f"\n{'collection':<28} {'dims':>5} {'hit@k':>6} {'hit@4':>6} {'recall@k':>9} {'search ms':>10} {'p95 ms':>7}")
+    for n_setting, (name, dims) in enumerate(settings):
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(lambda pair: search(pair, name, dims), qa_pairs))
+
+        hits_k = hits_4 = 0
+        recalls, search_ms = [], []
+        for pair, (retrieved, ms) in zip(qa_pairs, results):
+            question = pair["question"]
+            search_ms.append(ms)
+            hits_k += phrase_in_docs(pair["expected_phrases"], retrieved)
+            hits_4 += phrase_in_docs(pair["expected_phrases"], retrieved[:4])
+            texts = {d["text"] for d in retrieved}
+            if n_setting == 0:
+                baseline_docs[question] = texts
+            elif baseline_docs[question]:
+                recalls.append(len(texts & baseline_docs[question]) / len(baseline_docs[question]))
+
+        n = len(qa_pairs)
+        summary = latency_summary(search_ms)
+        rows.append({
+            "collection": name, "dimensions": dims, f"hit@{args.k}": hits_k / n, "hit@4": hits_4 / n,
+            f"recall@{args.k}": statistics.mean(recalls) if recalls else None, "search_ms": summary,
+        })
+        recall = f"{statistics.mean(recalls):.0%}" if recalls else "base"
+        echo(
+            f"{name:<28} {dims or 'full':>5} {hits_k / n:>6.0%} {hits_4 / n:>6.0%} {recall:>9} "
+            f"{summary['mean']:>10.1f} {summary['p95']:>7.1f}"
+        )
+    return rows
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(path: str, report: dict) -> None:
+    text = json.dumps(report, indent=2)
+    if path == "-":
+        print(text)
+    else:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(text)
+        echo(f"\nWrote {path}")
+
+
+def main() -> int:
+    global ECHO
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rerank", action="store_true", help="also score hit@4 after LLM reranking")
+    parser.add_argument("--k", type=int, default=20, help="retrieval depth (default 20, matching the app)")
+    parser.add_argument("--mmr", action="store_true", help="also score MMR-diversified candidates")
+    parser.add_argument("--mmr-k", type=int, default=MMR_K, help=f"candidates kept by MMR (default {MMR_K})")
+    parser.add_argument(
+        "--expansion",
+        choices=["local", "llm", "off", "both"],
+        default="local",
+        help="query expansion mode; 'both' compares local vs LLM (default local, matching the app)",
+    )
+    parser.add_argument(
+        "--collections",
+        nargs="+",
+        metavar="NAME[:DIMS]",
+        help="compare collections built with different embedding dimensions / compression",
+    )
+    parser.add_argument(
+        "--answers",
+        action="store_true",
+        help="compare answer tiers (fails if routing costs more than 5 points of accuracy vs the full tier)",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="questions evaluated concurrently (default 1)")
+    cassette_args = parser.add_mutually_exclusive_group()
+    cassette_args.add_argument("--record", metavar="PATH", help="save every call's result to a cassette")
+    cassette_args.add_argument("--replay", metavar="PATH", help="answer every call from a cassette (offline)")
+    parser.add_argument("--json", metavar="PATH", help="write a machine-readable report ('-' for stdout)")
+    args = parser.parse_args()
+
+    if args.json == "-":
+        ECHO = sys.stderr
+
+    qa_pairs = json.loads((BASE_DIR / "evals" / "qa_pairs.json").read_text())
+    modes = ["local", "llm"] if args.expansion == "both" else [args.expansion]
+    if (args.collections or args.answers) and args.expansion == "both":
+        parser.error("--collections and --answers need a single --expansion mode")
+    if args.collections and args.answers:
+        parser.error("--collections and --answers are separate runs")
+
+    if args.replay:
+        cassette, client = Cassette(args.replay, "replay"), None
+    else:
+        cassette = Cassette(args.record, "record") if args.record else Cassette()
+        client = connect(os.environ["WEAVIATE_URL"], os.environ["WEAVIATE_API_KEY"])
+    services = Services(client, cassette)
+
+    report = {
+        "run": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "args": vars(args),
+            "questions": len(qa_pairs),
+        },
+    }
+    try:
+        if args.collections:
+            report["collections"] = compare_collections(services, qa_pairs, args)
+            ok = True
+        elif args.answers:
+            report["answers"] = compare_answer_tiers(services, qa_pairs, args)
+            tiers = report["answers"]["tiers"]
+            ok = tiers["routed"]["accuracy"] >= tiers["full"]["accuracy"] - 0.05
+        else:
+            results = {mode: run_mode(services, qa_pairs, args, mode) for mode in modes}
+            report["modes"] = results
+
+            if len(results) > 1:
+                local, llm = results["local"]["metrics"], results["llm"]["metrics"]
+                echo("\nlocal vs llm expansion:")
+                for name in local:
+                    if "@" in name:
+                        echo(f"  {name}: {local[name] - llm[name]:+.1%}")
+                echo(
+                    f"  expansion latency: {results['local']['latency_ms']['expand']['mean']:.2f}ms vs "
+                    f"{results['llm']['latency_ms']['expand']['mean']:.2f}ms"
+                )
+
+            # treat < 70% hit@k as failure so this can gate CI/manual checks
+            ok = all(r["metrics"][f"hit@{args.k}"] >= 0.7 for r in results.values())
     finally:
-        client.close()
+        cassette.save()
+        if client is not None:
+            client.close()
+
+    if args.json:
+        write_report(args.json, report)
+    return 0 if ok else 1
 
 
 if __name__ == "__main__":
@@ -0,0 +1,157 @@
+"""Grid search over retrieval settings, reported as a Pareto table.
+
+Expands and embeds every question in qa_pairs.json once, then for each
+combination of hybrid alpha, k, rerank characters and answer top_n runs
+the search (and, with --rerank, the LLM rerank) and measures:
+
+    hit@top_n   an expected phrase is in the chunks given to the answer model
+    latency     mean search (+ rerank) milliseconds per question
+    tokens      approximate rerank prompt + answer context tokens per question
+
+Rows on the Pareto front (no other row is at least as good on all three
+and better on one) are starred. Apply a row at runtime with
+PUT /admin/retrieval_settings, or via RETRIEVAL_ALPHA / RETRIEVAL_K /
+RERANK_CHARS / ANSWER_TOP_N.
+
+Calls go through the eval cassette, so a recorded sweep can be replayed
+(and re-sliced with a smaller grid) offline.
+
+Usage:
+    python evals/sweep.py --rerank --record evals/cassettes/sweep.json
+    python evals/sweep.py --rerank --replay evals/cassettes/sweep.json --json runs/sweep.json
+    python evals/sweep.py --alphas 0.5 0.65 0.8 --ks 10 20 --top-n 2 4 6
+"""
+
+import argparse
+import itertools
+import json
+import os
+import statistics
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import evals.run_eval as run_eval  # noqa: E402
+from app.weaviate_utils import connect  # noqa: E402
+from evals.cassette import Cassette  # noqa: E402
+from evals.run_eval import Services, echo, phrase_in_docs, rerank_tokens, write_report  # noqa: E402
+
+
+def pareto_front(rows: list[dict]) -> list[dict]:
+    """Rows not dominated on (hit rate up, latency down, tokens down)."""
+    def dominates(a: dict, b: dict) -> bool:
+        no_worse = a["hit"] >= b["hit"] and a["latency_ms"] <= b["latency_ms"] and a["tokens"] <= b["tokens"]
+        better = a["hit"] > b["hit"] or a["latency_ms"] < b["latency_ms"] or a["tokens"] < b["tokens"]
+        return no_worse and better
+
+    return [row for row in rows if not any(dominates(other, row) for other in rows)]
+
+
+def context_tokens(docs: list[dict]) -> int:
+    return sum(len(d.get("text", "")) for d in docs) // 4
+
+
+def sweep(services: Services, qa_pairs: list[dict], args) -> list[dict]:
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        def prepare(pair: dict):
+            (keyword_query, vector_query), _ = services.expand(pair["question"], args.expansion)
+            vec, _ = services.embed(vector_query)
+            return keyword_query, vec
+
+        # expansions and embeddings are shared by every grid point
+        prepared = list(pool.map(prepare, qa_pairs))
+
+        rows = []
+        rerank_chars = args.rerank_chars if args.rerank else [None]
+        for alpha, k in itertools.product(args.alphas, args.ks):
+            searches = list(pool.map(
+                lambda prep: services.search(prep[0], prep[1], k, alpha=alpha), prepared
+            ))
+            search_ms = statistics.mean(ms for _, ms in searches)
+
+            for chars in rerank_chars:
+                if chars is None:
+                    ordered = [(docs, 0.0, 0) for docs, _ in searches]
+                else:
+                    def rerank(item):
+                        pair, (docs, _) = item
+                        reranked, ms = services.rerank(pair["question"], docs, max_chars=chars)
+                        return reranked, ms, rerank_tokens(pair["question"], docs, chars) if docs else 0
+
+                    ordered = list(pool.map(rerank, zip(qa_pairs, searches)))
+                rerank_ms = statistics.mean(ms for _, ms, _ in ordered)
+
+                for top_n in args.top_n:
+                    if top_n > k:
+                        continue
+                    hits = [
+                        phrase_in_docs(pair["expected_phrases"], docs[:top_n])
+                        for pair, (docs, _, _) in zip(qa_pairs, ordered)
+                    ]
+                    tokens = [prompt + context_tokens(docs[:top_n]) for docs, _, prompt in ordered]
+                    rows.append({
+                        "alpha": alpha, "k": k, "rerank_chars": chars, "top_n": top_n,
+                        "hit": sum(hits) / len(hits),
+                        "latency_ms": search_ms + rerank_ms,
+                        "tokens": statistics.mean(tokens),
+                    })
+                    echo(f"  alpha={alpha} k={k} rerank_chars={chars} top_n={top_n}: "
+                         f"hit={rows[-1]['hit']:.0%}")
+    return rows
+
+
+def print_table(rows: list[dict]) -> None:
+    front = {id(row) for row in pareto_front(rows)}
+    echo(f"\n{'':1} {'alpha':>5} {'k':>4} {'chars':>5} {'top_n':>5} {'hit@top_n':>9} {'latency ms':>10} {'~tokens':>8}")
+    for row in sorted(rows, key=lambda r: (-r["hit"], r["latency_ms"], r["tokens"])):
+        echo(
+            f"{'*' if id(row) in front else ' ':1} {row['alpha']:>5} {row['k']:>4} {row['rerank_chars'] or '-':>5} "
+            f"{row['top_n']:>5} {row['hit']:>9.0%} {row['latency_ms']:>10.1f} {row['tokens']:>8.0f}"
+        )
+    echo("\n* Pareto-optimal (hit@top_n vs latency vs tokens)")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alphas", type=float, nargs="+", default=[0.3, 0.5, 0.65, 0.8])
+    parser.add_argument("--ks", type=int, nargs="+", default=[10, 20, 30])
+    parser.add_argument("--rerank-chars", type=int, nargs="+", default=[200, 300, 400])
+    parser.add_argument("--top-n", type=int, nargs="+", default=[2, 4, 6])
+    parser.add_argument("--rerank", action="store_true", help="rerank with the LLM (otherwise raw search order)")
+    parser.add_argument("--expansion", choices=["local", "llm", "off"], default="local")
+    parser.add_argument("--workers", type=int, default=4)
+    cassette_args = parser.add_mutually_exclusive_group()
+    cassette_args.add_argument("--record", metavar="PATH", help="save every call's result to a cassette")
+    cassette_args.add_argument("--replay", metavar="PATH", help="answer every call from a cassette (offline)")
+    parser.add_argument("--json", metavar="PATH", help="write the grid as JSON ('-' for stdout)")
+    args = parser.parse_args()
+
+    if args.json == "-":
+        run_eval.ECHO = sys.stderr
+
+    qa_pairs = json.loads((BASE_DIR / "evals" / "qa_pairs.json").read_text())
+    if args.replay:
+        cassette, client = Cassette(args.replay, "replay"), None
+    else:
+        cassette = Cassette(args.record, "record") if args.record else Cassette()
+        client = connect(os.environ["WEAVIATE_URL"], os.environ["WEAVIATE_API_KEY"])
+
+    try:
+        rows = sweep(Services(client, cassette), qa_pairs, args)
+    finally:
+        cassette.save()
+        if client is not None:
+            client.close()
+
+    print_table(rows)
+    if args.json:
+        front = pareto_front(rows)
+        write_report(args.json, {"args": vars(args), "rows": rows, "pareto": front})
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -6,3 +6,42 @@ import os
 os.environ.setdefault("OPENAI_API_KEY", "sk-test-not-a-real-key")
 os.environ.setdefault("WEAVIATE_URL", "https://test-cluster.example")
 os.environ.setdefault("WEAVIATE_API_KEY", "test-weaviate-key")
+
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_shared_state():
+    """Caches, counters and circuit breakers must not leak between tests."""
+    from app.circuit_breaker import BREAKERS
+    from app.shared_state import state
+
+    state.clear()
+    for breaker in BREAKERS.values():
+        breaker.reset()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def query_log_file(tmp_path, monkeypatch):
+    """Each test logs its questions to its own file, never to logs/."""
+    import app.query_log as query_log
+    from app.jsonl_log import JsonlLog
+
+    log = JsonlLog(tmp_path / "query_log.jsonl", max_bytes=1 << 20, backups=2)
+    monkeypatch.setattr(query_log, "_log", log)
+    yield log
+    log.flush()
+
+
+@pytest.fixture(autouse=True)
+def trace_file(tmp_path, monkeypatch):
+    """Spans go to a per-test file, never to logs/."""
+    import app.tracing as tracing
+    from app.jsonl_log import JsonlLog
+
+    log = JsonlLog(tmp_path / "traces.jsonl", max_bytes=1 << 20, backups=1)
+    monkeypatch.setattr(tracing, "_log", log)
+    yield log
+    log.flush()
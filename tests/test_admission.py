@@ -0,0 +1,52 @@
+import threading
+import time
+
+import pytest
+
+from app.admission import AdmissionStage, Overloaded
+
+
+class TestAdmissionStage:
+    def test_admits_up_to_limit_then_sheds_optional(self):
+        stage = AdmissionStage("rerank", max_concurrency=1, max_queue=4, queue_timeout=1)
+        assert stage.acquire(optional=True)
+        assert stage.acquire(optional=True) is False
+        assert stage.snapshot()["shed"] == 1
+        stage.release()
+        assert stage.acquire(optional=True)
+
+    def test_required_rejected_fast_when_queue_full(self):
+        stage = AdmissionStage("generate", max_concurrency=1, max_queue=0, queue_timeout=5)
+        stage.acquire()
+        with pytest.raises(Overloaded) as err:
+            stage.acquire()
+        assert err.value.reason == "queue full"
+        assert stage.snapshot()["rejected"] == 1
+
+    def test_required_times_out_in_queue(self):
+        stage = AdmissionStage("generate", max_concurrency=1, max_queue=1, queue_timeout=0.05)
+        stage.acquire()
+        with pytest.raises(Overloaded) as err:
+            stage.acquire()
+        assert err.value.reason == "queue timeout"
+        snap = stage.snapshot()
+        assert snap["timed_out"] == 1
+        assert snap["queue_depth"] == 0
+
+    def test_queued_call_admitted_when_slot_frees(self):
+        stage = AdmissionStage("embed", max_concurrency=1, max_queue=1, queue_timeout=5)
+        stage.acquire()
+        admitted = threading.Event()
+
+        def waiter():
+            with stage.slot():
+                admitted.set()
+
+        t = threading.Thread(target=waiter)
+        t.start()
+        while stage.snapshot()["queue_depth"] == 0:
+            time.sleep(0.001)
+        stage.release()
+        t.join(timeout=5)
+        assert admitted.is_set()
+        assert stage.snapshot()["active"] == 0
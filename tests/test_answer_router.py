@@ -0,0 +1,65 @@
+import pytest
+
+import app.answer_router as router
+from app.answer_router import best_sentence, classify_question, has_answer_token, route_answer
+
+MEETINGS = [{"score": 0.9, "text": "Attendance is expected. Staff meetings take place every Wednesday at 15:30 in the hall."}]
+LUNCH = [{"score": 0.9, "text": "Lunch is served in the canteen. Three members of staff are on duty at lunchtime."}]
+
+
+@pytest.fixture(autouse=True)
+def routing_on(monkeypatch):
+    monkeypatch.setattr(router, "ANSWER_ROUTING", True)
+
+
+class TestClassify:
+    def test_short_factual_questions_are_lookups(self):
+        assert classify_question("When do staff meetings take place?") == "lookup"
+        assert classify_question("How many members of staff are on duty at lunchtime?") == "lookup"
+
+    def test_reasoning_cues_and_multi_part_questions(self):
+        assert classify_question("What happens if I don't provide a medical certificate?") == "reasoning"
+        assert classify_question("What time is morning duty and what does it involve?") == "reasoning"
+        assert classify_question("How should teachers set cover work?") == "simple"
+
+
+class TestRoute:
+    def test_covered_lookup_is_answered_extractively(self):
+        route = route_answer("When do staff meetings take place?", MEETINGS)
+        assert route.tier == "extractive" and route.model is None
+        assert route.answer == "Staff meetings take place every Wednesday at 15:30 in the hall."
+
+    def test_lookup_without_the_answer_shape_goes_to_a_model(self):
+        # covers "members", "staff", "duty", "lunchtime" but has no number
+        docs = [{"score": 0.9, "text": "Members of staff on duty at lunchtime wear a lanyard."}]
+        route = route_answer("How many members of staff are on duty at lunchtime?", docs)
+        assert route.tier == "fast" and route.chunks == router.FAST_ANSWER_CHUNKS
+        assert route_answer("How many members of staff are on duty at lunchtime?", LUNCH).tier == "extractive"
+
+    def test_reasoning_and_weak_retrieval_use_the_full_model(self):
+        assert route_answer("Why are staff meetings on Wednesday?", MEETINGS).tier == "full"
+        route = route_answer("What is the policy on mobile phones?", MEETINGS)
+        assert route.tier == "full" and route.model == router.FULL_ANSWER_MODEL and route.chunks is None
+
+    def test_sentences_without_a_concrete_answer_are_not_extracted(self):
+        docs = [{"score": 0.9, "text": "Staff meetings are not held during the exam period."}]
+        assert route_answer("When are staff meetings?", docs).tier != "extractive"
+        docs = [{"score": 0.9, "text": "Your line manager will review your objectives each year."}]
+        assert route_answer("Who is my line manager?", docs).tier != "extractive"
+        assert has_answer_token("Who do I tell if I am sick?", "Inform the Deputy Head before 8am.")
+        assert not has_answer_token("Where is the staff room?", "The staff room is on the first floor.")
+
+    def test_weak_search_hits_use_the_full_model(self):
+        weak = [{**MEETINGS[0], "score": 0.2}]
+        route = route_answer("When do staff meetings take place?", weak)
+        assert route.tier == "full" and route.score == 0.2
+        assert route_answer("When do staff meetings take place?", [{"text": MEETINGS[0]["text"]}]).tier == "full"
+
+    def test_routing_is_off_unless_enabled(self, monkeypatch):
+        monkeypatch.setattr(router, "ANSWER_ROUTING", False)
+        assert route_answer("When do staff meetings take place?", MEETINGS).tier == "full"
+        assert route_answer("When do staff meetings take place?", MEETINGS, routing=True).tier == "extractive"
+
+    def test_confidence_is_coverage_of_the_best_sentence(self):
+        sentence, confidence = best_sentence("When are staff meetings held?", MEETINGS[0]["text"])
+        assert sentence.startswith("Staff meetings") and confidence == 2 / 3
@@ -0,0 +1,175 @@
+import time
+
+import httpx
+import pytest
+from openai import APITimeoutError
+
+import app.llm_utils as llm_utils
+from app.admission import Overloaded
+from app.circuit_breaker import BREAKERS, CircuitBreaker, CircuitOpen
+from app.deadline import DeadlineExceeded, request_deadline, within_deadline
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def fail(breaker: CircuitBreaker, err: Exception = ConnectionError("down")) -> None:
+    with pytest.raises(type(err)):
+        with breaker.guard():
+            raise err
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures_and_fails_fast(self):
+        breaker = CircuitBreaker("weaviate.search", failure_threshold=3, reset_timeout=30, clock=FakeClock())
+        fail(breaker)
+        fail(breaker)
+        with breaker.guard():
+            pass  # a success resets the count
+        for _ in range(3):
+            fail(breaker)
+        assert breaker.state == "open"
+
+        with pytest.raises(CircuitOpen) as err:
+            with breaker.guard():
+                pytest.fail("an open circuit must not attempt the call")
+        assert err.value.retry_after == 30
+        assert breaker.snapshot()["rejected"] == 1
+
+    def test_half_open_lets_one_probe_through(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker("openai.generate", failure_threshold=1, reset_timeout=10, clock=clock)
+        fail(breaker)
+        clock.now += 10
+        assert breaker.state == "half_open"
+
+        with breaker.guard() as probing:
+            assert probing
+            with pytest.raises(CircuitOpen):
+                with breaker.guard():
+                    pass
+        assert breaker.state == "closed"
+
+    def test_failed_probe_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker("openai.embed", failure_threshold=2, reset_timeout=10, clock=clock)
+        fail(breaker)
+        fail(breaker)
+        clock.now += 10
+        fail(breaker)
+        assert breaker.state == "open"
+        assert breaker.snapshot()["opened"] == 2
+        clock.now += 9
+        assert breaker.state == "open"
+
+    def test_admission_rejections_and_healthy_errors_do_not_count(self):
+        breaker = CircuitBreaker("openai.rerank", failure_threshold=1, clock=FakeClock())
+        fail(breaker, Overloaded("rerank", "queue full"))
+        fail(breaker, ValueError("bad input"))
+        assert breaker.state == "open"
+        breaker.reset()
+        with pytest.raises(KeyError):
+            with breaker.guard(healthy_errors=(KeyError,)):
+                raise KeyError("bad input")
+        assert breaker.state == "closed"
+
+    def test_budget_spent_before_the_call_does_not_count(self):
+        breaker = CircuitBreaker("weaviate.search", failure_threshold=1, clock=FakeClock())
+        with request_deadline(0, "ask"):
+            with pytest.raises(DeadlineExceeded):
+                with breaker.guard():
+                    within_deadline(lambda: pytest.fail("called with no budget left"))
+        assert breaker.state == "closed" and breaker.failures == 0
+
+    def test_budget_capped_timeout_does_not_count(self):
+        breaker = CircuitBreaker("weaviate.search", failure_threshold=1, clock=FakeClock())
+        with request_deadline(0.02, "ask"):
+            with pytest.raises(DeadlineExceeded):
+                with breaker.guard():
+                    within_deadline(time.sleep, 0.5, stage="search")
+        assert breaker.state == "closed" and breaker.failures == 0
+        # the dependency timing out on its own still counts
+        fail(breaker, TimeoutError("read timed out"))
+        assert breaker.state == "open"
+
+
+class FlakyOpenAI:
+    """Local stand-in for the OpenAI client with an injectable outage."""
+
+    def __init__(self):
+        self.down = False
+        self.slow = False
+        self.calls = 0
+        self.embeddings = self
+        self.chat = type("Chat", (), {"completions": self})()
+
+    def with_options(self, **kwargs):
+        return self
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.slow:
+            raise APITimeoutError(request=httpx.Request("POST", "https://api.openai.com/v1/embeddings"))
+        if self.down:
+            raise ConnectionError("injected outage")
+        data = [type("D", (), {"embedding": [0.1, 0.2]})() for _ in kwargs["input"]]
+        return type("R", (), {"data": data})()
+
+
+class TestFaultInjection:
+    def test_outage_fails_fast_and_recovers_after_reset(self, monkeypatch):
+        clock = FakeClock()
+        breaker = BREAKERS["openai.embed"]
+        monkeypatch.setattr(breaker, "_clock", clock)
+        monkeypatch.setattr(breaker, "failure_threshold", 3)
+        monkeypatch.setattr(breaker, "reset_timeout", 5)
+        upstream = FlakyOpenAI()
+        monkeypatch.setattr(llm_utils, "client", upstream)
+
+        upstream.down = True
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                llm_utils.embed_texts(["q"])
+        # open: 100 more requests never reach the failing dependency
+        for _ in range(100):
+            with pytest.raises(CircuitOpen):
+                llm_utils.embed_texts(["q"])
+        assert upstream.calls == 3
+
+        # the dependency recovers; the first request after the reset window closes the circuit
+        upstream.down = False
+        clock.now += 5
+        assert llm_utils.embed_texts(["q"]) == [[0.1, 0.2]]
+        assert breaker.state == "closed" and upstream.calls == 4
+
+    def test_timeout_set_by_the_request_budget_does_not_count(self, monkeypatch):
+        breaker = BREAKERS["openai.embed"]
+        monkeypatch.setattr(breaker, "failure_threshold", 1)
+        upstream = FlakyOpenAI()
+        upstream.slow = True
+        monkeypatch.setattr(llm_utils, "client", upstream)
+
+        with request_deadline(5, "ask"):
+            with pytest.raises(DeadlineExceeded):
+                llm_utils.embed_texts(["q"])
+        assert breaker.state == "closed" and breaker.failures == 0
+        # OpenAI using its full timeout is a failure
+        with pytest.raises(APITimeoutError):
+            llm_utils.embed_texts(["q"])
+        assert breaker.state == "open"
+
+    def test_optional_stage_degrades_while_open(self, monkeypatch):
+        breaker = BREAKERS["openai.expand"]
+        monkeypatch.setattr(breaker, "failure_threshold", 1)
+        upstream = FlakyOpenAI()
+        upstream.down = True
+        monkeypatch.setattr(llm_utils, "client", upstream)
+
+        assert llm_utils.expand_query("Sick pay?") == "Sick pay?"
+        assert llm_utils.expand_query("Sick pay?") == "Sick pay?"
+        assert breaker.state == "open" and upstream.calls == 1
@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+import app.deadline as deadline
+import app.llm_utils as llm_utils
+from app.admission import AdmissionStage
+from app.deadline import DeadlineExceeded, call_timeout, request_deadline, within_deadline
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestRequestDeadline:
+    def test_call_timeouts_shrink_with_the_budget(self):
+        clock = FakeClock()
+        assert call_timeout(60) == 60
+        with request_deadline(30, "ask", clock=clock):
+            assert call_timeout(60) == 30
+            clock.now += 25
+            assert call_timeout(60) == 5
+            assert call_timeout(2) == 2
+            clock.now += 5
+            with pytest.raises(DeadlineExceeded):
+                call_timeout(60)
+        assert call_timeout(60) == 60
+
+    def test_optional_stages_skipped_when_budget_runs_low(self, monkeypatch):
+        monkeypatch.setattr(deadline, "DEADLINE_OPTIONAL_RESERVE", 10)
+        clock = FakeClock()
+        skipped = deadline.deadline_snapshot()["optional_skipped"].get("rerank", 0)
+        with request_deadline(30, "ask", clock=clock):
+            assert deadline.allow_optional("rerank")
+            clock.now += 21
+            assert not deadline.allow_optional("rerank")
+        assert deadline.deadline_snapshot()["optional_skipped"]["rerank"] == skipped + 1
+
+    def test_failure_after_the_budget_is_reported_as_exhaustion(self):
+        clock = FakeClock()
+        exhausted = deadline.deadline_snapshot()["exhausted"].get("ask", 0)
+        with pytest.raises(DeadlineExceeded):
+            with request_deadline(5, "ask", clock=clock):
+                clock.now += 6
+                raise TimeoutError("upstream read timed out")
+        with pytest.raises(ValueError):
+            with request_deadline(5, "ask", clock=clock):
+                raise ValueError("not a timeout")
+        assert deadline.deadline_snapshot()["exhausted"]["ask"] == exhausted + 1
+
+
+class TestWithinDeadline:
+    def test_stops_waiting_for_a_slow_call(self):
+        with request_deadline(0.05, "ask"):
+            assert within_deadline(lambda x: x * 2, 21) == 42
+            started = time.monotonic()
+            with pytest.raises(DeadlineExceeded):
+                within_deadline(time.sleep, 2, stage="search")
+        assert time.monotonic() - started < 1
+
+    def test_runs_inline_without_a_budget(self):
+        assert within_deadline(lambda: deadline.current_deadline()) is None
+
+
+class TestPropagation:
+    def test_rerank_skipped_without_calling_the_llm(self, monkeypatch):
+        monkeypatch.setattr(deadline, "DEADLINE_OPTIONAL_RESERVE", 10)
+
+        class Unreachable:
+            def with_options(self, **kwargs):
+                raise AssertionError("rerank should not call the LLM")
+
+        monkeypatch.setattr(llm_utils, "client", Unreachable())
+        chunks = [{"text": "a"}, {"text": "b"}]
+        with request_deadline(5, "ask"), deadline.track_degraded() as degraded:
+            assert llm_utils.rerank_chunks_with_llm("q", chunks) == chunks
+        assert degraded == {"rerank"}
+
+    def test_degraded_stages_tracked_across_threads(self):
+        with request_deadline(5, "ask"), deadline.track_degraded() as degraded:
+            within_deadline(deadline.mark_degraded, "expand")
+        assert degraded == {"expand"}
+        deadline.mark_degraded("rerank")  # outside a tracked block: ignored
+
+    def test_llm_calls_get_the_remaining_time(self, monkeypatch):
+        clock = FakeClock()
+        with request_deadline(12, "ask", clock=clock):
+            clock.now += 4
+            bounded = llm_utils.llm_client("generate")
+        assert bounded.timeout == 8 and bounded.max_retries == 0
+        assert llm_utils.llm_client() is llm_utils.client
+
+    def test_admission_queue_wait_capped_by_the_budget(self):
+        stage = AdmissionStage("generate", max_concurrency=1, max_queue=1, queue_timeout=10)
+        stage.acquire()
+        with request_deadline(0.05, "ask"):
+            with pytest.raises(DeadlineExceeded):
+                stage.acquire()
+        assert stage.snapshot()["timed_out"] == 1
@@ -0,0 +1,117 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+import app.ingest as ingest
+import app.weaviate_utils as weaviate_utils
+from benchmarks.handbook_pdf import write_handbook_pdf
+
+
+@pytest.fixture
+def library(tmp_path):
+    root = tmp_path / "policies"
+    (root / "hr").mkdir(parents=True)
+    write_handbook_pdf(root / "handbook.pdf", pages=2, seed=1)
+    write_handbook_pdf(root / "hr" / "leave.PDF", pages=1, seed=2)
+    (root / "notes.txt").write_text("not a pdf")
+    return root
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(weaviate_utils, "fetch_existing_hashes", lambda col, hashes: set())
+    monkeypatch.setattr(weaviate_utils, "find_near_duplicates", lambda col, chunks: ({}, {}))
+    monkeypatch.setattr(weaviate_utils, "embed_texts", lambda texts: [[0.0, 1.0] for _ in texts])
+    col = MagicMock()
+    col.data.insert_many.return_value = MagicMock(errors=None)
+    client = MagicMock()
+    client.collections.get.return_value = col
+    return client
+
+
+def inserted_objects(client):
+    col = client.collections.get.return_value
+    return [o for c in col.data.insert_many.call_args_list for o in c.args[0]]
+
+
+class TestIngestDirectory:
+    def test_ingests_every_pdf_in_shared_batches(self, library, client, tmp_path):
+        manifest = ingest.Manifest(tmp_path / "manifest.jsonl")
+
+        stats = ingest.ingest_directory(client, library, manifest=manifest, workers=2, batch_size=5)
+
+        objects = inserted_objects(client)
+        assert stats["files"] == 2 and stats["failed"] == []
+        assert stats["inserted"] == len(objects) == stats["chunks"]
+        assert {o.properties["document_name"] for o in objects} == {"handbook.pdf", "leave.PDF"}
+        assert all(o.properties["page_start"] >= 1 for o in objects)
+        # batches are filled across file boundaries; only the last is short
+        sizes = [len(c.args[0]) for c in client.collections.get.return_value.data.insert_many.call_args_list]
+        assert all(size == 5 for size in sizes[:-1])
+        assert stats["docs_per_min"] > 0 and stats["chunks_per_s"] > 0
+
+        entries = [json.loads(line) for line in manifest.path.read_text().splitlines()]
+        assert sorted(e["name"] for e in entries) == ["handbook.pdf", "leave.PDF"]
+        assert sum(e["inserted"] for e in entries) == stats["inserted"]
+
+    def test_rerun_skips_files_in_manifest(self, library, client, tmp_path):
+        path = tmp_path / "manifest.jsonl"
+        ingest.ingest_directory(client, library, manifest=ingest.Manifest(path), workers=0)
+        client.collections.get.return_value.data.insert_many.reset_mock()
+
+        stats = ingest.ingest_directory(client, library, manifest=ingest.Manifest(path), workers=0)
+
+        assert stats["skipped_files"] == 2 and stats["files"] == 0
+        assert inserted_objects(client) == []
+
+    def test_manifest_is_per_collection(self, library, client, tmp_path):
+        path = tmp_path / "manifest.jsonl"
+        ingest.ingest_directory(client, library, "PDFDocument_a", ingest.Manifest(path), workers=0)
+
+        stats = ingest.ingest_directory(client, library, "PDFDocument_b", ingest.Manifest(path), workers=0)
+
+        assert stats["files"] == 2
+
+    def test_identical_files_are_inserted_once(self, tmp_path, client):
+        (tmp_path / "lib").mkdir()
+        for name in ("a.pdf", "copy-of-a.pdf"):
+            write_handbook_pdf(tmp_path / "lib" / name, pages=1)
+
+        stats = ingest.ingest_directory(client, tmp_path / "lib", workers=0)
+
+        assert stats["files"] == 2
+        assert stats["inserted"] == stats["chunks"] // 2
+        assert stats["skipped_existing"] == stats["chunks"] // 2
+
+    def test_unreadable_and_failed_files_stay_out_of_manifest(self, library, client, tmp_path, monkeypatch):
+        (library / "broken.pdf").write_bytes(b"%PDF-1.4 garbage")
+        col = client.collections.get.return_value
+
+        def insert_many(objects):
+            if any(o.properties["document_name"] == "leave.PDF" for o in objects):
+                raise RuntimeError("weaviate down")
+            return MagicMock(errors=None)
+
+        col.data.insert_many.side_effect = insert_many
+        monkeypatch.setattr(weaviate_utils.time, "sleep", lambda s: None)
+        manifest = ingest.Manifest(tmp_path / "manifest.jsonl")
+
+        stats = ingest.ingest_directory(client, library, manifest=manifest, workers=0, batch_size=1000)
+
+        # handbook.pdf shared the failed batch with leave.PDF
+        expected = [library / "broken.pdf", library / "handbook.pdf", library / "hr" / "leave.PDF"]
+        assert sorted(stats["failed"]) == sorted(map(str, expected))
+        assert stats["files"] == 0
+        assert not manifest.path.exists()
+
+
+class TestManifest:
+    def test_ignores_truncated_last_line(self, tmp_path):
+        path = tmp_path / "m.jsonl"
+        path.write_text(json.dumps({"collection": "C", "sha256": "abc", "name": "a.pdf"}) + "\n{\"collec")
+
+        manifest = ingest.Manifest(path)
+
+        assert manifest.done("C", "abc")
+        assert not manifest.done("D", "abc")
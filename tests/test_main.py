@@ -1,9 +1,19 @@
+import json
+import os
+import subprocess
+import sys
+import time
 from unittest.mock import MagicMock
 
 import pytest
 from fastapi.testclient import TestClient
 
+import app.answer_router as answer_router
 import app.main as main
+from app.circuit_breaker import BREAKERS
+from app.deadline import mark_degraded, within_deadline
+from app.shared_state import bump_index_generation
+from benchmarks.handbook_pdf import write_handbook_pdf
 
 PDF_MAGIC = b"%PDF-1.7 minimal test payload"
 
@@ -15,6 +25,8 @@ def client(monkeypatch):
     monkeypatch.setattr(main, "connect", lambda *a, **k: fake_weaviate)
     monkeypatch.setattr(main, "ensure_schema", lambda c: None)
     with TestClient(main.app) as tc:
+        # the connection is made in the background; wait for it
+        assert tc.app.state.weaviate_connection.wait_ready(timeout=5)
         tc.fake_weaviate = fake_weaviate
         yield tc
 
@@ -39,6 +51,63 @@ class TestHealth:
         body = r.json()
         assert body["status"] == "ok"
         assert body["weaviate"] in ("connected", "disconnected")
+        assert body["circuits"]["openai.generate"]["state"] == "closed"
+
+    def test_open_search_circuit_fails_fast_with_503(self, client, headers, monkeypatch):
+        breaker = BREAKERS["weaviate.search"]
+        monkeypatch.setattr(breaker, "failure_threshold", 1)
+        client.fake_weaviate.collections.get.return_value.query.hybrid.side_effect = TimeoutError("slow")
+        monkeypatch.setattr("app.weaviate_utils.embed_text", lambda text: [0.1, 0.2])
+
+        first = client.post("/ask_question", data={"query": "Sick pay?"}, headers=headers)
+        second = client.post("/ask_question", data={"query": "Holiday?"}, headers=headers)
+
+        assert first.status_code == 500
+        assert second.status_code == 503 and int(second.headers["Retry-After"]) > 0
+        assert client.fake_weaviate.collections.get.return_value.query.hybrid.call_count == 1
+        assert client.get("/health").json()["circuits"]["weaviate.search"]["state"] == "open"
+
+
+class TestStartup:
+    def test_serves_before_weaviate_is_reachable(self, monkeypatch, headers):
+        def unreachable(*a, **k):
+            raise ConnectionError("weaviate down")
+
+        monkeypatch.setattr(main, "connect", unreachable)
+        with TestClient(main.app) as tc:
+            assert tc.get("/health").json()["weaviate"] == "disconnected"
+            r = tc.post("/ask_question", data={"query": "Sick pay?"}, headers=headers)
+            assert r.status_code == 503
+            assert r.headers["Retry-After"]
+
+    def test_invalid_allowed_tenants_fail_at_startup(self):
+        env = {**os.environ, "ALLOWED_TENANTS": "science,acme-corp", "API_ONLY": "true"}
+        r = subprocess.run([sys.executable, "-c", "import app.main"], env=env, cwd=main.BASE_DIR,
+                           capture_output=True, text=True)
+        assert r.returncode != 0 and "acme-corp" in r.stderr
+
+    def test_api_only_never_imports_gradio(self):
+        code = "import sys, app.main; print('gradio' in sys.modules, app.main.root().headers['location'])"
+        env = {**os.environ, "API_ONLY": "true"}
+        out = subprocess.run([sys.executable, "-c", code], env=env, cwd=main.BASE_DIR,
+                             capture_output=True, text=True, check=True).stdout.split()
+        assert out == ["False", "/docs"]
+
+    def test_stale_vocabulary_is_refreshed_after_another_worker_writes(self, monkeypatch):
+        from app.query_expansion import CorpusVocabulary
+
+        vocab = CorpusVocabulary()
+        vocab.seed(["Staff who are unwell."])
+        vocab.seeded_at -= main.VOCABULARY_REFRESH_SECONDS
+        monkeypatch.setattr(main, "corpus_vocabulary", vocab)
+        queued = []
+        monkeypatch.setattr(main, "run_in_background", lambda name, job: queued.append(name))
+
+        main.refresh_vocabulary(MagicMock())
+        assert queued == []  # still current
+        bump_index_generation()
+        main.refresh_vocabulary(MagicMock())
+        assert queued == ["vocabulary"]
 
 
 class TestUploadValidation:
@@ -77,16 +146,33 @@ class TestUploadValidation:
         )
         assert r.status_code == 413
 
-    def test_corrupt_pdf_returns_400_and_is_cleaned_up(self, client, headers):
+    def test_corrupt_pdf_returns_400(self, client, headers):
         r = client.post(
             "/upload_pdf",
             files={"file": ("corrupt.pdf", PDF_MAGIC, "application/pdf")},
             headers=headers,
         )
         assert r.status_code == 400
-        # nothing left behind in the upload dir for this file
-        leftovers = [p for p in main.UPLOAD_DIR.glob("*corrupt.pdf")]
-        assert leftovers == []
+        assert "Could not read this PDF" in r.json()["detail"]
+
+    def test_indexes_the_spooled_upload_in_place(self, client, headers, monkeypatch, tmp_path):
+        write_handbook_pdf(tmp_path / "handbook.pdf", pages=2)
+        inserted = {}
+
+        def fake_insert(wv, chunks, name, collection=None):
+            inserted.update(chunks=chunks, name=name)
+            return {"inserted": len(chunks), "skipped_existing": 0, "unique_in_upload": len(chunks),
+                    "near_duplicates": 0}
+
+        monkeypatch.setattr(main, "insert_chunks", fake_insert)
+        r = client.post(
+            "/upload_pdf",
+            files={"file": ("handbook.pdf", (tmp_path / "handbook.pdf").read_bytes(), "application/pdf")},
+            headers=headers,
+        )
+        assert r.status_code == 200, r.text
+        assert inserted["name"] == "handbook.pdf"
+        assert inserted["chunks"][0]["page_start"] == 1
 
 
 class TestAskQuestion:
@@ -108,6 +194,186 @@ class TestAskQuestion:
         assert "password123" not in body
         assert "RuntimeError" not in body
 
+    def test_slow_upstream_returns_504_within_the_deadline(self, client, headers, monkeypatch):
+        monkeypatch.setattr(main, "ASK_DEADLINE_SECONDS", 0.1)
+        # stands in for a Weaviate query that hangs
+        monkeypatch.setattr(main, "search_weaviate", lambda *a, **k: within_deadline(time.sleep, 5))
+        started = time.monotonic()
+        r = client.post("/ask_question", data={"query": "anything"}, headers=headers)
+        assert r.status_code == 504
+        assert time.monotonic() - started < 2
+        assert client.get("/metrics").json()["deadlines"]["exhausted"]["ask"] >= 1
+
+    def test_two_phase_hydrates_only_top_docs(self, client, headers, monkeypatch):
+        candidates = [{"id": f"id{i}", "snippet": f"s{i}", "chunk_index": i, "score": 1} for i in range(20)]
+        monkeypatch.setattr(main, "search_weaviate", lambda *a, **k: [dict(c) for c in candidates])
+        monkeypatch.setattr(main, "rerank_chunks_with_llm", lambda q, docs: docs)
+        monkeypatch.setattr(main, "generate_answer", lambda q, docs, model=None: " ".join(d["text"] for d in docs))
+        hydrated = []
+
+        def fake_hydrate(wv, docs, collection=None):
+            hydrated.append([d["id"] for d in docs])
+            for d in docs:
+                d["text"] = f"full {d['id']}"
+            return docs
+
+        monkeypatch.setattr(main, "hydrate_docs", fake_hydrate)
+        r = client.post(
+            "/ask_question",
+            data={"query": "q", "include_retrieved_docs": "false"},
+            headers=headers,
+        )
+        body = r.json()
+        assert hydrated == [["id0", "id1", "id2", "id3"]]
+        assert body["answer"] == "full id0 full id1 full id2 full id3"
+        assert "retrieved_docs" not in body
+
+    def test_answers_are_cached_until_the_index_changes(self, client, headers, monkeypatch):
+        searches = []
+
+        def fake_search(*a, **k):
+            searches.append(a)
+            return [{"id": "id0", "text": "Sick pay is 20 days.", "chunk_index": 0, "score": 1}]
+
+        monkeypatch.setattr(main, "search_weaviate", fake_search)
+        monkeypatch.setattr(main, "rerank_chunks_with_llm", lambda q, docs: docs)
+        monkeypatch.setattr(main, "generate_answer", lambda q, docs, model=None: "20 days.")
+        monkeypatch.setattr(main, "TWO_PHASE_RETRIEVAL", False)
+
+        ask = lambda: client.post("/ask_question", data={"query": "Sick pay?"}, headers=headers).json()
+        first, second = ask(), ask()
+        assert first == second and first["answer"] == "20 days."
+        assert len(searches) == 1
+
+        bump_index_generation()
+        ask()
+        assert len(searches) == 2
+
+    def test_degraded_answers_are_cached_briefly(self, client, headers, monkeypatch):
+        searches = []
+        monkeypatch.setattr(main, "search_weaviate",
+                            lambda *a, **k: searches.append(a) or [{"id": "id0", "text": "Sick pay.", "score": 1}])
+
+        def shed_rerank(q, docs):
+            mark_degraded("rerank")
+            return docs
+
+        monkeypatch.setattr(main, "rerank_chunks_with_llm", shed_rerank)
+        monkeypatch.setattr(main, "generate_answer", lambda q, docs, model=None: "20 days.")
+        monkeypatch.setattr(main, "TWO_PHASE_RETRIEVAL", False)
+        ttls = []
+        set_answer = main.shared_state.set
+        monkeypatch.setattr(main.shared_state, "set",
+                            lambda ns, key, value, ttl=None: ttls.append(ttl) or set_answer(ns, key, value, ttl))
+
+        client.post("/ask_question", data={"query": "Sick pay?"}, headers=headers)
+        assert ttls == [main.DEGRADED_ANSWER_TTL_SECONDS]
+
+        monkeypatch.setattr(main, "DEGRADED_ANSWER_TTL_SECONDS", 0)
+        client.post("/ask_question", data={"query": "Other?"}, headers=headers)
+        client.post("/ask_question", data={"query": "Other?"}, headers=headers)
+        assert len(searches) == 3 and len(ttls) == 1
+
+    def test_session_follow_up_skips_retrieval(self, client, headers, monkeypatch):
+        searches, prompts = [], []
+
+        def fake_search(*a, **k):
+            searches.append(a)
+            return [{"id": "id0", "text": "Sick pay lasts 20 working days.", "chunk_index": 0, "score": 1}]
+
+        monkeypatch.setattr(main, "search_weaviate", fake_search)
+        monkeypatch.setattr(main, "rerank_chunks_with_llm", lambda q, docs: docs)
+        monkeypatch.setattr(main, "generate_answer", lambda q, docs, model=None: prompts.append(q) or "20 days.")
+        monkeypatch.setattr(main, "TWO_PHASE_RETRIEVAL", False)
+        session = {"session_id": "tab-0123456789abcdef"}
+
+        first = client.post("/ask_question", data={"query": "What is sick pay?", **session}, headers=headers).json()
+        follow_up = client.post("/ask_question", data={"query": "And how many days is that?", **session},
+                                headers=headers).json()
+
+        assert first["reused_context"] is False and follow_up["reused_context"] is True
+        assert len(searches) == 1
+        assert follow_up["reranked_docs"] == first["reranked_docs"]
+        assert "What is sick pay?" in prompts[-1]
+        assert client.get("/metrics").json()["sessions"]["follow_ups_reused"] == 1
+
+    def test_malformed_session_id_is_rejected(self, client, headers):
+        r = client.post("/ask_question", data={"query": "q", "session_id": "short"}, headers=headers)
+        assert r.status_code == 400
+
+    def test_most_asked_questions_precomputed_after_an_upload(self, client, headers, monkeypatch,
+                                                               query_log_file):
+        searches = []
+
+        def fake_search(*a, **k):
+            searches.append(a[1])
+            return [{"id": "id0", "text": "Sick pay is 20 days.", "chunk_index": 0, "score": 1}]
+
+        monkeypatch.setattr(main, "search_weaviate", fake_search)
+        monkeypatch.setattr(main, "rerank_chunks_with_llm", lambda q, docs: docs)
+        monkeypatch.setattr(main, "generate_answer", lambda q, docs, model=None: "20 days.")
+        monkeypatch.setattr(main, "TWO_PHASE_RETRIEVAL", False)
+        monkeypatch.setattr(main, "tenant_collection", lambda wv, tenant, create=False: "PDFDocument")
+        ask = lambda q: client.post("/ask_question", data={"query": q}, headers=headers).json()
+        for q in ("What is sick pay?", "What is sick pay?", "Dress code?"):
+            ask(q)
+        query_log_file.flush()
+
+        bump_index_generation()  # what an upload does
+        searches.clear()
+        before = client.get("/metrics").json()["deadlines"]["started"]
+        assert main.precompute_faq_answers(client.fake_weaviate) == 2
+        after = client.get("/metrics").json()["deadlines"]["started"]
+        # counted apart from live traffic
+        assert after["precompute"] - before.get("precompute", 0) == 2 and after["ask"] == before["ask"]
+        assert searches == ["What is sick pay?", "Dress code?"]
+        # another worker (or a second run) finds the generation done
+        assert main.precompute_faq_answers(client.fake_weaviate) == 0
+
+        searches.clear()
+        assert ask("what  is sick pay?")["answer"] == "20 days."
+        assert searches == ["what  is sick pay?"]  # different case: a different question
+        ask("What is sick pay?")
+        assert searches == ["what  is sick pay?"]
+        assert client.get("/metrics").json()["query_log"]["faq_precomputed"] == 2
+
+    def test_each_request_is_traced(self, client, headers, monkeypatch, trace_file):
+        chunk = {"id": "id0", "chunk_index": 0, "score": 1, "text": "Sick pay is 20 days."}
+        monkeypatch.setattr(main, "search_weaviate", lambda *a, **k: [dict(chunk)])
+        monkeypatch.setattr(main, "rerank_chunks_with_llm", lambda q, docs: docs)
+        monkeypatch.setattr(main, "generate_answer", lambda q, docs, model=None: "20 days.")
+        monkeypatch.setattr(main, "TWO_PHASE_RETRIEVAL", False)
+
+        r = client.post("/ask_question", data={"query": "What is sick pay?"},
+                        headers={**headers, "X-Trace-Id": "0123456789abcdef"})
+        assert r.headers["x-trace-id"] == "0123456789abcdef"
+        trace_file.flush()
+        spans = {s["name"]: s for s in trace_file.entries() if s["trace"] == "0123456789abcdef"}
+        root = spans["POST /ask_question"]
+        assert root["attrs"]["status"] == 200 and root["attrs"]["query_chars"] == 17
+        assert spans["answer_cache"]["parent"] == root["span"]
+        assert spans["answer"]["attrs"]["tier"] == "full"
+        assert {"rerank", "answer"} <= set(spans)
+
+    def test_routed_lookups_skip_the_answer_model(self, client, headers, monkeypatch):
+        models = []
+        chunk = {"id": "id0", "chunk_index": 0, "score": 1,
+                 "text": "Staff meetings take place every Wednesday at 3.30pm. Attendance is expected."}
+        monkeypatch.setattr(main, "search_weaviate", lambda *a, **k: [dict(chunk)])
+        monkeypatch.setattr(main, "rerank_chunks_with_llm", lambda q, docs: docs)
+        monkeypatch.setattr(main, "generate_answer", lambda q, docs, model=None: models.append(model) or "answer")
+        monkeypatch.setattr(main, "TWO_PHASE_RETRIEVAL", False)
+        monkeypatch.setattr(answer_router, "ANSWER_ROUTING", True)
+
+        ask = lambda q: client.post("/ask_question", data={"query": q}, headers=headers).json()
+        lookup = ask("When do staff meetings take place?")
+        reasoning = ask("Why are staff meetings held on Wednesday?")
+
+        assert lookup["answer_tier"] == "extractive"
+        assert lookup["answer"] == "Staff meetings take place every Wednesday at 3.30pm."
+        assert reasoning["answer_tier"] == "full" and models == ["gpt-4o-mini"]
+        assert client.get("/metrics").json()["answer_tiers"] == {"extractive": 1, "fast": 0, "full": 1}
+
     def test_503_when_weaviate_down(self, monkeypatch, headers):
         def fail_connect(*a, **k):
             raise ConnectionError("no weaviate")
@@ -119,6 +385,40 @@ class TestAskQuestion:
         assert r.status_code == 503
 
 
+class TestTenantScoping:
+    def test_tenant_and_document_passed_to_search(self, client, headers, monkeypatch):
+        monkeypatch.setattr(main, "ALLOWED_TENANTS", {"science"})
+        monkeypatch.setattr(main, "tenant_collection", lambda wv, tenant, create=False: f"PDFDocument_{tenant}")
+        calls = []
+
+        def fake_search(wv, query, k=20, **scope):
+            calls.append(scope)
+            return []
+
+        monkeypatch.setattr(main, "search_weaviate", fake_search)
+        r = client.post(
+            "/ask_question",
+            data={"query": "q", "tenant": "Science", "document_name": "handbook.pdf"},
+            headers=headers,
+        )
+        assert r.status_code == 200
+        assert calls[0]["collection"] == "PDFDocument_science"
+        assert calls[0]["document_name"] == "handbook.pdf"
+
+    def test_unknown_tenant_rejected(self, client, headers, monkeypatch):
+        monkeypatch.setattr(main, "ALLOWED_TENANTS", {"science"})
+        r = client.post("/ask_question", data={"query": "q", "tenant": "maths"}, headers=headers)
+        assert r.status_code == 400
+
+    def test_tenant_without_uploads_gets_no_results_answer(self, client, headers, monkeypatch):
+        monkeypatch.setattr(main, "ALLOWED_TENANTS", {"science"})
+        monkeypatch.setattr(main, "tenant_collection", lambda wv, tenant, create=False: None)
+        monkeypatch.setattr(main, "search_weaviate", lambda *a, **k: pytest.fail("searched a missing collection"))
+        r = client.post("/ask_question", data={"query": "q", "tenant": "science"}, headers=headers)
+        assert r.status_code == 200
+        assert r.json()["answer"] == main.NO_RESULTS_ANSWER
+
+
 class TestRateLimits:
     def test_upload_rate_limited_per_ip(self, client, monkeypatch):
         limit = int(main.UPLOAD_RATE_LIMIT.split("/")[0])
@@ -154,3 +454,134 @@ class TestRateLimits:
             assert r.status_code == 200
         r = client.post("/ask_question", data={"query": "q"}, headers=my_ip)
         assert r.status_code == 429
+
+
+class TestAskBatch:
+    def _patch_pipeline(self, monkeypatch, fail_on=None):
+        embed_calls = []
+
+        def fake_embed(texts):
+            embed_calls.append(list(texts))
+            return [[0.0] for _ in texts]
+
+        def fake_answer(query, retrieved, hydrate=None, include_retrieved=True):
+            if query == fail_on:
+                raise RuntimeError("secret internal detail")
+            return {"answer": f"answer to {query}", "retrieved_docs": retrieved, "reranked_docs": retrieved}
+
+        monkeypatch.setattr(main, "build_search_queries", lambda q: (q, q))
+        monkeypatch.setattr(main, "embed_queries", fake_embed)
+        monkeypatch.setattr(main, "hybrid_search", lambda wv, kw, vec, k, *scope: [{"text": kw, "chunk_index": 0, "score": 1.0}])
+        monkeypatch.setattr(main, "answer_from_retrieved", fake_answer)
+        return embed_calls
+
+    def test_streams_one_line_per_question_with_single_embedding_call(self, client, headers, monkeypatch):
+        embed_calls = self._patch_pipeline(monkeypatch)
+        questions = ["q1", "q2", "q3"]
+        r = client.post("/ask_batch", json={"questions": questions}, headers=headers)
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in r.text.splitlines()]
+        assert sorted(line["index"] for line in lines) == [0, 1, 2]
+        assert all(line["answer"] == f"answer to {line['question']}" for line in lines)
+        assert embed_calls == [questions]
+
+    def test_per_question_errors_do_not_fail_batch(self, client, headers, monkeypatch):
+        self._patch_pipeline(monkeypatch, fail_on="bad")
+        r = client.post("/ask_batch", json={"questions": ["good", "bad"]}, headers=headers)
+        assert r.status_code == 200
+        lines = {line["question"]: line for line in map(json.loads, r.text.splitlines())}
+        assert lines["good"]["answer"] == "answer to good"
+        assert "error" in lines["bad"]
+        assert "secret" not in r.text
+
+    def test_rejects_empty_and_oversized_batches(self, client, headers, monkeypatch):
+        monkeypatch.setattr(main, "MAX_BATCH_QUESTIONS", 2)
+        assert client.post("/ask_batch", json={"questions": []}, headers=headers).status_code == 400
+        r = client.post("/ask_batch", json={"questions": ["a", "b", "c"]}, headers=headers)
+        assert r.status_code == 400
+
+    def test_each_question_counts_toward_ask_rate_limit(self, client, monkeypatch):
+        self._patch_pipeline(monkeypatch)
+        limit = int(main.ASK_RATE_LIMIT.split("/")[0])
+        my_ip = ip(9996)
+        r = client.post("/ask_batch", json={"questions": ["q"] * limit}, headers=my_ip)
+        assert r.status_code == 200
+        r = client.post("/ask_batch", json={"questions": ["q"]}, headers=my_ip)
+        assert r.status_code == 429
+
+    def test_batch_exhausts_ask_question(self, client, headers, monkeypatch):
+        self._patch_pipeline(monkeypatch)
+        limit = int(main.ASK_RATE_LIMIT.split("/")[0])
+        assert client.post("/ask_batch", json={"questions": ["q"] * limit}, headers=headers).status_code == 200
+        assert client.post("/ask_question", data={"query": "q"}, headers=headers).status_code == 429
+
+    def test_single_asks_exhaust_the_batch_quota(self, client, headers, monkeypatch):
+        monkeypatch.setattr(main, "answer_question", lambda *a, **k: {"answer": "yes"})
+        limit = int(main.ASK_RATE_LIMIT.split("/")[0])
+        for _ in range(limit):
+            assert client.post("/ask_question", data={"query": "q"}, headers=headers).status_code == 200
+        assert client.post("/ask_batch", json={"questions": ["q"]}, headers=headers).status_code == 429
+
+
+class TestAdminRetrievalSettings:
+    @pytest.fixture(autouse=True)
+    def admin_key(self, monkeypatch):
+        import app.retrieval_settings as rs
+
+        monkeypatch.setattr(rs, "_current", rs.RetrievalSettings())
+        monkeypatch.setattr(rs, "_version", 0)
+        monkeypatch.setattr(main, "ADMIN_API_KEY", "s3cret")
+
+    def test_requires_admin_key(self, client):
+        assert client.get("/admin/retrieval_settings").status_code == 403
+        r = client.put("/admin/retrieval_settings", json={"k": 5}, headers={"X-Admin-Key": "wrong"})
+        assert r.status_code == 403
+
+    def test_update_applies_to_answers(self, client, headers, monkeypatch):
+        r = client.put("/admin/retrieval_settings", json={"top_n": 2}, headers={"X-Admin-Key": "s3cret"})
+        assert r.status_code == 200
+        assert r.json()["top_n"] == 2
+
+        monkeypatch.setattr(main, "search_weaviate", lambda *a, **k: [{"text": f"t{i}", "chunk_index": i} for i in range(5)])
+        monkeypatch.setattr(main, "rerank_chunks_with_llm", lambda q, docs: docs)
+        monkeypatch.setattr(main, "generate_answer", lambda q, docs, model=None: "a")
+        body = client.post("/ask_question", data={"query": "q", "include_retrieved_docs": "false"}, headers=headers).json()
+        assert len(body["reranked_docs"]) == 2
+
+    def test_profiles_the_next_requests(self, client):
+        admin = {"X-Admin-Key": "s3cret"}
+        assert client.post("/admin/profile", json={"requests": 2}).status_code == 403
+        assert client.post("/admin/profile", json={"requests": 0}, headers=admin).status_code == 400
+
+        r = client.post("/admin/profile", json={"requests": 2, "interval_ms": 1}, headers=admin)
+        assert r.json()["status"] == "armed"
+        for _ in range(3):
+            client.get("/")
+        status = client.get("/admin/profile", headers=admin).json()
+        assert status["requests_profiled"] == 2 and status["requests_remaining"] == 0
+        folded = client.get("/admin/profile", params={"folded": "true"}, headers=admin)
+        assert folded.headers["content-type"].startswith("text/plain")
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in folded.text.splitlines())
+
+    def test_invalid_values_rejected(self, client):
+        r = client.put("/admin/retrieval_settings", json={"alpha": 2}, headers={"X-Admin-Key": "s3cret"})
+        assert r.status_code == 400
+
+
+class TestAdmissionControl:
+    def test_overload_returns_503_with_retry_after(self, client, headers, monkeypatch):
+        def overloaded(*a, **k):
+            raise main.Overloaded("generate", "queue full", retry_after=7)
+
+        monkeypatch.setattr(main, "search_weaviate", lambda *a, **k: [{"text": "t", "chunk_index": 0, "score": 1}])
+        monkeypatch.setattr(main, "answer_from_retrieved", overloaded)
+        r = client.post("/ask_question", data={"query": "q"}, headers=headers)
+        assert r.status_code == 503
+        assert r.headers["retry-after"] == "7"
+
+    def test_metrics_exports_stage_queues(self, client):
+        body = client.get("/metrics").json()
+        assert {"expand", "embed", "rerank", "generate"} <= set(body["admission"])
+        assert "queue_depth" in body["admission"]["generate"]
+        assert "shed" in body["admission"]["rerank"]
@@ -0,0 +1,67 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+import app.migrate as migrate
+
+
+def make_client(source_objects, target_hashes=()):
+    src, dst = MagicMock(), MagicMock()
+    src.iterator.return_value = [MagicMock(properties=p) for p in source_objects]
+    dst.data.insert_many.return_value = MagicMock(errors=None)
+    client = MagicMock()
+    client.collections.get.side_effect = lambda name: src if name == "Old" else dst
+    return client, src, dst
+
+
+class TestMigrateCollection:
+    def test_reembeds_with_requested_dimensions(self, monkeypatch):
+        calls = []
+
+        def fake_embed(texts, dimensions=None):
+            calls.append((list(texts), dimensions))
+            return [[0.0] * dimensions for _ in texts]
+
+        monkeypatch.setattr(migrate, "embed_texts", fake_embed)
+        monkeypatch.setattr(migrate, "ensure_schema", MagicMock())
+        monkeypatch.setattr(migrate, "fetch_existing_hashes", lambda col, hashes: set())
+        objects = [
+            {"text": f"chunk {i}", "content_hash": f"h{i}", "chunk_index": i, "page_start": None}
+            for i in range(5)
+        ]
+        client, _, dst = make_client(objects)
+
+        stats = migrate.migrate_collection(client, "Old", "New", dimensions=256, compression="rq", batch_size=2)
+
+        assert stats == {"migrated": 5, "skipped_existing": 0}
+        assert [len(texts) for texts, _ in calls] == [2, 2, 1]
+        assert all(dims == 256 for _, dims in calls)
+        migrate.ensure_schema.assert_called_once_with(client, name="New", compression="rq", dimensions=256)
+        inserted = [o for c in dst.data.insert_many.call_args_list for o in c.args[0]]
+        assert len(inserted[0].vector) == 256
+        assert "page_start" not in inserted[0].properties  # nulls are not copied
+
+    def test_resumes_by_skipping_hashes_already_in_target(self, monkeypatch):
+        monkeypatch.setattr(migrate, "embed_texts", lambda texts, dimensions=None: [[0.0] for _ in texts])
+        monkeypatch.setattr(migrate, "ensure_schema", MagicMock())
+        monkeypatch.setattr(migrate, "fetch_existing_hashes", lambda col, hashes: {"h0"})
+        client, _, _ = make_client([{"text": "a", "content_hash": "h0"}, {"text": "b", "content_hash": "h1"}])
+
+        stats = migrate.migrate_collection(client, "Old", "New")
+
+        assert stats == {"migrated": 1, "skipped_existing": 1}
+
+    def test_refuses_a_target_with_other_vector_sizes(self, monkeypatch):
+        monkeypatch.setattr(migrate, "embed_texts", lambda texts, dimensions=None: [[0.0] * 256 for _ in texts])
+        monkeypatch.setattr(migrate, "ensure_schema", MagicMock())
+        monkeypatch.setattr(migrate, "fetch_existing_hashes", lambda col, hashes: set())
+        client, _, dst = make_client([{"text": "a", "content_hash": "h0"}])
+        dst.query.fetch_objects.return_value.objects = [MagicMock(vector={"default": [0.0] * 1536})]
+
+        with pytest.raises(ValueError, match="1536"):
+            migrate.migrate_collection(client, "Old", "New", dimensions=256)
+        dst.data.insert_many.assert_not_called()
+
+    def test_source_and_target_must_differ(self):
+        with pytest.raises(ValueError):
+            migrate.migrate_collection(MagicMock(), "Same", "Same")
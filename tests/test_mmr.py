@@ -0,0 +1,45 @@
+import numpy as np
+
+import app.mmr as mmr
+
+
+def vectors():
+    rng = np.random.default_rng(0)
+    query = rng.normal(size=64)
+    passage = query + rng.normal(scale=0.3, size=64)
+    # three near-identical overlaps of the same passage, then two other relevant docs
+    docs = [passage + rng.normal(scale=0.01, size=64) for _ in range(3)]
+    docs += [query + rng.normal(scale=0.8, size=64) for _ in range(2)]
+    return query, np.array(docs)
+
+
+class TestMmrSelect:
+    def test_skips_overlapping_neighbours(self):
+        query, docs = vectors()
+        picked = mmr.mmr_select(query, docs, k=3, lambda_mult=0.5)
+        assert len(set(picked) & {0, 1, 2}) == 1
+        assert {3, 4} <= set(picked)
+
+    def test_lambda_one_is_relevance_order(self):
+        rng = np.random.default_rng(1)
+        query, docs = rng.normal(size=64), rng.normal(size=(8, 64))
+        relevance = (docs / np.linalg.norm(docs, axis=1, keepdims=True)) @ (query / np.linalg.norm(query))
+        picked = mmr.mmr_select(query, docs, k=5, lambda_mult=1.0)
+        assert picked == [int(i) for i in np.argsort(-relevance)[:5]]
+
+    def test_fewer_candidates_than_k(self):
+        query, docs = vectors()
+        assert mmr.mmr_select(query, docs[:2], k=10) == [0, 1]
+
+
+class TestDiversify:
+    def test_strips_vectors_and_keeps_dicts(self):
+        query, docs = vectors()
+        hits = [{"text": f"t{i}", "vector": v.tolist()} for i, v in enumerate(docs)]
+        out = mmr.diversify(hits, query, k=3, lambda_mult=0.5)
+        assert len(out) == 3
+        assert all("vector" not in d for d in out)
+
+    def test_without_vectors_returns_docs_unchanged(self):
+        hits = [{"text": "a"}, {"text": "b", "vector": [1.0, 0.0]}]
+        assert mmr.diversify(hits, [1.0, 0.0], k=1) == [{"text": "a"}, {"text": "b"}]
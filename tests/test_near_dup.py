@@ -0,0 +1,58 @@
+import numpy as np
+
+import app.near_dup as nd
+
+POLICY = (
+    "Staff who are unwell must inform the Deputy Head before 7:30am on the first day "
+    "of absence and provide a medical certificate for absences longer than three days. "
+    "Cover work should be emailed to the cover manager by 8am."
+)
+
+
+class TestMinHash:
+    def test_ignores_whitespace_case_and_numbers(self):
+        revised = POLICY.replace("7:30am", "7:45am").replace("8am", "9am").upper().replace(" ", "  \n")
+        assert nd.similarity(nd.minhash(POLICY), nd.minhash(revised)) == 1.0
+
+    def test_small_edits_stay_similar_unrelated_text_does_not(self):
+        edited = POLICY + " Page footer: Staff Handbook."
+        assert nd.similarity(nd.minhash(POLICY), nd.minhash(edited)) >= nd.NEAR_DUP_THRESHOLD
+        other = "Lunch duty rota is posted weekly in the staff room by each head of year."
+        assert nd.similarity(nd.minhash(POLICY), nd.minhash(other)) < 0.2
+
+    def test_signature_is_stable(self):
+        # signatures are persisted, so they must not depend on the process
+        sig = nd.minhash(POLICY)
+        assert sig.shape == (nd.NUM_PERM,)
+        assert np.array_equal(sig, nd.minhash(POLICY))
+        assert len(nd.band_keys(sig)) == nd.BANDS
+
+    def test_figures_tell_revisions_apart(self):
+        revised = POLICY.replace("8am", "9am")
+        assert nd.figures(POLICY) == ("30", "7", "8") and nd.figures(revised) != nd.figures(POLICY)
+        index = nd.LSHIndex()
+        index.add("policy", nd.minhash(POLICY), nd.figures(POLICY))
+        assert index.query(nd.minhash(revised), nd.figures(revised)) is None
+        assert index.query(nd.minhash(POLICY), nd.figures(POLICY)) == "policy"
+
+    def test_empty_text(self):
+        assert nd.minhash("").shape == (nd.NUM_PERM,)
+
+
+class TestLSHIndex:
+    def test_finds_near_duplicate_only(self):
+        index = nd.LSHIndex()
+        index.add("policy", nd.minhash(POLICY))
+        index.add("lunch", nd.minhash("Lunch duty rota is posted weekly in the staff room."))
+        assert index.query(nd.minhash(POLICY + " Updated September.")) == "policy"
+        assert index.query(nd.minhash("Parents evening starts at 4pm in the main hall.")) is None
+
+    def test_only_compares_bucket_mates(self, monkeypatch):
+        index = nd.LSHIndex()
+        for i in range(200):
+            index.add(i, nd.minhash(f"unrelated paragraph number {i} " + "word%d " % i * 20))
+        compared = []
+        real = nd.similarity
+        monkeypatch.setattr(nd, "similarity", lambda a, b: compared.append(1) or real(a, b))
+        index.query(nd.minhash(POLICY))
+        assert len(compared) < 20
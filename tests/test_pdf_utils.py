@@ -1,11 +1,27 @@
+import io
+import tempfile
+
 import pytest
 
 from app.pdf_utils import (
     chunk_text,
     clean_extracted_text,
     extract_text_from_pdf,
+    iter_chunks,
+    iter_numbered_pdf_pages,
+    iter_pdf_pages,
     split_into_sentences,
+    text_looks_degraded,
 )
+import app.pdf_utils as pdf_utils
+from benchmarks.handbook_pdf import handbook_paragraphs, write_handbook_pdf
+
+
+@pytest.fixture
+def handbook_pdf(tmp_path):
+    path = tmp_path / "handbook.pdf"
+    write_handbook_pdf(path, pages=3)
+    return str(path)
 
 
 class TestCleanExtractedText:
@@ -74,3 +90,192 @@ class TestExtractTextFromPdf:
         bad.write_bytes(b"%PDF-1.4 this is not really a pdf at all")
         with pytest.raises(ValueError):
             extract_text_from_pdf(str(bad))
+
+
+class TestIterPdfPages:
+    def test_yields_one_cleaned_text_per_page(self, handbook_pdf):
+        pages = list(iter_pdf_pages(handbook_pdf))
+        assert len(pages) == 3
+        assert all(p and p == p.strip() for p in pages)
+
+    def test_extract_text_is_joined_pages(self, handbook_pdf):
+        assert extract_text_from_pdf(handbook_pdf) == "\n\n".join(iter_pdf_pages(handbook_pdf))
+
+    def test_enforces_max_pages(self, handbook_pdf):
+        with pytest.raises(ValueError, match="maximum allowed is 2"):
+            list(iter_pdf_pages(handbook_pdf, max_pages=2))
+
+    def test_releases_page_caches(self, handbook_pdf, monkeypatch):
+        import pdfplumber.page
+
+        closed = []
+        original_close = pdfplumber.page.Page.close
+        monkeypatch.setattr(
+            pdfplumber.page.Page, "close", lambda self: closed.append(self.page_number) or original_close(self)
+        )
+        pages = iter_pdf_pages(handbook_pdf, backend="pdfplumber")
+        next(pages)
+        assert closed == [1]  # first page released before the second is parsed
+
+
+class TestExtractionBackends:
+    def test_backends_agree_on_clean_pdf(self, handbook_pdf):
+        pdfium_pages = list(iter_pdf_pages(handbook_pdf, backend="pdfium"))
+        plumber_pages = list(iter_pdf_pages(handbook_pdf, backend="pdfplumber"))
+        assert pdfium_pages == plumber_pages
+
+    def test_unknown_backend(self, handbook_pdf):
+        with pytest.raises(ValueError, match="Unknown PDF extraction backend"):
+            list(iter_pdf_pages(handbook_pdf, backend="ocr"))
+
+    def test_degraded_detection(self):
+        assert not text_looks_degraded("Staff must inform their Deputy Head before 07:30. " * 3)
+        assert text_looks_degraded("StaffmustinformtheirDeputyHeadbefore07:30andbringanote." * 3)
+        assert text_looks_degraded("\u2022 12 34 56 78 90 %% ## $$ " * 4)
+        assert not text_looks_degraded("short")
+
+    def test_degraded_pdfium_page_falls_back_to_pdfplumber(self, handbook_pdf, monkeypatch):
+        monkeypatch.setattr(pdf_utils, "text_looks_degraded", lambda text: True)
+        pages = list(iter_pdf_pages(handbook_pdf, backend="pdfium"))
+        assert pages == list(iter_pdf_pages(handbook_pdf, backend="pdfplumber"))
+
+
+    def test_pdfium_handles_closed_when_extraction_fails(self, handbook_pdf, monkeypatch):
+        closed = []
+        for cls in (pdf_utils.pdfium.PdfTextPage, pdf_utils.pdfium.PdfPage):
+            original_close = cls.close
+            monkeypatch.setattr(cls, "close", lambda self, close=original_close, name=cls.__name__:
+                                closed.append(name) or close(self))
+
+        def fail(self, *args, **kwargs):
+            raise RuntimeError("broken text layer")
+
+        monkeypatch.setattr(pdf_utils.pdfium.PdfTextPage, "get_text_range", fail)
+        with pytest.raises(RuntimeError):
+            list(iter_pdf_pages(handbook_pdf, backend="pdfium"))
+        assert closed[:2] == ["PdfTextPage", "PdfPage"]
+
+    def test_pdfium_calls_are_serialised(self, handbook_pdf, monkeypatch):
+        original = pdf_utils.pdfium.PdfTextPage.get_text_range
+        held = []
+
+        def get_text_range(self, *args, **kwargs):
+            held.append(pdf_utils._pdfium_lock.locked())
+            return original(self, *args, **kwargs)
+
+        monkeypatch.setattr(pdf_utils.pdfium.PdfTextPage, "get_text_range", get_text_range)
+        pages = iter_pdf_pages(handbook_pdf, backend="pdfium")
+        next(pages)
+        assert held == [True]
+        assert not pdf_utils._pdfium_lock.locked()  # not held while the caller has the page
+        pages.close()
+
+    def test_fallback_that_cannot_open_the_pdf_is_a_value_error(self, handbook_pdf, monkeypatch):
+        monkeypatch.setattr(pdf_utils, "text_looks_degraded", lambda text: True)
+
+        def reject(*args, **kwargs):
+            raise RuntimeError("pdfminer rejects it")
+
+        monkeypatch.setattr(pdf_utils.pdfplumber, "open", reject)
+        with pytest.raises(ValueError, match="Could not read this PDF"):
+            list(iter_pdf_pages(handbook_pdf, backend="pdfium"))
+
+    @pytest.mark.parametrize("backend", ["pdfium", "pdfplumber"])
+    def test_reads_streams_in_place(self, handbook_pdf, backend):
+        with open(handbook_pdf, "rb") as f:
+            stream = io.BytesIO(f.read())
+        stream.seek(3)
+        pages = list(iter_pdf_pages(stream, backend=backend))
+        assert pages == list(iter_pdf_pages(handbook_pdf, backend=backend))
+
+    def test_stream_fallback_does_not_disturb_pdfium(self, handbook_pdf, monkeypatch):
+        monkeypatch.setattr(pdf_utils, "text_looks_degraded", lambda text: True)
+        with tempfile.SpooledTemporaryFile(max_size=1024) as spooled:  # spills to disk
+            with open(handbook_pdf, "rb") as f:
+                spooled.write(f.read())
+            pages = list(iter_pdf_pages(spooled, backend="pdfium"))
+        assert pages == list(iter_pdf_pages(handbook_pdf, backend="pdfplumber"))
+
+
+def reference_chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> list[str]:
+    """The original string-concatenation chunker, kept as an oracle."""
+    import re
+
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+    units: list[str] = []
+    for para in paragraphs:
+        if len(para) <= chunk_size:
+            units.append(para)
+        else:
+            current = ""
+            for sent in split_into_sentences(para):
+                if not current:
+                    current = sent
+                elif len(current) + 1 + len(sent) <= chunk_size:
+                    current += " " + sent
+                else:
+                    units.append(current.strip())
+                    current = sent
+            if current:
+                units.append(current.strip())
+
+    chunks: list[str] = []
+    current = ""
+    for unit in units:
+        if not current:
+            current = unit
+        elif len(current) + 2 + len(unit) <= chunk_size:
+            current += "\n\n" + unit
+        else:
+            chunks.append(current.strip())
+            tail = current[-overlap:].strip()
+            current = (tail + "\n\n" + unit).strip() if tail else unit
+    if current:
+        chunks.append(current.strip())
+    return chunks
+
+
+def sample_pages(n_pages: int = 6) -> list[str]:
+    paragraphs = handbook_paragraphs(n_pages * 4, seed=1)
+    pages = []
+    for i in range(n_pages):
+        body = paragraphs[i * 4:(i + 1) * 4]
+        # one oversized paragraph per page, with ragged whitespace
+        body.append("  \t".join(paragraphs[i * 4:(i + 1) * 4]).replace(". ", ".\n  "))
+        pages.append("\n\n \n".join(body))
+    return pages
+
+
+class TestIterChunks:
+    @pytest.mark.parametrize("chunk_size,overlap", [(1000, 200), (300, 50), (120, 100)])
+    def test_matches_reference_chunker_without_provenance(self, chunk_size, overlap):
+        pages = sample_pages()
+        expected = reference_chunk_text("\n\n".join(pages), chunk_size, overlap)
+        chunks = list(iter_chunks(enumerate(pages, 1), chunk_size, overlap, provenance=False))
+        assert chunks == expected
+        assert chunk_text("\n\n".join(pages), chunk_size, overlap) == expected
+
+    def test_provenance_points_into_joined_document(self):
+        pages = sample_pages()
+        document = "\n\n".join(pages)
+        page_bounds = []
+        offset = 0
+        for page in pages:
+            page_bounds.append((offset, offset + len(page)))
+            offset += len(page) + 2
+
+        chunks = list(iter_chunks(enumerate(pages, 1), 300, 50))
+        assert [c["text"] for c in chunks] == reference_chunk_text(document, 300, 50)
+        for c in chunks:
+            assert 0 <= c["char_start"] < c["char_end"] <= len(document)
+            assert 1 <= c["page_start"] <= c["page_end"] <= len(pages)
+            start, end = page_bounds[c["page_start"] - 1]
+            assert start <= c["char_start"] < end
+            # the chunk's last words come from the end of its source span
+            assert document[:c["char_end"]].split()[-1] == c["text"].split()[-1]
+
+    def test_pages_follow_source_page_numbers(self, handbook_pdf):
+        chunks = list(iter_chunks(iter_numbered_pdf_pages(handbook_pdf)))
+        assert chunks[0]["page_start"] == 1
+        assert chunks[-1]["page_end"] == 3
+        assert [c["page_start"] for c in chunks] == sorted(c["page_start"] for c in chunks)
@@ -0,0 +1,41 @@
+import threading
+import time
+
+import pytest
+
+from app.profiler import StackSampler
+
+
+def busy(seconds: float) -> None:
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        sum(range(1000))
+
+
+class TestStackSampler:
+    def test_samples_only_the_armed_requests(self):
+        sampler = StackSampler()
+        assert sampler.request_started("/ask_question") is None  # disarmed: free
+
+        sampler.arm(1, interval=0.001)
+        assert sampler.request_started("/admin/profile") is None  # never profiles itself
+        finished = sampler.request_started("/ask_question")
+        worker = threading.Thread(target=busy, args=(0.2,), name="request-worker")
+        worker.start()
+        worker.join()
+        finished()
+        assert sampler.request_started("/ask_question") is None  # only the next N
+
+        snapshot = sampler.snapshot()
+        assert snapshot["status"] == "done" and snapshot["requests_profiled"] == 1
+        folded = sampler.folded()
+        line = next(line for line in folded.splitlines() if line.startswith("request-worker;"))
+        stack, count = line.rsplit(" ", 1)
+        assert "busy (test_profiler.py:" in stack and int(count) >= 1
+
+    def test_rejects_bad_arguments(self):
+        sampler = StackSampler()
+        with pytest.raises(ValueError):
+            sampler.arm(0)
+        with pytest.raises(ValueError):
+            sampler.arm(5, interval=10)
@@ -0,0 +1,57 @@
+import app.query_expansion as qe
+from app.shared_state import bump_index_generation
+
+
+class TestExpandQueryLocal:
+    def test_adds_hr_synonyms(self):
+        expanded = qe.expand_query_local("Who should I contact if I am sick?", qe.CorpusVocabulary())
+        assert expanded.startswith("Who should I contact if I am sick?")
+        assert "unwell" in expanded
+        assert "notify" in expanded
+
+    def test_multi_word_phrases_and_abbreviations(self):
+        expanded = qe.expand_query_local("Do I tell my line manager or HR?", qe.CorpusVocabulary())
+        assert "deputy head" in expanded
+        assert "human resources" in expanded
+
+    def test_unknown_query_returns_none(self):
+        assert qe.expand_query_local("xyzzy quux", qe.CorpusVocabulary()) is None
+        assert qe.expand_query_local("", qe.CorpusVocabulary()) is None
+
+    def test_corpus_vocabulary_limits_added_terms(self):
+        vocab = qe.CorpusVocabulary()
+        vocab.learn(["Staff who are unwell must inform the Deputy Head."])
+        # until every stored chunk has been read, nothing is filtered out
+        assert "illness" in qe.expand_query_local("What if I am sick?", vocab)
+        assert vocab.seed(iter(["Sickness is recorded by HR."]), batch_size=1) == 1
+        expanded = qe.expand_query_local("What if I am sick?", vocab)
+        assert "unwell" in expanded and "sickness" in expanded
+        assert "illness" not in expanded  # not used anywhere in the handbook
+
+    def test_stale_vocabulary_stops_filtering(self):
+        vocab = qe.CorpusVocabulary()
+        vocab.seed(["Staff who are unwell must inform the Deputy Head."])
+        assert "illness" not in qe.expand_query_local("What if I am sick?", vocab)
+        bump_index_generation()  # another worker indexed a handbook we haven't read
+        assert "illness" in qe.expand_query_local("What if I am sick?", vocab)
+
+    def test_mines_abbreviation_definitions(self):
+        vocab = qe.CorpusVocabulary()
+        vocab.learn(["Contact the Designated Safeguarding Lead (DSL) immediately."])
+        assert vocab.abbreviations["dsl"] == "designated safeguarding lead"
+        assert "designated safeguarding lead" in qe.expand_query_local("Who is the DSL?", vocab)
+
+
+class TestBuildSearchQueries:
+    def test_local_hit_skips_llm(self, monkeypatch):
+        monkeypatch.setattr(qe, "expand_query", lambda q: (_ for _ in ()).throw(AssertionError("LLM called")))
+        keyword, vector = qe.build_search_queries("Am I paid when sick?", mode="local")
+        assert "salary" in keyword
+        assert vector == "Am I paid when sick?"
+
+    def test_local_miss_falls_back_to_llm(self, monkeypatch):
+        monkeypatch.setattr(qe, "expand_query", lambda q: f"LLM({q})")
+        assert qe.build_search_queries("xyzzy", mode="local") == ("LLM(xyzzy)", "LLM(xyzzy)")
+
+    def test_off_uses_query_verbatim(self):
+        assert qe.build_search_queries("anything", mode="off") == ("anything", "anything")
@@ -0,0 +1,66 @@
+import json
+
+import app.query_log as query_log
+from app.jsonl_log import JsonlLog
+from app.query_log import hot_questions, log_query, warm_hot_set
+
+
+def ask(question: str, times: int = 1, tenant: str | None = None) -> None:
+    for _ in range(times):
+        log_query(question, tenant, None, True, 12.5, "An answer.", cached=False)
+
+
+class TestLog:
+    def test_lines_are_compact_and_hash_the_answer(self, query_log_file):
+        ask("  When do  staff meetings take place? ")
+        query_log_file.flush()
+        entry = json.loads(query_log_file.path.read_text())
+        assert entry["query"] == "When do staff meetings take place?"
+        assert entry["ms"] == 12.5 and entry["cached"] is False
+        assert len(entry["result"]) == 16 and "An answer" not in query_log_file.path.read_text()
+
+    def test_rotates_and_reads_across_files(self, tmp_path):
+        log = JsonlLog(tmp_path / "q.jsonl", max_bytes=200, backups=2)
+        for i in range(20):
+            log.write({"query": f"question {i}"})
+        log.flush()
+        assert [p.name for p in log.files()] == ["q.jsonl.2", "q.jsonl.1", "q.jsonl"]
+        queries = [e["query"] for e in log.entries()]
+        # the oldest lines rotated out; what is left is in order
+        assert queries == sorted(queries, key=lambda q: int(q.split()[1])) and queries[-1] == "question 19"
+
+    def test_workers_share_one_rotating_file(self, tmp_path):
+        # two workers appending to the same path, each rotating it in turn
+        workers = [JsonlLog(tmp_path / "q.jsonl", max_bytes=200, backups=200) for _ in range(2)]
+        for i in range(200):
+            workers[i % 2].write({"query": f"question {i}"})
+        for log in workers:
+            log.flush()
+        queries = [e["query"] for e in workers[0].entries()]
+        # every line survives: nobody wrote into, or renamed over, a backup
+        assert sorted(queries) == sorted(f"question {i}" for i in range(200))
+
+
+class TestHotSet:
+    def test_most_asked_first_case_folded(self, query_log_file):
+        ask("What is sick pay?", 2)
+        ask("what is sick pay?")
+        ask("Dress code?", 2)
+        ask("Dress code?", 1, tenant="acme")
+        query_log_file.flush()
+        hot = hot_questions(2)
+        assert [(h["query"], h["count"]) for h in hot] == [("What is sick pay?", 3), ("Dress code?", 2)]
+        assert hot[1]["tenant"] is None
+
+    def test_warms_expansion_and_embedding_caches_once(self, query_log_file, monkeypatch):
+        embedded = []
+        monkeypatch.setattr(query_log, "build_search_queries", lambda q: (q, f"vec {q}"))
+        monkeypatch.setattr(query_log, "embed_queries", lambda texts: embedded.append(texts))
+        ask("What is sick pay?", 3)
+        ask("Dress code?")
+        query_log_file.flush()
+
+        assert warm_hot_set() == 2
+        assert embedded == [["vec What is sick pay?", "vec Dress code?"]]
+        # another worker sharing the state finds the job claimed
+        assert warm_hot_set() == 0
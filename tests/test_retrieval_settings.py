@@ -0,0 +1,33 @@
+import pytest
+
+import app.retrieval_settings as rs
+
+
+@pytest.fixture(autouse=True)
+def restore_settings(monkeypatch):
+    monkeypatch.setattr(rs, "_current", rs.RetrievalSettings())
+    monkeypatch.setattr(rs, "_version", 0)
+
+
+class TestUpdateSettings:
+    def test_updates_only_given_fields(self):
+        updated = rs.update_settings(alpha=0.4, top_n=6)
+        assert (updated.alpha, updated.k, updated.top_n) == (0.4, 20, 6)
+        assert rs.current_settings() is updated
+
+    @pytest.mark.parametrize("changes", [
+        {"alpha": 1.5}, {"k": 0}, {"rerank_chars": rs.MAX_RERANK_CHARS + 1}, {"top_n": 30}, {"beta": 1},
+    ])
+    def test_rejects_invalid_changes_and_keeps_old_values(self, changes):
+        before = rs.current_settings()
+        with pytest.raises(ValueError):
+            rs.update_settings(**changes)
+        assert rs.current_settings() is before
+
+    def test_other_workers_pick_up_the_update(self, monkeypatch):
+        rs.update_settings(alpha=0.3)
+        # another worker: started with the env defaults, sharing the state
+        monkeypatch.setattr(rs, "_current", rs.RetrievalSettings())
+        monkeypatch.setattr(rs, "_version", 0)
+        assert rs.current_settings().alpha == 0.3
+        assert rs.update_settings(k=10).alpha == 0.3
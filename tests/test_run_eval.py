@@ -0,0 +1,125 @@
+import json
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import evals.run_eval as run_eval
+from evals.cassette import Cassette
+
+QA = [
+    {"question": "When are staff meetings?", "expected_phrases": ["every Wednesday"]},
+    {"question": "Who do I tell if I am sick?", "expected_phrases": ["Deputy Head"]},
+]
+DOCS = {
+    "When are staff meetings?": [{"id": "a", "score": 1.0, "text": "Lunch rota."},
+                                 {"id": "b", "score": 0.8, "text": "Staff meetings are every Wednesday."}],
+    "Who do I tell if I am sick?": [{"id": "c", "score": 1.0, "text": "Inform the Deputy Head."},
+                                    {"id": "d", "score": 0.3, "text": "Dress code."}],
+}
+
+
+def eval_args(**overrides):
+    args = dict(k=20, mmr=False, mmr_k=10, rerank=True, workers=4)
+    args.update(overrides)
+    return SimpleNamespace(**args)
+
+
+class TestRankingMetrics:
+    def test_reciprocal_rank(self):
+        assert run_eval.reciprocal_rank([0, 0, 1, 1]) == pytest.approx(1 / 3)
+        assert run_eval.reciprocal_rank([0, 0]) == 0.0
+
+    def test_ndcg(self):
+        assert run_eval.ndcg([1, 0, 0]) == 1.0
+        assert run_eval.ndcg([0, 1]) == pytest.approx(1 / run_eval.math.log2(3))
+        assert run_eval.ndcg([0, 0]) == 0.0
+
+
+class TestCassette:
+    def test_record_then_replay_offline(self, tmp_path):
+        path = tmp_path / "run.json"
+        recorder = Cassette(path, "record")
+        assert recorder.call("embed", ("q", None), lambda: [0.5])[0] == [0.5]
+        recorder.save()
+
+        player = Cassette(path, "replay")
+        result, ms = player.call("embed", ("q", None), lambda: pytest.fail("replay hit the network"))
+        assert result == [0.5]
+        assert ms >= 0
+        with pytest.raises(KeyError):
+            player.call("embed", ("other", None), lambda: None)
+
+    def test_path_required(self):
+        with pytest.raises(ValueError):
+            Cassette(None, "record")
+
+    def test_imports_without_an_api_key(self):
+        # a replay (or any importer) needs no OPENAI_API_KEY: the client is built on first use
+        env = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"}
+        subprocess.run([sys.executable, "-c", "import evals.run_eval"], env=env, cwd=run_eval.BASE_DIR,
+                       capture_output=True, text=True, check=True)
+
+
+class TestRunMode:
+    def _patch_live_calls(self, monkeypatch):
+        monkeypatch.setattr(run_eval, "build_search_queries", lambda q, mode=None: (q, q))
+        monkeypatch.setattr(run_eval, "embed_text", lambda text, dimensions=None: [float(len(text))])
+        monkeypatch.setattr(
+            run_eval, "hybrid_search",
+            lambda client, kw, vec, k=20, collection=None, mmr_k=None, alpha=None: [dict(d) for d in DOCS[kw]],
+        )
+        # reranker that reverses the order
+        monkeypatch.setattr(run_eval, "rerank_chunks_with_llm", lambda q, docs, max_chars=None: list(reversed(docs)))
+
+    def test_metrics_and_replay_match_recording(self, tmp_path, monkeypatch):
+        self._patch_live_calls(monkeypatch)
+        path = tmp_path / "cassette.json"
+        cassette = Cassette(path, "record")
+        recorded = run_eval.run_mode(run_eval.Services(None, cassette), QA, eval_args(), "local")
+        cassette.save()
+
+        assert recorded["metrics"]["hit@20"] == 1.0
+        assert recorded["metrics"]["mrr"] == pytest.approx(0.75)
+        assert recorded["metrics"]["rerank@4"] == 1.0
+        assert {"expand", "embed", "search", "rerank"} <= set(recorded["latency_ms"])
+
+        for name in ("build_search_queries", "embed_text", "hybrid_search", "rerank_chunks_with_llm"):
+            monkeypatch.setattr(run_eval, name, lambda *a, **k: pytest.fail("live call during replay"))
+        replayed = run_eval.run_mode(run_eval.Services(None, Cassette(path, "replay")), QA, eval_args(), "local")
+        assert replayed["metrics"] == recorded["metrics"]
+        assert replayed["latency_ms"] == recorded["latency_ms"]
+        json.dumps(replayed)  # the report is machine-readable as-is
+
+
+class TestAnswerTiers:
+    def test_each_tier_scored_and_routed(self, monkeypatch):
+        TestRunMode()._patch_live_calls(monkeypatch)
+        models = []
+
+        def fake_generate(question, docs, model=None):
+            models.append(model)
+            return "Tell the Deputy Head." if model == run_eval.FULL_ANSWER_MODEL else "Not sure."
+
+        monkeypatch.setattr(run_eval, "generate_answer", fake_generate)
+        result = run_eval.compare_answer_tiers(
+            run_eval.Services(None, Cassette()), QA, eval_args(expansion="local", workers=1)
+        )
+
+        tiers = result["tiers"]
+        # "Staff meetings are every Wednesday." answers the first question extractively
+        assert tiers["extractive"]["accuracy"] == 0.5
+        assert tiers["fast"]["accuracy"] == 0.0 and tiers["full"]["accuracy"] == 0.5
+        assert tiers["extractive"]["cost_per_1k_usd"] == 0.0
+        assert tiers["full"]["cost_per_1k_usd"] > tiers["fast"]["cost_per_1k_usd"] > 0
+        assert result["routed_mix"]["extractive"] == 1
+        assert tiers["routed"]["accuracy"] == 1.0
+        json.dumps(result)
+
+
+def test_answer_correct_accepts_paraphrase():
+    assert run_eval.answer_correct(["every Wednesday"], "Meetings are held every Wednesday.")
+    assert run_eval.answer_correct(["three members of staff"], "Three staff members are on duty.")
+    assert not run_eval.answer_correct(["three members of staff"], "Two teachers.")
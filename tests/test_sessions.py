@@ -0,0 +1,56 @@
+import app.sessions as sessions
+from app.sessions import follow_up_docs, load_session, record_turn, valid_session_id
+
+SID = "session-0123456789abcdef"
+SCOPE = ["PDFDocument", None]
+SICK_PAY = [{"id": "a", "text": "Staff receive full sick pay for up to 20 working days per year."}]
+
+
+def session_after(question: str = "What is the sick pay policy?", docs=SICK_PAY) -> dict:
+    record_turn(SID, load_session(SID), SCOPE, question, "Full pay for 20 days per year.", docs)
+    return load_session(SID)
+
+
+class TestFollowUps:
+    def test_covered_follow_up_reuses_the_last_turns_chunks(self):
+        session = session_after()
+        assert follow_up_docs(session, "And how many days is that?", SCOPE) == SICK_PAY
+        assert follow_up_docs(session, "Is that per year?", SCOPE) == SICK_PAY
+
+    def test_new_topics_and_new_scopes_go_through_retrieval(self):
+        session = session_after()
+        # not leaning on the previous turn
+        assert follow_up_docs(session, "What is the dress code?", SCOPE) is None
+        assert follow_up_docs(session, "Is there a dress code?", SCOPE) is None
+        # "working" is in the chunk, but neither follow-up is about the previous answer
+        assert follow_up_docs(session, "Then what are the working hours?", SCOPE) is None
+        assert follow_up_docs(session, "And what about working hours?", SCOPE) is None
+        # a follow-up the cached chunks don't cover
+        assert follow_up_docs(session, "What about maternity leave entitlement?", SCOPE) is None
+        assert follow_up_docs(session, "And how many days is that?", ["PDFDocument", "other.pdf"]) is None
+        assert follow_up_docs(load_session("x" * 16), "And how many days is that?", SCOPE) is None
+
+    def test_session_ids_must_be_unguessable(self):
+        assert valid_session_id(SID)
+        assert not valid_session_id("1")
+        assert not valid_session_id("../../" + "a" * 20)
+
+
+class TestCaps:
+    def test_keeps_the_latest_turns_only(self, monkeypatch):
+        monkeypatch.setattr(sessions, "SESSION_MAX_TURNS", 2)
+        for question in ("one?", "two?", "three?"):
+            session_after(question)
+        assert [t["question"] for t in load_session(SID)["turns"]] == ["two?", "three?"]
+
+    def test_oldest_chunks_dropped_past_the_memory_cap(self, monkeypatch):
+        monkeypatch.setattr(sessions, "SESSION_MAX_CONTEXT_CHARS", 150)
+        big = [{"id": "b", "text": "x" * 100}]
+        session_after("first?", big)
+        turns = session_after("second?", big)["turns"]
+        assert turns[0]["docs"] == [] and turns[1]["docs"] == big
+
+    def test_sessions_expire(self, monkeypatch):
+        monkeypatch.setattr(sessions, "SESSION_TTL_SECONDS", -1)
+        session_after()
+        assert load_session(SID) == {"turns": []}
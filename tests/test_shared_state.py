@@ -0,0 +1,112 @@
+import multiprocessing
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+import app.shared_state as shared_state
+from app.shared_state import MemoryState, SQLiteState
+
+
+def bump_many(path: str, n: int) -> None:
+    state = SQLiteState(path)
+    for _ in range(n):
+        state.incr("index_generation")
+
+
+class TestMemoryState:
+    def test_expired_entries_are_misses(self):
+        state = MemoryState()
+        state.set("answer", "k", {"answer": "yes"}, ttl=-1)
+        assert state.get("answer", "k") is None
+
+    def test_evicts_least_recently_used(self):
+        state = MemoryState(max_entries=2)
+        state.set("ns", "a", 1)
+        state.set("ns", "b", 2)
+        state.get("ns", "a")
+        state.set("ns", "c", 3)
+        assert state.get("ns", "b") is None
+        assert state.get("ns", "a") == 1 and state.get("ns", "c") == 3
+
+    def test_add_only_if_absent_or_expired(self):
+        state = MemoryState()
+        assert state.add("warming", "job", True, ttl=60)
+        assert not state.add("warming", "job", True, ttl=60)
+        state.set("warming", "old", True, ttl=-1)
+        assert state.add("warming", "old", True, ttl=60)
+
+
+class TestSQLiteState:
+    def test_values_are_visible_to_other_connections(self, tmp_path):
+        path = str(tmp_path / "state.db")
+        writer, reader = SQLiteState(path), SQLiteState(path)
+        writer.set("embedding", "k", [0.5, 0.25])
+        writer.set("answer", "old", "stale", ttl=-1)
+        assert reader.get("embedding", "k") == [0.5, 0.25]
+        assert reader.get("answer", "old") is None
+        assert reader.get("answer", "missing") is None
+
+    def test_counter_is_atomic_across_processes(self, tmp_path):
+        path = str(tmp_path / "state.db")
+        SQLiteState(path)
+        ctx = multiprocessing.get_context("spawn")
+        procs = [ctx.Process(target=bump_many, args=(path, 100)) for _ in range(4)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join(timeout=60)
+        assert SQLiteState(path).counter("index_generation") == 400
+
+    def test_settings_survive_cache_eviction(self, tmp_path):
+        path = str(tmp_path / "state.db")
+        writer, reader = SQLiteState(path, max_entries=1), SQLiteState(path)
+        writer.put_setting("retrieval", {"alpha": 0.3})
+        for i in range(300):  # cleanup of the overflowing cache runs now and then
+            writer.set("answer", str(i), i, ttl=-1)
+        assert reader.setting("retrieval") == {"alpha": 0.3}
+        assert reader.setting("missing") is None
+
+    def test_add_is_claimed_by_one_connection(self, tmp_path):
+        path = str(tmp_path / "state.db")
+        first, second = SQLiteState(path), SQLiteState(path)
+        assert first.add("warming", "faq:3", True, ttl=60)
+        assert not second.add("warming", "faq:3", True, ttl=60)
+        first.set("warming", "hot_set", True, ttl=-1)
+        assert second.add("warming", "hot_set", True, ttl=60)
+        assert first.get("warming", "hot_set") is True
+
+
+class TestSQLiteRateLimitStorage:
+    def test_one_limit_across_workers(self, tmp_path):
+        uri = f"sqlite:///{tmp_path / 'state.db'}"
+        workers = [FixedWindowRateLimiter(storage_from_string(uri)) for _ in range(3)]
+        limit = parse("5/minute")
+
+        allowed = [workers[i % 3].hit(limit, "10.0.0.1") for i in range(8)]
+
+        assert allowed == [True] * 5 + [False] * 3
+        assert workers[0].hit(limit, "10.0.0.2")
+        assert workers[1].get_window_stats(limit, "10.0.0.1").remaining == 0
+
+    def test_cost_is_charged_at_once(self, tmp_path):
+        limiter = FixedWindowRateLimiter(storage_from_string(f"sqlite:///{tmp_path / 'state.db'}"))
+        limit = parse("10/hour")
+        assert limiter.hit(limit, "ip", cost=7)
+        assert not limiter.hit(limit, "ip", cost=4)
+
+
+class TestCached:
+    def test_computes_once(self):
+        calls = []
+        for _ in range(3):
+            value = shared_state.cached("expansion", "k", lambda: calls.append(1) or "expanded")
+        assert value == "expanded" and len(calls) == 1
+
+    def test_keep_can_veto_storing(self):
+        shared_state.cached("expansion", "k", lambda: "query", keep=lambda v: v != "query")
+        assert shared_state.state.get("expansion", "k") is None
+
+    def test_index_generation(self):
+        start = shared_state.index_generation()
+        assert shared_state.bump_index_generation() == start + 1 == shared_state.index_generation()
@@ -0,0 +1,100 @@
+import json
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+import app.snapshot as snapshot
+
+
+def stored_objects(n, dims=3):
+    return [
+        MagicMock(
+            properties={"text": f"chunk {i}", "content_hash": f"h{i}", "chunk_index": i, "page_start": None},
+            vector={"default": [float(i)] * dims},
+        )
+        for i in range(n)
+    ]
+
+
+def make_target():
+    col = MagicMock()
+    col.data.insert_many.return_value = MagicMock(errors=None)
+    client = MagicMock()
+    client.collections.get.return_value = col
+    return client, col
+
+
+class TestExport:
+    def test_writes_parts_of_properties_and_vectors(self, tmp_path):
+        client = MagicMock()
+        client.collections.get.return_value.iterator.return_value = stored_objects(5)
+
+        stats = snapshot.export_collection(client, "PDFDocument", tmp_path, part_size=2)
+
+        assert stats["rows"] == 5 and stats["parts"] == 3
+        index = snapshot.read_index(tmp_path)
+        assert index["dimensions"] == 3
+        assert [p["rows"] for p in index["parts"]] == [2, 2, 1]
+        lines = (tmp_path / "part-00001.jsonl").read_text().splitlines()
+        assert [json.loads(line)["content_hash"] for line in lines] == ["h2", "h3"]
+        assert "page_start" not in json.loads(lines[0])  # nulls are not written
+        vectors = np.load(tmp_path / "part-00001.npy")
+        assert vectors.dtype == np.float32 and vectors.tolist() == [[2.0] * 3, [3.0] * 3]
+
+    def test_rejects_mixed_dimensions(self, tmp_path):
+        objects = stored_objects(2)
+        objects[1].vector = {"default": [1.0]}
+        client = MagicMock()
+        client.collections.get.return_value.iterator.return_value = objects
+
+        with pytest.raises(ValueError):
+            snapshot.export_collection(client, "PDFDocument", tmp_path)
+
+
+class TestImport:
+    @pytest.fixture
+    def exported(self, tmp_path):
+        client = MagicMock()
+        client.collections.get.return_value.iterator.return_value = stored_objects(7)
+        snapshot.export_collection(client, "PDFDocument", tmp_path, part_size=3)
+        return tmp_path
+
+    def test_round_trip_without_embedding(self, exported, monkeypatch):
+        ensure = MagicMock()
+        monkeypatch.setattr(snapshot, "ensure_schema", ensure)
+        monkeypatch.setattr(snapshot, "fetch_existing_hashes", lambda col, hashes: set())
+        client, col = make_target()
+
+        stats = snapshot.import_snapshot(client, exported, "Restored", batch_size=2, concurrency=3)
+
+        assert stats["imported"] == 7 and stats["skipped_existing"] == 0
+        assert stats["rows_per_s"] > 0
+        ensure.assert_called_once_with(client, name="Restored", compression=None, vector_size=3)
+        objects = sorted((o for c in col.data.insert_many.call_args_list for o in c.args[0]),
+                         key=lambda o: o.properties["chunk_index"])
+        assert [o.vector for o in objects] == [[float(i)] * 3 for i in range(7)]
+        assert objects[4].uuid == snapshot.object_uuid("h4")
+        assert max(len(c.args[0]) for c in col.data.insert_many.call_args_list) == 2
+
+    def test_skips_hashes_already_in_target(self, exported, monkeypatch):
+        monkeypatch.setattr(snapshot, "ensure_schema", MagicMock())
+        monkeypatch.setattr(snapshot, "fetch_existing_hashes",
+                            lambda col, hashes: {h for h in hashes if h in ("h0", "h5")})
+        client, col = make_target()
+
+        stats = snapshot.import_snapshot(client, exported, "Restored")
+
+        assert stats["imported"] == 5 and stats["skipped_existing"] == 2
+
+    def test_refuses_a_target_with_other_vector_sizes(self, exported, monkeypatch):
+        monkeypatch.setattr(snapshot, "ensure_schema", MagicMock())
+        client, col = make_target()
+        col.query.fetch_objects.return_value.objects = [MagicMock(vector={"default": [0.0] * 1536})]
+
+        with pytest.raises(ValueError, match="1536"):
+            snapshot.import_snapshot(client, exported, "Restored")
+        col.data.insert_many.assert_not_called()
+
+    def test_object_uuid_is_stable(self):
+        assert snapshot.object_uuid("abc") == snapshot.object_uuid("abc") != snapshot.object_uuid("abd")
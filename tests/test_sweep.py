@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+import evals.sweep as sweep
+from evals.cassette import Cassette
+from evals.run_eval import Services
+
+QA = [{"question": "When are staff meetings?", "expected_phrases": ["every Wednesday"]}]
+
+
+class TestParetoFront:
+    def test_drops_dominated_rows(self):
+        fast = {"hit": 0.8, "latency_ms": 100, "tokens": 900}
+        accurate = {"hit": 0.9, "latency_ms": 300, "tokens": 1500}
+        worse = {"hit": 0.8, "latency_ms": 150, "tokens": 900}
+        assert sweep.pareto_front([fast, accurate, worse]) == [fast, accurate]
+
+
+class TestSweep:
+    def test_embeds_once_and_searches_each_grid_point(self, monkeypatch):
+        embeds, searches = [], []
+        monkeypatch.setattr(sweep.run_eval, "build_search_queries", lambda q, mode=None: (q, q))
+        monkeypatch.setattr(sweep.run_eval, "embed_text", lambda t, dimensions=None: embeds.append(t) or [0.0])
+
+        def fake_search(client, kw, vec, k=20, collection=None, mmr_k=None, alpha=None):
+            searches.append((alpha, k))
+            docs = [{"id": str(i), "text": "filler"} for i in range(k)]
+            docs[int(alpha * 10)]["text"] = "Meetings are every Wednesday."
+            return docs
+
+        monkeypatch.setattr(sweep.run_eval, "hybrid_search", fake_search)
+        args = SimpleNamespace(alphas=[0.1, 0.5], ks=[10], rerank_chars=[200], top_n=[2, 6],
+                               rerank=False, expansion="local", workers=2)
+        rows = sweep.sweep(Services(None, Cassette()), QA, args)
+
+        assert embeds == ["When are staff meetings?"]
+        assert sorted(searches) == [(0.1, 10), (0.5, 10)]
+        hits = {(r["alpha"], r["top_n"]): r["hit"] for r in rows}
+        assert hits == {(0.1, 2): 1.0, (0.1, 6): 1.0, (0.5, 2): 0.0, (0.5, 6): 1.0}
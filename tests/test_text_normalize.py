@@ -0,0 +1,36 @@
+import random
+import re
+
+from app.text_normalize import CleaningRules, clean_text, normalize_whitespace
+
+
+def legacy_clean(text: str) -> str:
+    """The original four-pass cleaner, kept as an oracle."""
+    text = re.sub(r"(\w)-\n(\w)", r"\1\2", text)
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = re.sub(r"(?<=[a-z])(?=[A-Z])", " ", text)
+    return text.strip()
+
+
+class TestCleanText:
+    def test_matches_legacy_cleaner_on_random_layouts(self):
+        rng = random.Random(0)
+        alphabet = ["a", "b", "Z", "Q", "1", "-", " ", " ", "\t", "\n", "\n", ".", "é"]
+        for _ in range(2000):
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+            assert clean_text(text) == legacy_clean(text), repr(text)
+
+    def test_camel_case_split_can_be_disabled(self):
+        assert clean_text("Log in to PowerSchool") == "Log in to Power School"
+        rules = CleaningRules(split_camel_case=False)
+        assert clean_text("Log in to PowerSchool", rules) == "Log in to PowerSchool"
+
+    def test_rules_are_independent(self):
+        text = "holi-\nday  entitlement\n\n\n\nnext"
+        assert clean_text(text, CleaningRules(join_hyphenated=False)) == "holi-\nday entitlement\n\nnext"
+        assert clean_text(text, CleaningRules(collapse_spaces=False)) == "holiday  entitlement\n\nnext"
+        assert clean_text(text, CleaningRules(squeeze_blank_lines=False)) == "holiday entitlement\n\n\n\nnext"
+
+    def test_normalize_whitespace(self):
+        assert normalize_whitespace("  a \n\t b  ") == "a b"
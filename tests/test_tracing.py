@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.tracing import current_trace_id, record_usage, span, trace
+
+
+def spans(trace_file) -> dict:
+    trace_file.flush()
+    return {s["name"]: s for s in trace_file.entries()}
+
+
+class TestSpans:
+    def test_nested_spans_share_the_trace_and_link_to_parents(self, trace_file):
+        with trace("request", trace_id="abcdef0123456789") as root:
+            assert current_trace_id() == "abcdef0123456789"
+            with span("search", k=20) as s:
+                with span("openai.embed"):
+                    response = SimpleNamespace(usage=SimpleNamespace(prompt_tokens=7, total_tokens=7))
+                    record_usage(response, inputs=1)
+                s.set(hits=3)
+            root.set(status=200)
+
+        by_name = spans(trace_file)
+        assert {s["trace"] for s in by_name.values()} == {"abcdef0123456789"}
+        assert by_name["request"]["parent"] is None
+        assert by_name["search"]["parent"] == by_name["request"]["span"]
+        assert by_name["openai.embed"]["parent"] == by_name["search"]["span"]
+        assert by_name["search"]["attrs"] == {"k": 20, "hits": 3}
+        assert by_name["openai.embed"]["attrs"]["prompt_tokens"] == 7
+        assert by_name["request"]["ms"] >= by_name["search"]["ms"] >= 0
+
+    def test_failures_are_recorded_and_reraised(self, trace_file):
+        with pytest.raises(TimeoutError):
+            with trace("request"), span("weaviate.hybrid"):
+                raise TimeoutError
+        assert spans(trace_file)["weaviate.hybrid"]["attrs"]["error"] == "TimeoutError"
+
+    def test_untraced_work_writes_nothing(self, trace_file):
+        with span("ingest") as s:
+            s.set(chunks=3)
+        assert current_trace_id() is None
+        assert spans(trace_file) == {}
+
+    def test_invalid_incoming_ids_are_replaced(self):
+        with trace("request", trace_id="not a trace id\n"):
+            assert len(current_trace_id()) == 16
@@ -1,14 +1,16 @@
 import hashlib
+import time
 from unittest.mock import MagicMock
 
 import app.weaviate_utils as wu
+from app.shared_state import bump_index_generation
 
 
 def make_col_with_hashes(stored_hashes):
     """Mock collection whose fetch_objects returns objects for hashes that 'exist'."""
     col = MagicMock()
 
-    def fetch_objects(filters=None, limit=None, return_properties=None):
+    def fetch_objects(filters=None, limit=None, offset=None, return_properties=None):
         res = MagicMock()
         # contains_any filter value is the batch of hashes queried
         queried = filters.value if hasattr(filters, "value") else stored_hashes
@@ -71,6 +73,23 @@ class TestInsertChunks:
         assert result["inserted"] == 2
         assert result["skipped_existing"] == 0
 
+    def test_slow_insert_is_not_abandoned_at_the_deadline(self, monkeypatch):
+        from app.deadline import request_deadline
+        from app.shared_state import index_generation
+
+        monkeypatch.setattr(wu, "embed_texts", self._fake_embed)
+        col = MagicMock()
+
+        def slow_insert(objects):
+            time.sleep(0.1)
+            return MagicMock(errors=None)
+
+        col.data.insert_many.side_effect = slow_insert
+        with request_deadline(0.02, "upload"):
+            assert wu.write_objects(col, [{"text": "a"}]) == 1
+        # the write finished in this request, so cached answers were retired
+        assert index_generation() == 1
+
     def test_skips_chunks_already_in_db(self, monkeypatch):
         monkeypatch.setattr(wu, "embed_texts", self._fake_embed)
         col = make_col_with_hashes({wu.chunk_hash("existing")})
@@ -92,8 +111,339 @@ class TestInsertChunks:
         assert called == []
         col.data.insert_many.assert_not_called()
 
+    def test_stores_chunk_provenance(self, monkeypatch):
+        monkeypatch.setattr(wu, "embed_texts", self._fake_embed)
+        col = make_col_with_hashes(set())
+        col.data.insert_many.return_value = MagicMock(errors=None)
+        chunk = {"text": "holiday policy", "page_start": 2, "page_end": 3, "char_start": 10, "char_end": 24}
+
+        wu.insert_chunks(self._client(col), [chunk, "plain text chunk"], "doc.pdf")
+
+        objects = col.data.insert_many.call_args[0][0]
+        assert objects[0].properties["page_start"] == 2
+        assert objects[0].properties["char_end"] == 24
+        assert objects[0].properties["text"] == "holiday policy"
+        assert "page_start" not in objects[1].properties
+
+    def test_stores_snippet(self, monkeypatch):
+        monkeypatch.setattr(wu, "embed_texts", self._fake_embed)
+        col = make_col_with_hashes(set())
+        col.data.insert_many.return_value = MagicMock(errors=None)
+
+        wu.insert_chunks(self._client(col), ["y" * 1000], "doc.pdf")
+
+        assert col.data.insert_many.call_args[0][0][0].properties["snippet"] == "y" * wu.SNIPPET_CHARS
+
+    def test_skips_near_duplicates_within_upload(self, monkeypatch):
+        monkeypatch.setattr(wu, "embed_texts", self._fake_embed)
+        monkeypatch.setattr(wu, "NEAR_DUP_ACTION", "skip")
+        col = make_col_with_hashes(set())
+        col.data.insert_many.return_value = MagicMock(errors=None)
+        text = "Staff who are unwell must inform the Deputy Head before 7:30am on the first day of absence."
+
+        result = wu.insert_chunks(self._client(col), [text, text.upper() + "  "], "doc.pdf")
+
+        assert result["inserted"] == 1
+        assert result["near_duplicates"] == 1
+        props = col.data.insert_many.call_args[0][0][0].properties
+        assert len(props["minhash"]) == wu.minhash("x").size
+        assert len(props["lsh_bands"]) == len(wu.band_keys(wu.minhash("x")))
+
+    def test_revised_figures_are_not_near_duplicates(self, monkeypatch):
+        monkeypatch.setattr(wu, "embed_texts", self._fake_embed)
+        monkeypatch.setattr(wu, "NEAR_DUP_ACTION", "skip")
+        col = make_col_with_hashes(set())
+        col.data.insert_many.return_value = MagicMock(errors=None)
+        text = "Staff who are unwell must inform the Deputy Head before 7:30am on the first day of absence."
+
+        result = wu.insert_chunks(self._client(col), [text, text.replace("7:30", "7:45")], "doc.pdf")
+
+        assert result["inserted"] == 2 and result["near_duplicates"] == 0
+
+    def test_links_near_duplicates_of_stored_chunks(self, monkeypatch):
+        monkeypatch.setattr(wu, "embed_texts", self._fake_embed)
+        monkeypatch.setattr(wu, "NEAR_DUP_ACTION", "link")
+        stored = "Holiday requests go to the Head of Department two weeks in advance, 2023 edition."
+        col = MagicMock()
+        col.data.insert_many.return_value = MagicMock(errors=None)
+        pages = []
+
+        def fetch_objects(filters=None, limit=None, offset=None, return_properties=None):
+            res = MagicMock()
+            res.objects = []
+            if "minhash" in return_properties:
+                pages.append(offset)
+                # a full first page (unrelated chunks), then the stored chunk
+                res.objects = [MagicMock(properties={
+                    "content_hash": "canon", "minhash": wu.minhash(stored).tolist(), "duplicate_of": None,
+                    "text": stored,
+                })] if offset else [MagicMock(properties={"minhash": None})] * limit
+            return res
+
+        col.query.fetch_objects.side_effect = fetch_objects
+        result = wu.insert_chunks(self._client(col), [stored.replace("edition", "Edition.")], "doc.pdf")
+
+        assert result == {"inserted": 1, "skipped_existing": 0, "unique_in_upload": 1, "near_duplicates": 1}
+        assert col.data.insert_many.call_args[0][0][0].properties["duplicate_of"] == "canon"
+        assert pages == [0, 100]
+
+        # the same chunk with a changed figure is new content
+        result = wu.insert_chunks(self._client(col), [stored.replace("2023", "2024")], "doc.pdf")
+        assert result["near_duplicates"] == 0
+
     def test_empty_chunks_raises(self):
         import pytest
 
         with pytest.raises(ValueError):
             wu.insert_chunks(MagicMock(), [], "doc.pdf")
+
+
+class TestLearnCorpusVocabulary:
+    def test_reads_every_stored_chunk_once(self, monkeypatch):
+        vocab = wu.corpus_vocabulary.__class__()
+        monkeypatch.setattr(wu, "corpus_vocabulary", vocab)
+        client = MagicMock()
+        client.collections.list_all.return_value = {wu.COLLECTION: None, f"{wu.COLLECTION}_science": None,
+                                                    "Unrelated": None}
+        stored = {wu.COLLECTION: ["Staff who are unwell."], f"{wu.COLLECTION}_science": ["Lab safety."]}
+        client.collections.get.side_effect = lambda name: MagicMock(iterator=lambda return_properties: [
+            MagicMock(properties={"text": t}) for t in stored[name]
+        ])
+
+        assert wu.learn_corpus_vocabulary(client) == 2
+        assert vocab.complete and "unwell" in vocab and "lab" in vocab
+        assert wu.learn_corpus_vocabulary(client) == 0  # reconnects don't re-read
+        # another worker indexed chunks: the vocabulary is stale until re-read
+        bump_index_generation()
+        assert not vocab.current()
+        assert wu.learn_corpus_vocabulary(client) == 2 and vocab.current()
+
+
+class TestEnsureSchema:
+    def test_adds_missing_properties_to_existing_collection(self):
+        client = MagicMock()
+        client.collections.exists.return_value = True
+        col = client.collections.get.return_value
+        existing = []
+        for name in ("text", "chunk_index", "document_name", "content_hash"):
+            prop = MagicMock()
+            prop.name = name  # `name` is reserved in the MagicMock constructor
+            existing.append(prop)
+        col.config.get.return_value.properties = existing
+
+        wu.ensure_schema(client)
+
+        added = [c.args[0].name for c in col.config.add_property.call_args_list]
+        assert added == ["page_start", "page_end", "char_start", "char_end", "snippet",
+                         "minhash", "lsh_bands", "duplicate_of"]
+        client.collections.create.assert_not_called()
+
+    def test_creates_collection_with_compression(self, monkeypatch):
+        monkeypatch.setattr(wu, "embed_text", lambda text, dimensions=None: [0.0] * (dimensions or 1536))
+        client = MagicMock()
+        client.collections.exists.return_value = False
+
+        wu.ensure_schema(client, name="PDFDocument_512", compression="rq", dimensions=512)
+
+        kwargs = client.collections.create.call_args.kwargs
+        assert kwargs["name"] == "PDFDocument_512"
+        assert kwargs["vector_config"].vectorIndexConfig.quantizer is not None
+
+    def test_known_vector_size_skips_the_embeddings_call(self, monkeypatch):
+        embed = MagicMock()
+        monkeypatch.setattr(wu, "embed_text", embed)
+        client = MagicMock()
+        client.collections.exists.return_value = False
+
+        wu.ensure_schema(client, name="Restored", vector_size=3)
+
+        embed.assert_not_called()
+        client.collections.create.assert_called_once()
+
+    def test_rejects_unknown_compression(self):
+        client = MagicMock()
+        client.collections.exists.return_value = False
+        import pytest
+
+        with pytest.raises(ValueError):
+            wu.ensure_schema(client, compression="zip")
+
+
+class TestBackgroundConnection:
+    def test_retries_with_backoff_until_connected(self):
+        client = MagicMock()
+        attempts = iter([RuntimeError("dns"), RuntimeError("timeout"), client])
+
+        def connect():
+            result = next(attempts)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        on_connect = MagicMock()
+        conn = wu.BackgroundConnection(connect, on_connect, min_backoff=0.001, check_interval=60).start()
+        try:
+            assert conn.wait_ready(timeout=5)
+            assert conn.client is client
+            assert conn.status() == {"state": "connected", "attempts": 3, "last_error": None}
+            on_connect.assert_called_once_with(client)
+        finally:
+            conn.close()
+        client.close.assert_called_once()
+        assert conn.state == "closed" and conn.client is None
+
+    def test_closes_the_client_when_on_connect_fails(self):
+        first, second = MagicMock(), MagicMock()
+        clients = iter([first, second])
+        on_connect = MagicMock(side_effect=[RuntimeError("schema"), None])
+        conn = wu.BackgroundConnection(lambda: next(clients), on_connect, min_backoff=0.001,
+                                       check_interval=60).start()
+        try:
+            assert conn.wait_ready(timeout=5)
+            assert conn.client is second
+            first.close.assert_called_once()
+        finally:
+            conn.close()
+
+    def test_replaces_a_client_that_stops_being_ready(self):
+        dead, fresh = MagicMock(), MagicMock()
+        dead.is_ready.return_value = False
+        fresh.is_ready.return_value = True
+        clients = iter([dead, fresh])
+        conn = wu.BackgroundConnection(lambda: next(clients), min_backoff=0.001, check_interval=0.001).start()
+        try:
+            for _ in range(500):
+                if conn.client is fresh:
+                    break
+                time.sleep(0.01)
+            assert conn.client is fresh
+            dead.close.assert_called_once()
+        finally:
+            conn.close()
+
+
+class TestTenantCollections:
+    def test_collection_name(self):
+        assert wu.collection_name(None) == wu.COLLECTION
+        assert wu.collection_name("Science") == f"{wu.COLLECTION}_science"
+
+    def test_rejects_unsafe_tenant_names(self):
+        import pytest
+
+        for bad in ("a-b", "../x", "x" * 49, "two words"):
+            with pytest.raises(ValueError):
+                wu.collection_name(bad)
+
+    def test_search_side_does_not_create_collections(self, monkeypatch):
+        monkeypatch.setattr(wu, "_ready_collections", set())
+        client = MagicMock()
+        client.collections.exists.return_value = False
+        assert wu.tenant_collection(client, "history") is None
+        client.collections.create.assert_not_called()
+
+    def test_upload_side_creates_once(self, monkeypatch):
+        monkeypatch.setattr(wu, "_ready_collections", set())
+        created = []
+        monkeypatch.setattr(wu, "ensure_schema", lambda client, name=None: created.append(name))
+        client = MagicMock()
+        for _ in range(3):
+            assert wu.tenant_collection(client, "history", create=True) == f"{wu.COLLECTION}_history"
+        assert created == [f"{wu.COLLECTION}_history"]
+
+
+U1 = "00000000-0000-0000-0000-000000000001"
+U2 = "00000000-0000-0000-0000-000000000002"
+
+
+def make_obj(uuid, **properties):
+    obj = MagicMock(uuid=uuid, properties=properties)
+    obj.metadata.score = 0.5
+    return obj
+
+
+class TestHybridSearch:
+    def _client(self, objects=None):
+        client = MagicMock()
+        objects = objects or [make_obj("u1", text="t", chunk_index=0, document_name="a.pdf")]
+        client.collections.get.return_value.query.hybrid.return_value.objects = objects
+        return client
+
+    def test_document_filter_and_name_returned(self):
+        client = self._client()
+        docs = wu.hybrid_search(client, "q", [0.0], document_name="a.pdf", collection="PDFDocument_x")
+        client.collections.get.assert_called_with("PDFDocument_x")
+        kwargs = client.collections.get.return_value.query.hybrid.call_args.kwargs
+        assert kwargs["filters"] is not None
+        assert docs[0]["document_name"] == "a.pdf"
+
+    def test_document_names_match_exactly(self):
+        assert next(p for p in wu.PROPERTIES if p.name == "document_name").tokenization == wu.Tokenization.FIELD
+        # a word-tokenized legacy collection also returns other files sharing a word
+        client = self._client([
+            make_obj("u1", text="a", document_name="staff-handbook.pdf"),
+            make_obj("u2", text="b", document_name="handbook.pdf"),
+        ])
+        assert [d["text"] for d in wu.hybrid_search(client, "q", [0.0], document_name="handbook.pdf")] == ["b"]
+
+    def test_collapses_linked_near_duplicates(self):
+        client = self._client([
+            make_obj("u1", text="a", content_hash="h1"),
+            make_obj("u2", text="a'", content_hash="h2", duplicate_of="h1"),
+            make_obj("u3", text="b", content_hash="h3"),
+        ])
+        assert [d["text"] for d in wu.hybrid_search(client, "q", [0.0])] == ["a", "b"]
+
+    def test_mmr_uses_returned_vectors(self):
+        objects = [make_obj(f"u{i}", text=f"t{i}", content_hash=f"h{i}") for i in range(3)]
+        for obj, vec in zip(objects, ([0.9, 0.44], [0.9, 0.45], [0.9, -0.44])):
+            obj.vector = {"default": vec}
+        client = self._client(objects)
+        docs = wu.hybrid_search(client, "q", [1.0, 0.0], mmr_k=2)
+        assert client.collections.get.return_value.query.hybrid.call_args.kwargs["include_vector"] is True
+        assert [d["text"] for d in docs] == ["t0", "t2"]
+        assert "vector" not in docs[0]
+
+    def test_unscoped_search_has_no_filter(self):
+        client = self._client()
+        wu.hybrid_search(client, "q", [0.0])
+        assert client.collections.get.return_value.query.hybrid.call_args.kwargs["filters"] is None
+
+    def test_search_weaviate_passes_alpha_through(self, monkeypatch):
+        monkeypatch.setattr(wu, "build_search_queries", lambda q, mode=None: (q, q))
+        monkeypatch.setattr(wu, "embed_text", lambda text: [0.0])
+        client = self._client()
+        wu.search_weaviate(client, "q", alpha=0.2)
+        assert client.collections.get.return_value.query.hybrid.call_args.kwargs["alpha"] == 0.2
+
+
+class TestTwoPhaseRetrieval:
+    def test_snippet_only_search_skips_text(self):
+        client = TestHybridSearch()._client([make_obj(U1, snippet="short", chunk_index=0)])
+        docs = wu.hybrid_search(client, "q", [0.0], full_text=False)
+        kwargs = client.collections.get.return_value.query.hybrid.call_args.kwargs
+        assert "text" not in kwargs["return_properties"]
+        assert docs == [{
+            "id": U1, "chunk_index": 0, "document_name": None, "page_start": None,
+            "page_end": None, "score": 0.5, "snippet": "short",
+        }]
+        client.collections.get.return_value.query.fetch_objects.assert_not_called()
+
+    def test_legacy_objects_without_snippet_fall_back_to_text(self):
+        client = TestHybridSearch()._client([make_obj(U1, snippet=None), make_obj(U2, snippet="s2")])
+        client.collections.get.return_value.query.fetch_objects.return_value.objects = [
+            make_obj(U1, text="x" * 1000)
+        ]
+        docs = wu.hybrid_search(client, "q", [0.0], full_text=False)
+        assert docs[0]["snippet"] == "x" * wu.SNIPPET_CHARS
+        assert "text" not in docs[0]
+        assert docs[1]["snippet"] == "s2"
+
+    def test_hydrate_fetches_missing_text_in_one_query(self):
+        client = MagicMock()
+        fetch = client.collections.get.return_value.query.fetch_objects
+        fetch.return_value.objects = [make_obj(U2, text="full two"), make_obj(U1, text="full one")]
+        docs = [{"id": U1}, {"id": U2}, {"id": "u3", "text": "already"}]
+        wu.hydrate_docs(client, docs)
+        assert [d["text"] for d in docs] == ["full one", "full two", "already"]
+        assert fetch.call_count == 1
+        assert fetch.call_args.kwargs["limit"] == 2